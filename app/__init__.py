@@ -2,6 +2,8 @@ from flask import Flask, render_template
 from app.config import Config
 from app.routes.chatbot_routes import chatbot_bp
 from app.models.database import close_db
+from app.commands import db_cli
+from app.utils import metrics, tracing
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -10,9 +12,18 @@ def create_app(config_class=Config):
     # Configurar el manejo de cierre de base de datos
     app.teardown_appcontext(close_db)
     
+    # Métricas de todas las solicitudes (GET /metrics)
+    metrics.init_app(app)
+    
+    # Trazas por tramos de una muestra de las solicitudes (Server-Timing, GET /debug/traces)
+    tracing.init_app(app)
+    
     # Registrar blueprints
     app.register_blueprint(chatbot_bp)
     
+    # Comandos de mantenimiento (flask db migrate, flask db diagnostics)
+    app.cli.add_command(db_cli)
+    
     # Ruta principal para la interfaz de chat
     @app.route('/')
     def index():
@@ -22,7 +33,7 @@ def create_app(config_class=Config):
     @app.route('/api')
     def api_info():
         return {"status": "API funcionando correctamente", 
-                "endpoints": ["/chatbot"],
+                "endpoints": ["/chatbot", "/metrics"],
                 "descripción": "API para chatbot con detección de intenciones"}
     
     return app
\ No newline at end of file
@@ -0,0 +1,129 @@
+import json
+import time
+from asgiref.wsgi import WsgiToAsgi
+from app.services.service_registry import get_chatbot_service
+from app.utils.metrics import metrics, record_request
+from app.utils.tracing import span, tracer
+from app.utils.security import validate_json_input
+
+class ChatbotASGIApp:
+    """
+    Aplicación ASGI que atiende POST /chatbot de forma asíncrona.
+    Mientras se espera la respuesta del proveedor LLM no se ocupa ningún hilo,
+    por lo que un solo proceso puede mantener miles de llamadas en curso.
+    El resto de rutas (interfaz web, lotes, streaming, salud) se delegan a las
+    rutas síncronas de Flask, que siguen funcionando igual.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi_app = WsgiToAsgi(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == '/chatbot' and scope['method'] == 'POST':
+            # Esta ruta no pasa por Flask: se mide y se traza aquí como las demás solicitudes
+            start = time.perf_counter()
+            metrics.inc('http_requests_in_flight', route='/chatbot')
+            headers = dict(scope.get('headers') or [])
+            trace, token = tracer.start('/chatbot', 'POST', force=headers.get(b'x-trace') == b'1')
+            status = 500
+            try:
+                status = await self._handle_chatbot(scope, receive, send, trace)
+            finally:
+                record_request('/chatbot', 'POST', status, time.perf_counter() - start)
+                if trace is not None:
+                    tracer.finish(trace, token, status)
+        else:
+            await self.wsgi_app(scope, receive, send)
+
+    async def _handle_chatbot(self, scope, receive, send, trace=None):
+        """Procesa un mensaje del chatbot con el mismo contrato que la ruta Flask; devuelve el código HTTP"""
+        headers = dict(scope.get('headers') or [])
+        content_type = headers.get(b'content-type', b'').decode('latin-1')
+        body = await self._read_body(receive)
+
+        if body is None:
+            return await self._send_json(send, 413, {
+                "status": "error",
+                "message": "La solicitud es demasiado grande"
+            })
+
+        # Verificar que el contenido sea JSON
+        if 'application/json' not in content_type:
+            return await self._send_json(send, 400, {
+                "status": "error",
+                "message": "La solicitud debe ser en formato JSON"
+            })
+
+        try:
+            data = json.loads(body or b'null')
+        except ValueError:
+            return await self._send_json(send, 400, {
+                "status": "error",
+                "message": "La solicitud debe ser en formato JSON"
+            })
+
+        # Validar la entrada
+        is_valid, error_message = validate_json_input(data, required_fields=['message'])
+        if not is_valid:
+            return await self._send_json(send, 400, {
+                "status": "error",
+                "message": error_message
+            })
+
+        user_message = str(data.get('message', '')).strip()
+        if not user_message:
+            return await self._send_json(send, 400, {
+                "status": "error",
+                "message": "El mensaje no puede estar vacío"
+            })
+
+        with self.flask_app.app_context():
+            chatbot_service = get_chatbot_service()
+
+            start_time = time.time()
+            response = await chatbot_service.process_message_async(user_message, cursor=data.get('cursor'))
+            processing_time = time.time() - start_time
+
+        response["processing_time"] = f"{processing_time:.2f}s"
+        return await self._send_json(send, 200, response, trace)
+
+    async def _read_body(self, receive):
+        """Lee el cuerpo completo respetando MAX_CONTENT_LENGTH; devuelve None si lo excede"""
+        max_length = self.flask_app.config.get('MAX_CONTENT_LENGTH')
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if max_length and size > max_length:
+                return None
+            chunks.append(chunk)
+            more_body = message.get('more_body', False)
+        return b''.join(chunks)
+
+    async def _send_json(self, send, status, payload, trace=None):
+        """Envía una respuesta JSON completa (con Server-Timing si la solicitud se traza) y devuelve su código"""
+        with span('json'):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers = [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('latin-1')),
+        ]
+        if trace is not None:
+            headers.append((b'x-trace-id', trace.trace_id.encode('latin-1')))
+            if tracer.server_timing:
+                headers.append((b'server-timing', trace.server_timing().encode('latin-1')))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': body})
+        return status
+
+def create_asgi_app(flask_app):
+    """Crea la aplicación ASGI a partir de la aplicación Flask"""
+    return ChatbotASGIApp(flask_app)
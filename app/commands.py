@@ -0,0 +1,136 @@
+import click
+from flask.cli import AppGroup
+from app.models.database import (
+    get_db,
+    get_db_path,
+    clear_query_cache,
+    MEJORES_COMPRADORES_SQL,
+    DEUDORES_ALTOS_SQL,
+    MEJORES_COMPRADORES_TABLA_SQL,
+    DEUDORES_ALTOS_TABLA_SQL,
+    CONTAR_SQL,
+    RANKING_PAGINA_SQL
+)
+from app.models.migrations import MIGRATIONS, current_version, explain_query_plan, migrate, pending_migrations
+from app.models.summary import check_summary, rebuild_summary
+from app.models.bulk_import import DEFAULT_BATCH_SIZE, IMPORT_TABLES, import_file, recover_interrupted_imports
+
+# Comandos de mantenimiento de la base de datos: flask db <comando>
+db_cli = AppGroup('db', help='Mantenimiento de la base de datos SQLite.')
+
+# Consultas de la aplicación cuyo plan se muestra en el diagnóstico
+DIAGNOSTIC_QUERIES = [
+    ('mejores_compradores', MEJORES_COMPRADORES_SQL, (10,)),
+    ('deudores_altos', DEUDORES_ALTOS_SQL, (10,)),
+    ('mejores_compradores (límite > K)', MEJORES_COMPRADORES_TABLA_SQL, (1000,)),
+    ('deudores_altos (límite > K)', DEUDORES_ALTOS_TABLA_SQL, (1000,)),
+    ('contar_compradores', CONTAR_SQL, ('compradores',)),
+    ('contar_deudores', CONTAR_SQL, ('deudores',)),
+    ('página de compradores (cursor)', RANKING_PAGINA_SQL['compradores'], (500.0, 500.0, 1, 100)),
+    ('página de deudores (cursor)', RANKING_PAGINA_SQL['deudores'], (500.0, 500.0, 1, 100)),
+]
+
+@db_cli.command('migrate')
+@click.option('--target', type=int, default=None, help='Versión hasta la que migrar (por defecto, la última).')
+def migrate_command(target):
+    """Aplica las migraciones pendientes del esquema."""
+    db = get_db()
+    applied = migrate(db, target=target)
+    if applied:
+        click.echo(f"Migraciones aplicadas: {', '.join(str(v) for v in applied)}")
+    else:
+        click.echo("No hay migraciones pendientes.")
+    click.echo(f"Versión del esquema: {current_version(db)}")
+    recovered = recover_interrupted_imports(db)
+    if recovered:
+        clear_query_cache()
+        click.echo(f"Triggers e índices restaurados tras una importación interrumpida: {', '.join(recovered)}")
+
+@db_cli.command('diagnostics')
+def diagnostics_command():
+    """Muestra la versión del esquema, los índices y el plan de las consultas."""
+    db = get_db()
+
+    click.echo(f"Base de datos: {get_db_path()}")
+    click.echo(f"Versión del esquema: {current_version(db)} (última: {MIGRATIONS[-1][0]})")
+    for version, description, _ in pending_migrations(db):
+        click.echo(f"  pendiente {version}: {description}")
+
+    click.echo("\nÍndices:")
+    for name, table in db.execute(
+        "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL ORDER BY tbl_name, name"
+    ):
+        click.echo(f"  {table}.{name}")
+
+    click.echo("\nEXPLAIN QUERY PLAN:")
+    for name, sql, params in DIAGNOSTIC_QUERIES:
+        click.echo(f"  {name}: {sql}")
+        for detail in explain_query_plan(db, sql, params):
+            # Un "USE TEMP B-TREE FOR ORDER BY" indica que se ordena la tabla completa
+            click.echo(f"    {detail}")
+
+@db_cli.command('summary-check')
+def summary_check_command():
+    """Comprueba que el resumen materializado coincide con las tablas."""
+    problems = check_summary(get_db())
+    if not problems:
+        click.echo("Resumen materializado consistente.")
+        return
+    for problem in problems:
+        click.echo(f"  {problem}")
+    raise click.ClickException("El resumen no es consistente; ejecuta 'flask db summary-rebuild'.")
+
+@db_cli.command('summary-rebuild')
+def summary_rebuild_command():
+    """Recalcula el resumen materializado desde las tablas."""
+    db = get_db()
+    rebuild_summary(db)
+    clear_query_cache()
+    click.echo("Resumen materializado reconstruido.")
+
+@db_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--table', 'tabla', type=click.Choice(sorted(IMPORT_TABLES)), required=True, help='Tabla de destino.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None, help='Formato (por defecto, según la extensión).')
+@click.option('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, show_default=True, help='Filas por transacción.')
+@click.option('--upsert', is_flag=True, help='Actualizar las filas con un id existente en lugar de fallar.')
+@click.option('--drop-indexes', is_flag=True, help='Eliminar los índices de la tabla durante la carga y reconstruirlos al final.')
+@click.option('--keep-triggers', is_flag=True, help='Mantener los triggers del resumen durante la carga (más lento). Sin esta opción, conteos y rankings no incluyen las filas nuevas hasta el final.')
+@click.option('--max-errors', type=int, default=100, show_default=True, help='Filas inválidas toleradas antes de detenerse.')
+@click.option('--restart', is_flag=True, help='Ignorar el punto de control y empezar desde el principio.')
+def import_command(path, tabla, fmt, batch_size, upsert, drop_indexes, keep_triggers, max_errors, restart):
+    """Importa compradores o deudores desde un archivo CSV o JSONL (reanudable)."""
+    def progress(stats):
+        click.echo(f"  {stats['rows']} filas, {stats['rows_per_sec']:.0f} filas/s")
+
+    try:
+        stats = import_file(
+            get_db(), path, tabla,
+            fmt=fmt,
+            batch_size=batch_size,
+            upsert=upsert,
+            drop_indexes=drop_indexes,
+            keep_triggers=keep_triggers,
+            max_errors=max_errors,
+            restart=restart,
+            progress=progress
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    if stats["status"] == "already_imported":
+        click.echo(f"El archivo ya se importó ({stats['rows']} filas); usa --restart para repetirlo.")
+        return
+
+    if stats["resumed_from_line"]:
+        click.echo(f"Reanudada desde la línea {stats['resumed_from_line']}.")
+    for error in stats["errors"]:
+        click.echo(f"  rechazada, {error}")
+    click.echo(
+        f"{stats['batch_rows']} filas importadas en {stats['elapsed']:.1f}s "
+        f"({stats['rows_per_sec']:.0f} filas/s), {stats['rejected']} rechazadas"
+    )
+    if stats["status"] == "aborted":
+        raise click.ClickException(
+            f"Demasiadas filas inválidas (más de {max_errors}); corrige el archivo o sube --max-errors."
+        )
@@ -10,20 +10,128 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///data/database.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Base de datos SQLite (por defecto data/database.db). Cada hilo mantiene una
+    # conexión persistente en modo WAL con estos parámetros
+    DATABASE_PATH = os.environ.get('DATABASE_PATH')
+    DB_BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT') or 5)
+    DB_CACHED_STATEMENTS = int(os.environ.get('DB_CACHED_STATEMENTS') or 256)
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE') or 256 * 1024 * 1024)
+    DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB') or 64000)
+    
     # DeepSeek API (prioridad)
     DEEPSEEK_API_KEY = os.environ.get('DEEPSEEK_API_KEY')
     DEEPSEEK_MODEL = os.environ.get('DEEPSEEK_MODEL') or 'deepseek-chat'
+    DEEPSEEK_BASE_URL = os.environ.get('DEEPSEEK_BASE_URL') or 'https://api.deepseek.com'
     
     # OpenAI API (secundario)
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
     OPENAI_MODEL = os.environ.get('OPENAI_MODEL') or 'gpt-3.5-turbo'
+    # Sin valor se usa la URL de OpenAI (https://api.openai.com/v1). Cualquier
+    # servidor compatible con /chat/completions sirve, por ejemplo benchmarks/mock_llm_server.py
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL')
     
     # Configuración de logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
     
-    # Preferencia de servicio de NLP (deepseek, openai o fallback)
+    # Arranque (run.py): DB_INIT_ON_STARTUP aplica migraciones y datos de ejemplo al importar
+    # la aplicación; STARTUP_PRELOAD precarga tiktoken y el SDK (solo con ASGI) y congela
+    # el GC para que los workers compartan ese estado (con gunicorn --preload, una vez en el maestro).
+    # ASGI indica que se sirve asgi.py; lo fijan asgi.py y el perfil asgi de gunicorn.conf.py
+    DB_INIT_ON_STARTUP = (os.environ.get('DB_INIT_ON_STARTUP') or 'true').lower() == 'true'
+    STARTUP_PRELOAD = (os.environ.get('STARTUP_PRELOAD') or 'false').lower() == 'true'
+    ASGI = (os.environ.get('ASGI') or 'false').lower() == 'true'
+    
+    # Prompt de clasificación (app/services/prompts.py): versión, límite de tokens de la
+    # respuesta y response_format json_object (desactivarlo si el proveedor no lo admite)
+    INTENT_PROMPT_VERSION = os.environ.get('INTENT_PROMPT_VERSION') or '2'
+    LLM_MAX_TOKENS = int(os.environ.get('LLM_MAX_TOKENS') or 64)
+    LLM_JSON_MODE = (os.environ.get('LLM_JSON_MODE') or 'true').lower() == 'true'
+    
+    # Cliente HTTP de los proveedores LLM (app/services/http_client.py): pool keep-alive
+    # por worker (LLM_POOL_MAXSIZE >= hilos por worker), timeouts en segundos y reintentos
+    # con espera aleatoria de los errores de conexión y de los estados 429, 502, 503 y 504
+    LLM_POOL_CONNECTIONS = int(os.environ.get('LLM_POOL_CONNECTIONS') or 4)
+    LLM_POOL_MAXSIZE = int(os.environ.get('LLM_POOL_MAXSIZE') or 100)
+    LLM_CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT') or 3.05)
+    LLM_READ_TIMEOUT = float(os.environ.get('LLM_READ_TIMEOUT') or 30)
+    LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES') or 2)
+    LLM_RETRY_BACKOFF_MS = float(os.environ.get('LLM_RETRY_BACKOFF_MS') or 250)
+    LLM_RETRY_MAX_BACKOFF_MS = float(os.environ.get('LLM_RETRY_MAX_BACKOFF_MS') or 4000)
+    
+    # Preferencia de servicio de NLP (deepseek, openai, fallback, hedged o local_first)
     # 'auto' intentará usar DeepSeek primero, luego OpenAI, y finalmente fallback
     NLP_SERVICE = os.environ.get('NLP_SERVICE') or 'auto'
     
+    # Modo 'hedged': se lanza el proveedor secundario si el principal no responde
+    # en HEDGE_DELAY_MS (0 = lanzar todos a la vez) y se usa la primera respuesta válida
+    HEDGE_DELAY_MS = float(os.environ.get('HEDGE_DELAY_MS') or 500)
+    HEDGE_TIMEOUT = float(os.environ.get('HEDGE_TIMEOUT') or 30)
+    # Hilos del pool de la carrera por worker (gunicorn.conf.py: 2 x solicitudes en curso)
+    HEDGE_MAX_WORKERS = int(os.environ.get('HEDGE_MAX_WORKERS') or 32)
+    
+    # Modo 'local_first': el detector local (regex/palabras clave) responde directamente si su
+    # confianza es >= LOCAL_FIRST_THRESHOLD; solo los mensajes ambiguos o desconocidos van al LLM.
+    # LOCAL_FIRST_SHADOW_RATE: fracción de respuestas locales que se verifican con el LLM en segundo plano
+    LOCAL_FIRST_THRESHOLD = float(os.environ.get('LOCAL_FIRST_THRESHOLD') or 0.8)
+    LOCAL_FIRST_SHADOW_RATE = float(os.environ.get('LOCAL_FIRST_SHADOW_RATE') or 0)
+    
+    # Circuit breaker por proveedor: se abre si en la ventana (segundos) la tasa de
+    # errores o de llamadas lentas supera el umbral; abierto, el proveedor se salta
+    # durante OPEN_SECONDS y luego se prueba con una fracción del tráfico (PROBE_RATIO)
+    CIRCUIT_BREAKER_ENABLED = (os.environ.get('CIRCUIT_BREAKER_ENABLED') or 'true').lower() == 'true'
+    CIRCUIT_BREAKER_WINDOW = float(os.environ.get('CIRCUIT_BREAKER_WINDOW') or 60)
+    CIRCUIT_BREAKER_MIN_CALLS = int(os.environ.get('CIRCUIT_BREAKER_MIN_CALLS') or 10)
+    CIRCUIT_BREAKER_ERROR_RATE = float(os.environ.get('CIRCUIT_BREAKER_ERROR_RATE') or 0.5)
+    CIRCUIT_BREAKER_SLOW_CALL_SECONDS = float(os.environ.get('CIRCUIT_BREAKER_SLOW_CALL_SECONDS') or 10)
+    CIRCUIT_BREAKER_SLOW_CALL_RATE = float(os.environ.get('CIRCUIT_BREAKER_SLOW_CALL_RATE') or 0.5)
+    CIRCUIT_BREAKER_OPEN_SECONDS = float(os.environ.get('CIRCUIT_BREAKER_OPEN_SECONDS') or 30)
+    CIRCUIT_BREAKER_PROBE_RATIO = float(os.environ.get('CIRCUIT_BREAKER_PROBE_RATIO') or 0.1)
+    
+    # Caché de intenciones: LRU en memoria + tabla SQLite compartida entre workers
+    INTENT_CACHE_ENABLED = (os.environ.get('INTENT_CACHE_ENABLED') or 'true').lower() == 'true'
+    INTENT_CACHE_SIZE = int(os.environ.get('INTENT_CACHE_SIZE') or 10000)
+    INTENT_CACHE_TTL = float(os.environ.get('INTENT_CACHE_TTL') or 3600)
+    INTENT_CACHE_SHARED = (os.environ.get('INTENT_CACHE_SHARED') or 'true').lower() == 'true'
+    INTENT_CACHE_DB_PATH = os.environ.get('INTENT_CACHE_DB_PATH')  # por defecto data/intent_cache.db
+    # Usar como clave la plantilla canónica del mensaje ("top <N> compradores")
+    INTENT_CACHE_CANONICALIZE = (os.environ.get('INTENT_CACHE_CANONICALIZE') or 'true').lower() == 'true'
+    
+    # Caché de resultados de las consultas a la base de datos (rankings y conteos),
+    # invalidada por un contador de escrituras por tabla mantenido con triggers.
+    # Los rankings se leen con al menos QUERY_CACHE_MIN_ROWS filas para servir límites menores
+    QUERY_CACHE_ENABLED = (os.environ.get('QUERY_CACHE_ENABLED') or 'true').lower() == 'true'
+    QUERY_CACHE_MIN_ROWS = int(os.environ.get('QUERY_CACHE_MIN_ROWS') or 10)
+    QUERY_CACHE_MAX_ROWS = int(os.environ.get('QUERY_CACHE_MAX_ROWS') or 1000)
+    
+    # Límites de los rankings: una respuesta JSON trae como mucho MAX_LIMITE filas y un
+    # next_cursor para pedir la página siguiente; /chatbot/export las envía en streaming
+    # (NDJSON) hasta EXPORT_MAX_ROWS filas, en bloques de EXPORT_CHUNK_BYTES. La
+    # exportación requiere ADMIN_TOKEN: sin token configurado queda deshabilitada
+    MAX_LIMITE = int(os.environ.get('MAX_LIMITE') or 100)
+    EXPORT_MAX_ROWS = int(os.environ.get('EXPORT_MAX_ROWS') or 1000000)
+    EXPORT_CHUNK_BYTES = int(os.environ.get('EXPORT_CHUNK_BYTES') or 65536)
+    
+    # Métricas en formato Prometheus (GET /metrics). Con varios workers, cada proceso vuelca
+    # sus valores en METRICS_DIR cada METRICS_FLUSH_SECONDS y /metrics suma los de todos;
+    # sin directorio, /metrics solo muestra los del worker que atiende la solicitud
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or 'true').lower() == 'true'
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS') or 1)
+    
+    # Trazas: una fracción TRACE_SAMPLE_RATE de las solicitudes (y las que envían la cabecera
+    # X-Trace: 1) se mide por tramos (sanitización, caché, proveedores, SQLite, JSON). Los tramos
+    # se devuelven en la cabecera Server-Timing y las últimas y más lentas TRACE_BUFFER_SIZE
+    # trazas de cada worker se consultan en GET /debug/traces (requiere ADMIN_TOKEN)
+    TRACING_ENABLED = (os.environ.get('TRACING_ENABLED') or 'true').lower() == 'true'
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE') or 0.1)
+    TRACE_BUFFER_SIZE = int(os.environ.get('TRACE_BUFFER_SIZE') or 100)
+    TRACE_SERVER_TIMING = (os.environ.get('TRACE_SERVER_TIMING') or 'true').lower() == 'true'
+    
+    # Procesamiento por lotes (/chatbot/batch)
+    BATCH_MAX_MESSAGES = int(os.environ.get('BATCH_MAX_MESSAGES') or 500)
+    BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS') or 8)
+    
     # Seguridad
+    # Token para los endpoints de administración (cabecera X-Admin-Token); sin token quedan deshabilitados
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
     MAX_CONTENT_LENGTH = 1 * 1024 * 1024  # Limitar tamaño de las solicitudes a 1MB
\ No newline at end of file
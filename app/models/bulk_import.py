@@ -0,0 +1,306 @@
+import csv
+import json
+import math
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from app.models.summary import SUMMARY_TABLES, rebuild_summary
+
+# Tablas que se pueden importar -> columna del monto
+IMPORT_TABLES = SUMMARY_TABLES
+
+# Filas por transacción: lotes grandes amortizan el coste de cada commit
+DEFAULT_BATCH_SIZE = 50000
+
+def detect_format(path):
+    """Formato según la extensión del archivo (csv o jsonl)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f"No se reconoce el formato de {path}; usa .csv o .jsonl o indica el formato")
+
+def file_fingerprint(path, tabla, upsert):
+    """Identifica una importación: el mismo archivo sin cambios, en la misma tabla y modo"""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{tabla}|{'upsert' if upsert else 'insert'}"
+
+def read_records(path, fmt, monto):
+    """
+    Genera (línea, id, nombre, monto) sin convertir, leyendo el archivo en streaming.
+    La columna del monto puede llamarse como en la tabla o simplemente 'monto'.
+    Un registro ilegible se genera con None en los tres campos
+    """
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            reader = csv.reader(f)
+            header = [column.strip() for column in next(reader, [])]
+            try:
+                id_pos = header.index('id')
+                nombre_pos = header.index('nombre')
+                monto_pos = header.index(monto) if monto in header else header.index('monto')
+            except ValueError:
+                raise ValueError(f"La cabecera del CSV debe tener las columnas id, nombre y {monto}")
+            width = max(id_pos, nombre_pos, monto_pos)
+            for row in reader:
+                if len(row) > width:
+                    yield reader.line_num, row[id_pos], row[nombre_pos], row[monto_pos]
+                elif row:
+                    yield reader.line_num, None, None, None
+        else:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    yield line_number, record['id'], record['nombre'], record[monto] if monto in record else record['monto']
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    yield line_number, None, None, None
+
+def validate_record(row_id, nombre, amount):
+    """Convierte los campos de un registro en (id, nombre, monto) o lanza ValueError"""
+    if row_id is None:
+        raise ValueError("registro mal formado o sin id, nombre y monto")
+    # Ni el id ni el nombre se convierten a la fuerza: true no es el id 1, 3.7 no es el
+    # id 3 y un nombre null o numérico del JSONL no es el texto "None" o "12"
+    if isinstance(row_id, bool) or (isinstance(row_id, float) and not row_id.is_integer()):
+        raise ValueError("id no entero")
+    if not isinstance(nombre, str):
+        raise ValueError("nombre no es texto")
+    try:
+        row_id = int(row_id)
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise ValueError("id o monto no numérico")
+    nombre = nombre.strip()
+    if row_id <= 0:
+        raise ValueError("id debe ser positivo")
+    if not nombre:
+        raise ValueError("nombre vacío")
+    if not math.isfinite(amount) or amount < 0:
+        raise ValueError("monto inválido")
+    # Los montos se guardan tal cual: uno con más de 2 decimales se rechaza en lugar de redondearlo
+    if round(amount, 2) != amount:
+        raise ValueError("monto con más de 2 decimales")
+    return row_id, nombre, amount
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+def _schema_objects(db, tabla, kind):
+    """(nombre, sql) de los índices o triggers definidos sobre una tabla"""
+    return db.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = ? AND tbl_name = ? AND sql IS NOT NULL ORDER BY name",
+        (kind, tabla)
+    ).fetchall()
+
+def _drop_objects(db, tabla, drop_indexes, drop_triggers):
+    """Elimina índices y/o triggers de la tabla y devuelve su definición para restaurarlos"""
+    dropped = []
+    for kind, enabled in (('index', drop_indexes), ('trigger', drop_triggers)):
+        if not enabled:
+            continue
+        for name, sql in _schema_objects(db, tabla, kind):
+            db.execute(f'DROP {kind.upper()} IF EXISTS {name}')
+            dropped.append({"type": kind, "name": name, "sql": sql})
+    return dropped
+
+def restore_objects(db, tabla, dropped):
+    """
+    Vuelve a crear los índices eliminados, recalcula el resumen si se quitaron sus
+    triggers y los restaura, y marca la tabla como modificada para la caché de resultados
+    """
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        for item in dropped:
+            if item["type"] == 'index':
+                db.execute(item["sql"].replace('CREATE INDEX', 'CREATE INDEX IF NOT EXISTS', 1))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if any(item["type"] == 'trigger' for item in dropped):
+        rebuild_summary(db, [tabla])
+
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        for item in dropped:
+            if item["type"] == 'trigger':
+                db.execute(f"DROP TRIGGER IF EXISTS {item['name']}")
+                db.execute(item["sql"])
+        db.execute('UPDATE versiones_tablas SET version = version + 1 WHERE tabla = ?', (tabla,))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def recover_interrupted_imports(db):
+    """
+    Restaura los índices y triggers que dejó eliminados una importación que no llegó a
+    su bloque finally (proceso terminado con SIGKILL, corte de luz...) y recalcula el
+    resumen de esas tablas. Se ejecuta al arrancar y con flask db migrate; una
+    importación que siga en curso en otro proceso continúa con los triggers ya puestos
+    y vuelve a recalcular el resumen al terminar. Devuelve las tablas restauradas
+    """
+    pending = {}
+    for tabla, objetos in db.execute(
+        "SELECT tabla, objetos_eliminados FROM importaciones WHERE objetos_eliminados != '[]'"
+    ).fetchall():
+        dropped = pending.setdefault(tabla, [])
+        dropped += [item for item in json.loads(objetos) if item["name"] not in {d["name"] for d in dropped}]
+
+    for tabla, dropped in pending.items():
+        restore_objects(db, tabla, dropped)
+        with db:
+            db.execute("UPDATE importaciones SET objetos_eliminados = '[]' WHERE tabla = ?", (tabla,))
+    return sorted(pending)
+
+def import_file(db, path, tabla, fmt=None, batch_size=DEFAULT_BATCH_SIZE, upsert=False,
+                drop_indexes=False, keep_triggers=False, max_errors=100, restart=False, progress=None):
+    """
+    Importa un archivo CSV/JSONL en compradores o deudores con memoria acotada.
+
+    Los registros se validan en streaming y se insertan con executemany en lotes de
+    batch_size filas, cada uno en su transacción junto con el punto de control
+    (línea del archivo ya confirmada), de modo que tras una caída la importación se
+    reanuda desde el último lote. Por defecto se quitan los triggers de la tabla
+    durante la carga (el resumen se recalcula al final); con drop_indexes también
+    los índices. progress(estadísticas) se llama tras cada lote.
+
+    Sin keep_triggers, mientras dura la carga los conteos y rankings materializados
+    (resumen_tablas, ranking_*) no incluyen las filas de los lotes ya confirmados: las
+    consultas de la aplicación los ven desactualizados hasta el recálculo final. La
+    versión de la tabla sí se incrementa por lote, así que la caché de resultados no
+    sirve datos anteriores al lote. Si el proceso muere sin restaurar los triggers,
+    recover_interrupted_imports lo hace en el siguiente arranque.
+    """
+    if tabla not in IMPORT_TABLES:
+        raise ValueError(f"Tabla no soportada: {tabla}")
+    monto = IMPORT_TABLES[tabla]
+    fmt = fmt or detect_format(path)
+    fingerprint = file_fingerprint(path, tabla, upsert)
+
+    if restart:
+        with db:
+            db.execute('DELETE FROM importaciones WHERE huella = ?', (fingerprint,))
+
+    checkpoint = db.execute(
+        'SELECT linea, filas, rechazadas, estado FROM importaciones WHERE huella = ?',
+        (fingerprint,)
+    ).fetchone()
+    if checkpoint is not None and checkpoint[3] == 'completada':
+        return {"status": "already_imported", "rows": checkpoint[1], "rejected": checkpoint[2]}
+
+    start_line = checkpoint[0] if checkpoint else 0
+    stats = {
+        "status": "running",
+        "resumed_from_line": start_line,
+        "rows": checkpoint[1] if checkpoint else 0,
+        "rejected": checkpoint[2] if checkpoint else 0,
+        "batch_rows": 0,
+        "errors": [],
+        "elapsed": 0.0,
+        "rows_per_sec": 0.0,
+    }
+
+    # Índices y triggers que quitó una importación anterior de la tabla que no terminó
+    # (aunque fuera de otro archivo o se repita con --restart): se restauran al final de esta
+    dropped = []
+    for (pending,) in db.execute(
+        "SELECT objetos_eliminados FROM importaciones WHERE tabla = ? AND objetos_eliminados != '[]'", (tabla,)
+    ).fetchall():
+        dropped += [item for item in json.loads(pending) if item["name"] not in {d["name"] for d in dropped}]
+
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        dropped += _drop_objects(db, tabla, drop_indexes, not keep_triggers)
+        db.execute(
+            '''INSERT OR REPLACE INTO importaciones
+               (huella, archivo, tabla, linea, filas, rechazadas, estado, objetos_eliminados, actualizado_en)
+               VALUES (?, ?, ?, ?, ?, ?, 'en_curso', ?, ?)''',
+            (fingerprint, os.path.abspath(path), tabla, start_line, stats["rows"], stats["rejected"],
+             json.dumps(dropped), _now())
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if upsert:
+        sql = (f'INSERT INTO {tabla} (id, nombre, {monto}) VALUES (?, ?, ?) '
+               f'ON CONFLICT(id) DO UPDATE SET nombre = excluded.nombre, {monto} = excluded.{monto}')
+    else:
+        sql = f'INSERT INTO {tabla} (id, nombre, {monto}) VALUES (?, ?, ?)'
+    bump_version = any(item["type"] == 'trigger' for item in dropped)
+
+    def commit_batch(batch, last_line):
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(sql, batch)
+            # Sin triggers, la versión de la tabla se incrementa por lote para la caché de resultados
+            if bump_version:
+                db.execute('UPDATE versiones_tablas SET version = version + 1 WHERE tabla = ?', (tabla,))
+            db.execute(
+                'UPDATE importaciones SET linea = ?, filas = filas + ?, rechazadas = ?, actualizado_en = ? WHERE huella = ?',
+                (last_line, len(batch), stats["rejected"], _now(), fingerprint)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    started = time.perf_counter()
+    try:
+        batch = []
+        last_line = start_line
+        for line_number, row_id, nombre, amount in read_records(path, fmt, monto):
+            if line_number <= start_line:
+                continue
+            try:
+                batch.append(validate_record(row_id, nombre, amount))
+            except ValueError as e:
+                stats["rejected"] += 1
+                if len(stats["errors"]) < 10:
+                    stats["errors"].append(f"línea {line_number}: {e}")
+                if max_errors is not None and stats["rejected"] > max_errors:
+                    # El lote pendiente no se confirma: al corregir el archivo se empieza por él
+                    stats["status"] = "aborted"
+                    break
+            last_line = line_number
+
+            if len(batch) >= batch_size:
+                commit_batch(batch, last_line)
+                stats["rows"] += len(batch)
+                stats["batch_rows"] += len(batch)
+                batch = []
+                stats["elapsed"] = time.perf_counter() - started
+                stats["rows_per_sec"] = stats["batch_rows"] / stats["elapsed"] if stats["elapsed"] else 0.0
+                if progress:
+                    progress(stats)
+
+        if stats["status"] != "aborted":
+            if batch:
+                commit_batch(batch, last_line)
+                stats["rows"] += len(batch)
+                stats["batch_rows"] += len(batch)
+            stats["status"] = "completed"
+    except sqlite3.IntegrityError as e:
+        stats["status"] = "aborted"
+        raise ValueError(f"Error de integridad: {e}. Usa --upsert para actualizar los id existentes; "
+                         "al repetir la importación se reanuda desde el último lote confirmado")
+    finally:
+        # Restaurar índices y triggers también si la importación falla o se detiene
+        restore_objects(db, tabla, dropped)
+        with db:
+            db.execute("UPDATE importaciones SET objetos_eliminados = '[]' WHERE tabla = ?", (tabla,))
+            db.execute(
+                'UPDATE importaciones SET estado = ?, actualizado_en = ? WHERE huella = ?',
+                ('completada' if stats["status"] == "completed" else 'en_curso', _now(), fingerprint)
+            )
+
+    stats["elapsed"] = time.perf_counter() - started
+    stats["rows_per_sec"] = stats["batch_rows"] / stats["elapsed"] if stats["elapsed"] else 0.0
+    return stats
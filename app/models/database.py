@@ -1,49 +1,138 @@
 import sqlite3
 import os
-from flask import current_app, g
+import base64
+import binascii
+import threading
+from collections import Counter
+from flask import current_app
 from pathlib import Path
+from app.models.bulk_import import recover_interrupted_imports
+from app.models.migrations import migrate
+from app.models.summary import LEADERBOARD_SIZE, SUMMARY_TABLES
+from app.utils.metrics import timed_query
+
+# Consultas de los rankings. Desempate por id para que el orden sea estable y un
+# prefijo coincida con un límite menor. Hasta LEADERBOARD_SIZE filas se leen del ranking
+# materializado (summary.py); límites mayores recorren el índice descendente de la tabla
+MEJORES_COMPRADORES_SQL = 'SELECT id, nombre, total_compras FROM ranking_compradores ORDER BY total_compras DESC, id ASC LIMIT ?'
+DEUDORES_ALTOS_SQL = 'SELECT id, nombre, monto_adeudado FROM ranking_deudores ORDER BY monto_adeudado DESC, id ASC LIMIT ?'
+MEJORES_COMPRADORES_TABLA_SQL = 'SELECT id, nombre, total_compras FROM compradores ORDER BY total_compras DESC, id ASC LIMIT ?'
+DEUDORES_ALTOS_TABLA_SQL = 'SELECT id, nombre, monto_adeudado FROM deudores ORDER BY monto_adeudado DESC, id ASC LIMIT ?'
+# Los conteos salen del resumen materializado, sin recorrer la tabla
+CONTAR_SQL = 'SELECT filas FROM resumen_tablas WHERE tabla = ?'
+# Paginación por cursor (keyset): la página empieza después de la última fila servida
+# (monto, id) en el orden del ranking. Recorre el índice descendente desde esa posición
+# en lugar de saltar filas con OFFSET, así que cualquier página cuesta lo mismo
+RANKING_PAGINA_SQL = {
+    tabla: f'SELECT id, nombre, {monto} FROM {tabla} WHERE {monto} <= ? AND ({monto} < ? OR id > ?) '
+           f'ORDER BY {monto} DESC, id ASC LIMIT ?'
+    for tabla, monto in SUMMARY_TABLES.items()
+}
+RANKING_TABLA_SQL = {
+    'compradores': MEJORES_COMPRADORES_TABLA_SQL,
+    'deudores': DEUDORES_ALTOS_TABLA_SQL,
+}
+
+# Filas leídas de SQLite en cada fetchmany al recorrer un ranking en streaming
+STREAM_FETCH_SIZE = 500
+
+# Caché de resultados de las consultas de los rankings y los conteos, compartida por los
+# hilos del proceso: {(ruta de la base, consulta): (versión de la tabla, filas pedidas, resultado)}
+_query_cache = {}
+_query_cache_lock = threading.Lock()
+_query_cache_stats = Counter()
+
+# Conexiones persistentes de cada hilo: {ruta de la base: conexión}
+_local = threading.local()
+_db_paths = {}
+
+def get_db_path():
+    """Ruta del archivo de la base de datos (DATABASE_PATH o data/database.db)"""
+    key = (current_app.root_path, current_app.config.get('DATABASE_PATH'))
+    db_path = _db_paths.get(key)
+    if db_path is None:
+        db_path = key[1] or os.path.join(Path(current_app.root_path).parent, 'data', 'database.db')
+        # Asegurar que el directorio data existe (una sola vez por proceso)
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        _db_paths[key] = db_path
+    return db_path
+
+def _connect(db_path):
+    """Abre una conexión configurada para lecturas concurrentes"""
+    config = current_app.config
+    conn = sqlite3.connect(
+        db_path,
+        timeout=config.get('DB_BUSY_TIMEOUT', 5.0),
+        cached_statements=config.get('DB_CACHED_STATEMENTS', 256)
+    )
+    conn.row_factory = sqlite3.Row
+    
+    # WAL: los lectores no bloquean al escritor ni el escritor a los lectores
+    conn.execute('PRAGMA journal_mode=WAL')
+    # En WAL, NORMAL solo sincroniza en los checkpoints y sigue siendo seguro ante caídas del proceso
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f"PRAGMA mmap_size={int(config.get('DB_MMAP_SIZE', 256 * 1024 * 1024))}")
+    # Valor negativo: tamaño de la caché de páginas en KiB
+    conn.execute(f"PRAGMA cache_size={-int(config.get('DB_CACHE_SIZE_KB', 64000))}")
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
 
 def get_db():
-    """Obtener conexión a la base de datos"""
-    if 'db' not in g:
-        # Asegurar que el directorio data existe
-        data_dir = Path(current_app.root_path).parent / 'data'
-        data_dir.mkdir(exist_ok=True)
-        
-        db_path = os.path.join(data_dir, 'database.db')
-        g.db = sqlite3.connect(db_path)
-        g.db.row_factory = sqlite3.Row
+    """
+    Obtener conexión a la base de datos.
+    Cada hilo mantiene su propia conexión persistente (con sus sentencias preparadas
+    en caché) durante toda la vida del proceso; tras un fork se abren conexiones
+    nuevas para que los workers de gunicorn nunca compartan un descriptor.
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None or _local.pid != os.getpid():
+        # Las conexiones heredadas del proceso padre se abandonan sin cerrarlas
+        _local.connections = connections = {}
+        _local.pid = os.getpid()
     
-    return g.db
+    db_path = get_db_path()
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = _connect(db_path)
+        connections[db_path] = conn
+    return conn
 
 def close_db(e=None):
-    """Cerrar conexión a la base de datos"""
-    db = g.pop('db', None)
+    """
+    Al terminar el contexto de la aplicación la conexión se conserva para la
+    siguiente solicitud; solo se deshace una transacción que haya quedado abierta
+    """
+    connections = getattr(_local, 'connections', None)
+    if not connections or _local.pid != os.getpid():
+        return
     
-    if db is not None:
-        db.close()
+    for conn in connections.values():
+        if conn.in_transaction:
+            conn.rollback()
+
+def close_all_connections():
+    """Cierra las conexiones del hilo actual (por ejemplo, antes de hacer fork)"""
+    connections = getattr(_local, 'connections', None)
+    if connections and _local.pid == os.getpid():
+        for conn in connections.values():
+            conn.close()
+    _local.connections = {}
+    _local.pid = os.getpid()
 
 def init_db():
     """Inicializar la base de datos con datos de prueba"""
     print("Inicializando base de datos...")
     db = get_db()
     
-    # Crear tablas si no existen
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS compradores (
-            id INTEGER PRIMARY KEY,
-            nombre TEXT NOT NULL,
-            total_compras REAL NOT NULL
-        )
-    ''')
+    # Aplicar las migraciones pendientes del esquema (tablas, triggers e índices)
+    applied = migrate(db)
+    if applied:
+        print(f"Migraciones aplicadas: {', '.join(str(v) for v in applied)}")
     
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS deudores (
-            id INTEGER PRIMARY KEY,
-            nombre TEXT NOT NULL,
-            monto_adeudado REAL NOT NULL
-        )
-    ''')
+    # Triggers e índices que dejó sin restaurar una importación interrumpida
+    recovered = recover_interrupted_imports(db)
+    if recovered:
+        print(f"Triggers e índices restaurados tras una importación interrumpida: {', '.join(recovered)}")
     
     # Insertar datos de prueba solo si las tablas están vacías
     if db.execute('SELECT COUNT(*) FROM compradores').fetchone()[0] == 0:
@@ -71,50 +160,191 @@ def init_db():
     db.commit()
     print("Base de datos inicializada")
 
+def _table_version(db, tabla):
+    """Versión actual (contador de escrituras) de una tabla, o None si no está disponible"""
+    try:
+        row = db.execute('SELECT version FROM versiones_tablas WHERE tabla = ?', (tabla,)).fetchone()
+    except sqlite3.OperationalError:
+        # Base de datos sin la tabla de versiones (init_db no se ha ejecutado)
+        return None
+    return row[0] if row else None
+
+def _cached_query(tabla, name, run, limite=None):
+    """
+    Ejecuta run(limite) a través de la caché de resultados.
+    Cada entrada guarda la versión de la tabla con la que se leyó, así que una
+    escritura posterior la invalida antes de que nadie pueda leerla. Los rankings
+    se piden con al menos QUERY_CACHE_MIN_ROWS filas y un límite menor se responde
+    con un prefijo del resultado guardado (el top 3 sale del top 10).
+    """
+    config = current_app.config
+    if not config.get('QUERY_CACHE_ENABLED', True):
+        return run(limite)
+    
+    db = get_db()
+    version = _table_version(db, tabla)
+    if version is None:
+        _count_query_cache('bypassed')
+        return run(limite)
+    
+    key = (get_db_path(), name)
+    with _query_cache_lock:
+        entry = _query_cache.get(key)
+    
+    if entry is not None and entry[0] == version:
+        cached_limite, result = entry[1], entry[2]
+        if limite is None:
+            _count_query_cache('hits')
+            return result
+        # Si la tabla tenía menos filas que las pedidas, el resultado sirve para cualquier límite
+        if limite <= cached_limite or len(result) < cached_limite:
+            _count_query_cache('hits' if limite == cached_limite else 'prefix_hits')
+            return [dict(row) for row in result[:limite]]
+    elif entry is not None:
+        _count_query_cache('invalidations')
+    
+    fetch = None if limite is None else max(limite, config.get('QUERY_CACHE_MIN_ROWS', 10))
+    if fetch is not None and fetch > config.get('QUERY_CACHE_MAX_ROWS', 1000):
+        # Límites muy grandes no se guardan para no llenar la memoria del worker
+        _count_query_cache('bypassed')
+        return run(limite)
+    
+    _count_query_cache('misses')
+    result = run(fetch)
+    with _query_cache_lock:
+        _query_cache[key] = (version, fetch, result)
+    
+    if limite is None:
+        return result
+    return [dict(row) for row in result[:limite]]
+
+def _count_query_cache(counter):
+    with _query_cache_lock:
+        _query_cache_stats[counter] += 1
+
+def query_cache_stats():
+    """Estadísticas de la caché de resultados de este proceso"""
+    with _query_cache_lock:
+        hits = _query_cache_stats['hits'] + _query_cache_stats['prefix_hits']
+        lookups = hits + _query_cache_stats['misses']
+        return {
+            "hits": _query_cache_stats['hits'],
+            "prefix_hits": _query_cache_stats['prefix_hits'],
+            "misses": _query_cache_stats['misses'],
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "invalidations": _query_cache_stats['invalidations'],
+            "bypassed": _query_cache_stats['bypassed'],
+            "entries": len(_query_cache),
+        }
+
+def clear_query_cache():
+    """Vacía la caché de resultados del proceso"""
+    with _query_cache_lock:
+        _query_cache.clear()
+
+def _select_mejores_compradores(limite):
+    sql = MEJORES_COMPRADORES_SQL if limite <= LEADERBOARD_SIZE else MEJORES_COMPRADORES_TABLA_SQL
+    compradores = get_db().execute(sql, (limite,)).fetchall()
+    return [dict(c) for c in compradores]
+
+def _select_deudores_altos(limite):
+    sql = DEUDORES_ALTOS_SQL if limite <= LEADERBOARD_SIZE else DEUDORES_ALTOS_TABLA_SQL
+    deudores = get_db().execute(sql, (limite,)).fetchall()
+    return [dict(d) for d in deudores]
+
+@timed_query
 def consultar_mejores_compradores(limite=3):
     """Consultar los mejores compradores ordenados por total de compras"""
     try:
-        db = get_db()
-        compradores = db.execute(
-            'SELECT id, nombre, total_compras FROM compradores ORDER BY total_compras DESC LIMIT ?',
-            (limite,)
-        ).fetchall()
-        
-        return [dict(c) for c in compradores]
+        return _cached_query('compradores', 'mejores_compradores', _select_mejores_compradores, limite)
     except Exception as e:
         current_app.logger.error(f"Error al consultar mejores compradores: {str(e)}")
         raise
 
+@timed_query
 def consultar_deudores_altos(limite=3):
     """Consultar los deudores con mayor monto adeudado"""
     try:
-        db = get_db()
-        deudores = db.execute(
-            'SELECT id, nombre, monto_adeudado FROM deudores ORDER BY monto_adeudado DESC LIMIT ?',
-            (limite,)
-        ).fetchall()
-        
-        return [dict(d) for d in deudores]
+        return _cached_query('deudores', 'deudores_altos', _select_deudores_altos, limite)
     except Exception as e:
         current_app.logger.error(f"Error al consultar deudores altos: {str(e)}")
         raise
 
+@timed_query
 def contar_compradores():
     """Contar el número total de compradores"""
     try:
-        db = get_db()
-        count = db.execute('SELECT COUNT(*) FROM compradores').fetchone()[0]
-        return count
+        return _cached_query(
+            'compradores', 'contar_compradores',
+            lambda _: get_db().execute(CONTAR_SQL, ('compradores',)).fetchone()[0]
+        )
     except Exception as e:
         current_app.logger.error(f"Error al contar compradores: {str(e)}")
         raise
 
+@timed_query
 def contar_deudores():
     """Contar el número total de deudores"""
     try:
-        db = get_db()
-        count = db.execute('SELECT COUNT(*) FROM deudores').fetchone()[0]
-        return count
+        return _cached_query(
+            'deudores', 'contar_deudores',
+            lambda _: get_db().execute(CONTAR_SQL, ('deudores',)).fetchone()[0]
+        )
     except Exception as e:
         current_app.logger.error(f"Error al contar deudores: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def encode_cursor(tabla, row, served):
+    """
+    Cursor opaco que apunta después de la fila dada del ranking de la tabla.
+    Guarda también cuántas filas se han servido para respetar el límite pedido
+    """
+    monto = SUMMARY_TABLES[tabla]
+    # repr conserva exactamente el float para que la comparación del keyset sea exacta
+    raw = f"{tabla}:{row[monto]!r}:{row['id']}:{served}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, tabla):
+    """Devuelve ((monto, id), filas servidas) o lanza ValueError si el cursor no es de esta tabla"""
+    try:
+        raw = base64.urlsafe_b64decode(str(cursor) + '=' * (-len(str(cursor)) % 4)).decode('utf-8')
+        cursor_tabla, amount, row_id, served = raw.split(':')
+        position = (float(amount), int(row_id))
+        served = int(served)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Cursor no válido")
+    if cursor_tabla != tabla or served < 0:
+        raise ValueError("Cursor no válido")
+    return position, served
+
+@timed_query
+def consultar_pagina_ranking(tabla, limite, despues_de):
+    """Página del ranking de la tabla con las limite filas siguientes a la posición (monto, id)"""
+    try:
+        amount, row_id = despues_de
+        rows = get_db().execute(RANKING_PAGINA_SQL[tabla], (amount, amount, row_id, limite)).fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        current_app.logger.error(f"Error al consultar la página del ranking de {tabla}: {str(e)}")
+        raise
+
+def iterar_ranking(tabla, limite, despues_de=None):
+    """
+    Genera las filas del ranking de la tabla una a una (hasta limite), leyendo el
+    cursor de SQLite por bloques: la memoria no depende del tamaño del resultado
+    """
+    db = get_db()
+    if despues_de is None:
+        cursor = db.execute(RANKING_TABLA_SQL[tabla], (limite,))
+    else:
+        amount, row_id = despues_de
+        cursor = db.execute(RANKING_PAGINA_SQL[tabla], (amount, amount, row_id, limite))
+    try:
+        while True:
+            rows = cursor.fetchmany(STREAM_FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        cursor.close()
@@ -0,0 +1,138 @@
+from datetime import datetime, timezone
+from flask import current_app
+from app.models.summary import create_summary_schema
+
+# Tablas cuyos cambios invalidan la caché de resultados (contador de escrituras por tabla)
+VERSIONED_TABLES = ('compradores', 'deudores')
+
+def _create_tables(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS compradores (
+            id INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            total_compras REAL NOT NULL
+        )
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS deudores (
+            id INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            monto_adeudado REAL NOT NULL
+        )
+    ''')
+
+def _create_table_versions(db):
+    # Contador de escrituras por tabla, mantenido por triggers: cualquier cambio (también
+    # desde otro proceso o desde la consola de sqlite3) invalida la caché de resultados
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS versiones_tablas (
+            tabla TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for tabla in VERSIONED_TABLES:
+        db.execute('INSERT OR IGNORE INTO versiones_tablas (tabla, version) VALUES (?, 0)', (tabla,))
+        for evento in ('INSERT', 'UPDATE', 'DELETE'):
+            db.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {tabla}_{evento.lower()}_version
+                AFTER {evento} ON {tabla}
+                BEGIN
+                    UPDATE versiones_tablas SET version = version + 1 WHERE tabla = '{tabla}';
+                END
+            ''')
+
+def _create_ranking_indexes(db):
+    # El índice descendente termina implícitamente en el rowid (id), así que sirve
+    # tanto para ORDER BY monto DESC, id ASC como para LIMIT sin ordenar la tabla
+    db.execute('CREATE INDEX IF NOT EXISTS idx_compradores_total_compras ON compradores (total_compras DESC)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_deudores_monto_adeudado ON deudores (monto_adeudado DESC)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_compradores_nombre ON compradores (nombre)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_deudores_nombre ON deudores (nombre)')
+
+def _create_import_checkpoints(db):
+    # Progreso de las importaciones masivas para poder reanudarlas tras una caída
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS importaciones (
+            huella TEXT PRIMARY KEY,
+            archivo TEXT NOT NULL,
+            tabla TEXT NOT NULL,
+            linea INTEGER NOT NULL DEFAULT 0,
+            filas INTEGER NOT NULL DEFAULT 0,
+            rechazadas INTEGER NOT NULL DEFAULT 0,
+            estado TEXT NOT NULL,
+            objetos_eliminados TEXT NOT NULL DEFAULT '[]',
+            actualizado_en TEXT NOT NULL
+        )
+    ''')
+
+# Migraciones en orden: (versión, descripción, función). Nunca se modifica una migración
+# ya publicada; los cambios de esquema se agregan como una versión nueva al final.
+# Todas son idempotentes para poder aplicarse sobre bases creadas antes del control de versiones.
+MIGRATIONS = [
+    (1, 'Tablas compradores y deudores', _create_tables),
+    (2, 'Contador de escrituras por tabla para la caché de resultados', _create_table_versions),
+    (3, 'Índices descendentes de los rankings e índices por nombre', _create_ranking_indexes),
+    (4, 'Resumen materializado (filas, sumas y ranking top K) mantenido por triggers', create_summary_schema),
+    (5, 'Puntos de control de las importaciones masivas', _create_import_checkpoints),
+]
+
+def _ensure_migrations_table(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            descripcion TEXT NOT NULL,
+            aplicada_en TEXT NOT NULL
+        )
+    ''')
+    db.commit()
+
+def current_version(db):
+    """Versión del esquema de la base de datos (0 si no hay ninguna migración aplicada)"""
+    _ensure_migrations_table(db)
+    return db.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations').fetchone()[0]
+
+def pending_migrations(db):
+    """Migraciones que aún no se han aplicado"""
+    version = current_version(db)
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+def migrate(db, target=None):
+    """
+    Aplica en orden las migraciones pendientes (hasta target, si se indica).
+    Cada una se ejecuta en su propia transacción junto con su registro en
+    schema_migrations; si falla, se deshace y se detiene la migración.
+    Devuelve la lista de versiones aplicadas.
+    """
+    applied = []
+    for version, description, step in pending_migrations(db):
+        if target is not None and version > target:
+            break
+
+        # BEGIN IMMEDIATE toma el bloqueo de escritura: si varios workers arrancan a la
+        # vez, solo uno aplica cada migración y el resto la encuentra ya registrada
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if db.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,)).fetchone():
+                db.commit()
+                continue
+
+            if current_app:
+                current_app.logger.info(f"Aplicando migración {version}: {description}")
+            step(db)
+            db.execute(
+                'INSERT INTO schema_migrations (version, descripcion, aplicada_en) VALUES (?, ?, ?)',
+                (version, description, datetime.now(timezone.utc).isoformat(timespec='seconds'))
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            if current_app:
+                current_app.logger.error(f"Error en la migración {version}: {str(e)}")
+            raise
+
+        applied.append(version)
+    return applied
+
+def explain_query_plan(db, sql, params=()):
+    """Plan de ejecución de una consulta (columna detail de EXPLAIN QUERY PLAN)"""
+    return [row[3] for row in db.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
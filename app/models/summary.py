@@ -0,0 +1,164 @@
+# Capa de resumen materializada: filas, suma de montos y un ranking acotado (top K)
+# de cada tabla, mantenidos exactos por triggers de SQLite. Los conteos se leen en
+# O(1) y los rankings de hasta K filas en O(K), sin recorrer ni ordenar la tabla.
+
+# Tamaño del ranking materializado de cada tabla. Se fija en los triggers al crearlos:
+# cambiarlo requiere una migración nueva que los vuelva a crear
+LEADERBOARD_SIZE = 100
+
+# Tabla base -> columna del monto por la que se ordena el ranking
+SUMMARY_TABLES = {
+    'compradores': 'total_compras',
+    'deudores': 'monto_adeudado',
+}
+
+# Las sumas se guardan en centavos enteros para que las actualizaciones incrementales sean exactas
+CENTS = 'CAST(ROUND({} * 100) AS INTEGER)'
+
+def _ranking_table(tabla):
+    return f'ranking_{tabla}'
+
+def _drop_triggers(db, tabla):
+    for evento in ('insert', 'update', 'delete'):
+        db.execute(f'DROP TRIGGER IF EXISTS {tabla}_{evento}_resumen')
+
+def create_triggers(db, tabla):
+    """
+    Triggers que mantienen el resumen y el ranking de la tabla. Invariante: el ranking
+    contiene exactamente las primeras min(K, filas) filas por (monto DESC, id ASC)
+    """
+    monto = SUMMARY_TABLES[tabla]
+    ranking = _ranking_table(tabla)
+    k = LEADERBOARD_SIZE
+    # Última entrada del ranking: la que sale si entra una mejor
+    last = f'(SELECT id FROM {ranking} ORDER BY {monto} ASC, id DESC LIMIT 1)'
+    # NEW supera a la última entrada del ranking en el orden (monto DESC, id ASC)
+    beats_last = f'''EXISTS (
+        SELECT 1 FROM {ranking} WHERE id = {last}
+          AND (NEW.{monto} > {monto} OR (NEW.{monto} = {monto} AND NEW.id < id))
+    )'''
+    count = f'(SELECT COUNT(*) FROM {ranking})'
+    evict = f'DELETE FROM {ranking} WHERE {count} > {k} AND id = {last};'
+    # Rellenar con la mejor fila que no está en el ranking (recorre el índice descendente)
+    refill = f'''INSERT INTO {ranking} (id, nombre, {monto})
+        SELECT id, nombre, {monto} FROM {tabla}
+        WHERE {count} < {k} AND id NOT IN (SELECT id FROM {ranking})
+        ORDER BY {monto} DESC, id ASC LIMIT 1;'''
+
+    _drop_triggers(db, tabla)
+    db.execute(f'''
+        CREATE TRIGGER {tabla}_insert_resumen AFTER INSERT ON {tabla}
+        BEGIN
+            UPDATE resumen_tablas
+               SET filas = filas + 1, suma_centavos = suma_centavos + {CENTS.format('NEW.' + monto)}
+             WHERE tabla = '{tabla}';
+            INSERT INTO {ranking} (id, nombre, {monto})
+                SELECT NEW.id, NEW.nombre, NEW.{monto}
+                WHERE {count} < {k} OR {beats_last};
+            {evict}
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER {tabla}_delete_resumen AFTER DELETE ON {tabla}
+        BEGIN
+            UPDATE resumen_tablas
+               SET filas = filas - 1, suma_centavos = suma_centavos - {CENTS.format('OLD.' + monto)}
+             WHERE tabla = '{tabla}';
+            DELETE FROM {ranking} WHERE id = OLD.id;
+            {refill}
+        END
+    ''')
+    # Una actualización saca la fila del ranking y la vuelve a colocar: si seguía llena
+    # (la fila no estaba) solo entra si supera a la última; si no, se rellena desde la tabla
+    db.execute(f'''
+        CREATE TRIGGER {tabla}_update_resumen AFTER UPDATE ON {tabla}
+        BEGIN
+            UPDATE resumen_tablas
+               SET suma_centavos = suma_centavos - {CENTS.format('OLD.' + monto)} + {CENTS.format('NEW.' + monto)}
+             WHERE tabla = '{tabla}';
+            DELETE FROM {ranking} WHERE id = OLD.id;
+            INSERT INTO {ranking} (id, nombre, {monto})
+                SELECT NEW.id, NEW.nombre, NEW.{monto}
+                WHERE {count} >= {k} AND {beats_last};
+            {evict}
+            {refill}
+        END
+    ''')
+
+def create_summary_schema(db):
+    """Crea las tablas de resumen y de ranking con sus triggers y las calcula desde los datos"""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS resumen_tablas (
+            tabla TEXT PRIMARY KEY,
+            filas INTEGER NOT NULL,
+            suma_centavos INTEGER NOT NULL
+        )
+    ''')
+    for tabla, monto in SUMMARY_TABLES.items():
+        db.execute(f'''
+            CREATE TABLE IF NOT EXISTS {_ranking_table(tabla)} (
+                id INTEGER PRIMARY KEY,
+                nombre TEXT NOT NULL,
+                {monto} REAL NOT NULL
+            )
+        ''')
+        # Sirve para leer el ranking en orden y para encontrar su última entrada en los triggers
+        db.execute(f'CREATE INDEX IF NOT EXISTS idx_{_ranking_table(tabla)}_{monto} ON {_ranking_table(tabla)} ({monto} DESC)')
+        _rebuild_table(db, tabla)
+        create_triggers(db, tabla)
+
+def _rebuild_table(db, tabla):
+    monto = SUMMARY_TABLES[tabla]
+    ranking = _ranking_table(tabla)
+    db.execute(f'''
+        INSERT OR REPLACE INTO resumen_tablas (tabla, filas, suma_centavos)
+        SELECT '{tabla}', COUNT(*), COALESCE(SUM({CENTS.format(monto)}), 0) FROM {tabla}
+    ''')
+    db.execute(f'DELETE FROM {ranking}')
+    db.execute(f'''
+        INSERT INTO {ranking} (id, nombre, {monto})
+        SELECT id, nombre, {monto} FROM {tabla} ORDER BY {monto} DESC, id ASC LIMIT {LEADERBOARD_SIZE}
+    ''')
+
+def rebuild_summary(db, tablas=None):
+    """Recalcula desde cero el resumen y el ranking (en una sola transacción)"""
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        for tabla in tablas or SUMMARY_TABLES:
+            _rebuild_table(db, tabla)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def check_summary(db):
+    """
+    Compara el resumen y el ranking con los datos de las tablas base.
+    Devuelve una lista de diferencias (vacía si todo es consistente)
+    """
+    problems = []
+    for tabla, monto in SUMMARY_TABLES.items():
+        ranking = _ranking_table(tabla)
+        summary = db.execute(
+            'SELECT filas, suma_centavos FROM resumen_tablas WHERE tabla = ?', (tabla,)
+        ).fetchone()
+        actual = db.execute(
+            f'SELECT COUNT(*), COALESCE(SUM({CENTS.format(monto)}), 0) FROM {tabla}'
+        ).fetchone()
+        if summary is None:
+            problems.append(f"{tabla}: falta la fila en resumen_tablas")
+        else:
+            if summary[0] != actual[0]:
+                problems.append(f"{tabla}: filas {summary[0]} en el resumen, {actual[0]} en la tabla")
+            if summary[1] != actual[1]:
+                problems.append(f"{tabla}: suma {summary[1]} centavos en el resumen, {actual[1]} en la tabla")
+
+        expected = db.execute(
+            f'SELECT id, nombre, {monto} FROM {tabla} ORDER BY {monto} DESC, id ASC LIMIT {LEADERBOARD_SIZE}'
+        ).fetchall()
+        stored = db.execute(
+            f'SELECT id, nombre, {monto} FROM {ranking} ORDER BY {monto} DESC, id ASC'
+        ).fetchall()
+        if [tuple(row) for row in expected] != [tuple(row) for row in stored]:
+            problems.append(f"{tabla}: el ranking materializado no coincide con el top {LEADERBOARD_SIZE} de la tabla")
+    return problems
@@ -1,18 +1,28 @@
-from flask import Blueprint, request, jsonify, current_app
-from app.services.chatbot_service import ChatbotService
-from app.utils.security import validate_json_input
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from app.services.service_registry import get_chatbot_service
+from app.services.hedging import hedge_stats
+from app.services.circuit_breaker import circuit_breakers
+from app.services.local_first import local_first_stats
+from app.services.http_client import http_client
+from app.models.database import query_cache_stats
+from app.utils.security import validate_json_input, require_admin_token, sanitize_cache_stats
+from app.utils.metrics import metrics
+from app.utils.tracing import span, tracer
+import json
 import time
+import zlib
 
 chatbot_bp = Blueprint('chatbot', __name__)
 
-# No crear una instancia global del servicio
-# El servicio se creará dentro del contexto de la aplicación
+# El servicio no se crea al importar el módulo: el registro lo construye una vez
+# por proceso dentro del contexto de la aplicación y lo reutiliza entre solicitudes
 
 @chatbot_bp.route('/chatbot', methods=['POST'])
 def process_chatbot_message():
     """
     Endpoint para procesar mensajes del chatbot
     Espera un JSON con el formato: {"message": "texto del mensaje"}
+    Opcionalmente "cursor" con el next_cursor de una respuesta anterior para la página siguiente
     """
     # Verificar que el contenido sea JSON
     if not request.is_json:
@@ -41,25 +51,373 @@ def process_chatbot_message():
             "message": "El mensaje no puede estar vacío"
         }), 400
     
-    # Crear e inicializar el servicio dentro del contexto de la aplicación
-    chatbot_service = ChatbotService().initialize()
+    # Obtener el servicio compartido del proceso (se reconstruye solo si cambia la configuración)
+    chatbot_service = get_chatbot_service()
     
     # Procesar el mensaje y generar respuesta
     start_time = time.time()
-    response = chatbot_service.process_message(user_message)
+    response = chatbot_service.process_message(user_message, cursor=data.get('cursor'))
     processing_time = time.time() - start_time
     
     # Agregar información de tiempo de procesamiento para debugging
     response["processing_time"] = f"{processing_time:.2f}s"
     
-    return jsonify(response)
+    with span('json'):
+        return jsonify(response)
+
+@chatbot_bp.route('/chatbot/batch', methods=['POST'])
+def process_chatbot_batch():
+    """
+    Endpoint para procesar varios mensajes en una sola solicitud
+    Espera un JSON con el formato: {"messages": ["mensaje 1", "mensaje 2", ...]}
+    Las respuestas se devuelven en el mismo orden que los mensajes
+    """
+    # Verificar que el contenido sea JSON
+    if not request.is_json:
+        return jsonify({
+            "status": "error",
+            "message": "La solicitud debe ser en formato JSON"
+        }), 400
+    
+    # Obtener datos de la solicitud
+    data = request.get_json()
+    
+    # Validar la entrada
+    is_valid, error_message = validate_json_input(data, required_fields=['messages'])
+    if not is_valid:
+        return jsonify({
+            "status": "error",
+            "message": error_message
+        }), 400
+    
+    messages = data.get('messages')
+    if not isinstance(messages, list) or not messages:
+        return jsonify({
+            "status": "error",
+            "message": "El campo 'messages' debe ser una lista no vacía"
+        }), 400
+    
+    max_messages = current_app.config.get('BATCH_MAX_MESSAGES', 500)
+    if len(messages) > max_messages:
+        return jsonify({
+            "status": "error",
+            "message": f"El lote no puede tener más de {max_messages} mensajes"
+        }), 400
+    
+    # Obtener el servicio compartido del proceso
+    chatbot_service = get_chatbot_service()
+    
+    # Procesar el lote y generar las respuestas
+    start_time = time.time()
+    response = chatbot_service.process_batch(
+        messages,
+        max_workers=current_app.config.get('BATCH_MAX_WORKERS', 8)
+    )
+    processing_time = time.time() - start_time
+    
+    response["status"] = "success"
+    response["processing_time"] = f"{processing_time:.2f}s"
+    
+    with span('json'):
+        return jsonify(response)
+
+@chatbot_bp.route('/chatbot/stream', methods=['GET', 'POST'])
+def stream_chatbot_message():
+    """
+    Endpoint para procesar mensajes del chatbot con Server-Sent Events
+    Acepta GET /chatbot/stream?message=texto o POST con {"message": "texto del mensaje"}
+    Emite los eventos: intent, parameters, row (uno por fila) y done
+    """
+    if request.method == 'POST':
+        # Verificar que el contenido sea JSON
+        if not request.is_json:
+            return jsonify({
+                "status": "error",
+                "message": "La solicitud debe ser en formato JSON"
+            }), 400
+        
+        data = request.get_json()
+        
+        # Validar la entrada
+        is_valid, error_message = validate_json_input(data, required_fields=['message'])
+        if not is_valid:
+            return jsonify({
+                "status": "error",
+                "message": error_message
+            }), 400
+        
+        user_message = str(data.get('message', '')).strip()
+        cursor = data.get('cursor')
+    else:
+        user_message = request.args.get('message', '').strip()
+        cursor = request.args.get('cursor')
+    
+    if not user_message:
+        return jsonify({
+            "status": "error",
+            "message": "El mensaje no puede estar vacío"
+        }), 400
+    
+    chatbot_service = get_chatbot_service()
+    
+    def generate():
+        start_time = time.time()
+        for event, payload in chatbot_service.stream_message(user_message, cursor=cursor):
+            if event == 'done':
+                payload["processing_time"] = f"{time.time() - start_time:.2f}s"
+            yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Evitar que proxies como nginx acumulen los eventos
+        }
+    )
+
+@chatbot_bp.route('/chatbot/export', methods=['GET', 'POST'])
+@require_admin_token
+def export_chatbot_ranking():
+    """
+    Endpoint de administración para exportar un ranking completo como NDJSON (una fila JSON por línea)
+    Acepta GET /chatbot/export?message=texto o POST con {"message": "texto del mensaje"},
+    y opcionalmente "limite" (sustituye al detectado) y "cursor" (continúa una página).
+    Las filas se leen del cursor de SQLite y se escriben a medida que llegan, así que la
+    memoria no depende del tamaño del resultado; con Accept-Encoding: gzip se comprimen
+    """
+    if request.method == 'POST':
+        # Verificar que el contenido sea JSON
+        if not request.is_json:
+            return jsonify({
+                "status": "error",
+                "message": "La solicitud debe ser en formato JSON"
+            }), 400
+        
+        data = request.get_json()
+        
+        # Validar la entrada
+        is_valid, error_message = validate_json_input(data, required_fields=['message'])
+        if not is_valid:
+            return jsonify({
+                "status": "error",
+                "message": error_message
+            }), 400
+    else:
+        data = request.args
+    
+    user_message = str(data.get('message', '')).strip()
+    if not user_message:
+        return jsonify({
+            "status": "error",
+            "message": "El mensaje no puede estar vacío"
+        }), 400
+    
+    limite = data.get('limite')
+    if limite is not None:
+        try:
+            limite = int(limite)
+            if limite <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            return jsonify({
+                "status": "error",
+                "message": "El límite debe ser un número entero positivo"
+            }), 400
+    
+    chatbot_service = get_chatbot_service()
+    
+    try:
+        intent, rows = chatbot_service.export_ranking(user_message, limite=limite, cursor=data.get('cursor'))
+    except ValueError as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
+    
+    if rows is None:
+        return jsonify({
+            "status": "error",
+            "message": "Solo se pueden exportar los rankings de compradores y deudores",
+            "intent": intent
+        }), 400
+    
+    use_gzip = 'gzip' in request.accept_encodings
+    chunk_bytes = current_app.config.get('EXPORT_CHUNK_BYTES', 64 * 1024)
+    
+    def generate():
+        # wbits=31: formato gzip. Cada bloque se vacía con Z_SYNC_FLUSH para que el
+        # cliente pueda descomprimir las filas a medida que llegan
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None
+        buffer = []
+        size = 0
+        
+        def flush(final=False):
+            chunk = ''.join(buffer).encode('utf-8')
+            buffer.clear()
+            if compressor is None:
+                return chunk
+            return compressor.compress(chunk) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        
+        try:
+            for row in rows:
+                line = json.dumps(row, ensure_ascii=False) + "\n"
+                buffer.append(line)
+                size += len(line)
+                if size >= chunk_bytes:
+                    yield flush()
+                    size = 0
+        except Exception as e:
+            # Los encabezados ya se enviaron: el error se informa como última línea
+            current_app.logger.error(f"Error al exportar {intent}: {str(e)}")
+            buffer.append(json.dumps({"error": "Ocurrió un error al exportar el resultado"}, ensure_ascii=False) + "\n")
+        
+        yield flush(final=True)
+    
+    headers = {
+        "X-Intent": intent,
+        "X-Accel-Buffering": "no",
+        "Vary": "Accept-Encoding"
+    }
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers=headers)
 
 @chatbot_bp.route('/chatbot/health', methods=['GET'])
 def health_check():
     """
     Endpoint para verificar que el servicio esté funcionando correctamente
+    Incluye el estado del circuit breaker de cada proveedor LLM
+    """
+    chatbot_service = get_chatbot_service()
+    
+    providers = {}
+    for name, service in (('deepseek', chatbot_service.deepseek_service), ('openai', chatbot_service.openai_service)):
+        if service is None:
+            providers[name] = {"state": "not_configured"}
+        elif chatbot_service.breaker_settings is not None:
+            providers[name] = circuit_breakers.get(name, **chatbot_service.breaker_settings).snapshot()
+        else:
+            providers[name] = {"state": "closed"}
+    
+    # El fallback local siempre está disponible, así que el servicio sigue funcionando
+    # aunque los proveedores estén abiertos; se informa como degradado
+    configured = [p for p in providers.values() if p["state"] != "not_configured"]
+    degraded = bool(configured) and all(p["state"] == "open" for p in configured)
+    
+    return jsonify({
+        "status": "success",
+        "message": "El servicio del chatbot está funcionando correctamente",
+        "degraded": degraded,
+        "nlp_service": chatbot_service.nlp_service_preference,
+        "providers": providers
+    })
+
+@chatbot_bp.route('/chatbot/stats', methods=['GET'])
+def stats():
+    """
+    Endpoint con estadísticas de rendimiento del proceso actual. No incluye las
+    plantillas de la caché de intenciones (mensajes de usuarios): ver
+    /chatbot/admin/cache/templates
+    """
+    chatbot_service = get_chatbot_service()
+    
+    return jsonify({
+        "status": "success",
+        "hedging": hedge_stats.snapshot(),
+        "local_first": local_first_stats.snapshot(),
+        "sanitizer": sanitize_cache_stats(),
+        "query_cache": query_cache_stats(),
+        "http_pool": http_client.stats(),
+        "intent_cache": chatbot_service.intent_cache.stats() if chatbot_service.intent_cache else None
+    })
+
+@chatbot_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Endpoint de métricas en el formato de texto de Prometheus: solicitudes, mensajes
+    por intención, llamadas a los proveedores, profundidad de la cascada y consultas
+    a la base de datos. Con METRICS_DIR suma los valores de todos los workers
+    """
+    if not metrics.enabled:
+        return jsonify({
+            "status": "error",
+            "message": "Las métricas están deshabilitadas"
+        }), 404
+    
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@chatbot_bp.route('/debug/traces', methods=['GET'])
+@require_admin_token
+def debug_traces():
+    """
+    Endpoint de depuración con las trazas de este worker: las más recientes y las más
+    lentas entre las muestreadas, con la duración de cada tramo. ?limit=N (20 por defecto)
     """
+    try:
+        limit = max(1, int(request.args.get('limit', 20)))
+    except ValueError:
+        return jsonify({
+            "status": "error",
+            "message": "El límite debe ser un número entero positivo"
+        }), 400
+    
+    return jsonify({
+        "status": "success",
+        "enabled": tracer.enabled,
+        "sample_rate": tracer.sample_rate,
+        **tracer.buffer.snapshot(limit)
+    })
+
+@chatbot_bp.route('/chatbot/admin/cache/templates', methods=['GET'])
+@require_admin_token
+def intent_cache_templates():
+    """
+    Endpoint de administración con las plantillas más frecuentes de la caché de
+    intenciones de este worker (?top=N, 10 por defecto)
+    """
+    chatbot_service = get_chatbot_service()
+    
+    if chatbot_service.intent_cache is None or chatbot_service.intent_cache.canonicalizer is None:
+        return jsonify({
+            "status": "error",
+            "message": "La canonicalización de la caché de intenciones está deshabilitada"
+        }), 400
+    
+    try:
+        top = max(1, int(request.args.get('top', 10)))
+    except ValueError:
+        return jsonify({
+            "status": "error",
+            "message": "El parámetro top debe ser un número entero positivo"
+        }), 400
+    
+    return jsonify({
+        "status": "success",
+        **chatbot_service.intent_cache.canonicalizer.stats(top=top)
+    })
+
+@chatbot_bp.route('/chatbot/admin/cache/flush', methods=['POST'])
+@require_admin_token
+def flush_intent_cache():
+    """
+    Endpoint de administración para vaciar la caché de intenciones
+    Vacía la caché en memoria de este worker y la tabla compartida por todos
+    """
+    chatbot_service = get_chatbot_service()
+    
+    if chatbot_service.intent_cache is None:
+        return jsonify({
+            "status": "error",
+            "message": "La caché de intenciones está deshabilitada"
+        }), 400
+    
+    deleted = chatbot_service.intent_cache.flush()
+    current_app.logger.info(f"Caché de intenciones vaciada ({deleted} entradas compartidas)")
+    
     return jsonify({
         "status": "success",
-        "message": "El servicio del chatbot está funcionando correctamente"
-    })
\ No newline at end of file
+        "message": "Caché de intenciones vaciada",
+        "shared_entries_deleted": deleted
+    })
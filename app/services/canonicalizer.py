@@ -0,0 +1,126 @@
+import re
+import threading
+import unicodedata
+from collections import Counter
+from app.utils.security import sanitize_input
+
+# Versión de las reglas de canonicalización: forma parte de la clave de la caché
+CANONICALIZER_VERSION = '1'
+
+# Marcador del slot numérico dentro de la plantilla
+NUMBER_SLOT = '<N>'
+
+# Palabras de relleno que no cambian la intención de la consulta
+FILLER_WORDS = {
+    'a', 'al', 'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'de', 'del',
+    'por', 'favor', 'me', 'mi', 'puedes', 'podrias', 'podria', 'quiero', 'quisiera',
+    'saber', 'dime', 'decirme', 'hola', 'oye', 'y', 'que', 'son', 'es', 'hay',
+    'actualmente', 'ahora', 'porfa', 'gracias', 'necesito', 'conocer', 'en', 'nuestra',
+    'nuestro', 'base', 'datos', 'sistema', 'registrados', 'registradas',
+}
+
+# Números escritos con letras que se tratan como slots numéricos
+NUMBER_WORDS = {
+    'uno': 1, 'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5, 'seis': 6, 'siete': 7,
+    'ocho': 8, 'nueve': 9, 'diez': 10, 'once': 11, 'doce': 12, 'quince': 15,
+    'veinte': 20, 'treinta': 30, 'cincuenta': 50, 'cien': 100,
+}
+
+TOKEN_PATTERN = re.compile(r'[a-zñ]+|\d+')
+
+class MessageCanonicalizer:
+    """
+    Convierte un mensaje en una plantilla con slots tipados para la caché de intenciones:
+    "¿Quiénes son los TOP 7 compradores?" -> ("quienes top <N> compradores", [7]).
+    Parte de la salida de sanitize_input, ignora mayúsculas, acentos, puntuación y
+    palabras de relleno, y extrae los números como slots para volver a rellenar el
+    parámetro limite con los valores del mensaje actual.
+    """
+
+    def __init__(self, max_tracked_templates=10000):
+        self.max_tracked_templates = max_tracked_templates
+        self._lock = threading.Lock()
+        self._templates = Counter()
+        self._untracked = 0
+        self.messages = 0
+
+    def canonicalize(self, message):
+        """Devuelve (plantilla, valores de los slots numéricos)"""
+        text = sanitize_input(message).lower()
+
+        # Quitar acentos conservando la ñ
+        text = text.replace('ñ', '\0')
+        text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+        text = text.replace('\0', 'ñ')
+
+        tokens = []
+        slots = []
+        for token in TOKEN_PATTERN.findall(text):
+            if token.isdigit():
+                tokens.append(NUMBER_SLOT)
+                slots.append(int(token))
+            elif token in NUMBER_WORDS:
+                tokens.append(NUMBER_SLOT)
+                slots.append(NUMBER_WORDS[token])
+            elif token not in FILLER_WORDS:
+                tokens.append(token)
+
+        return ' '.join(tokens), slots
+
+    def record(self, template):
+        """Cuenta el tráfico de cada plantilla para medir cuánto se agrupa"""
+        with self._lock:
+            self.messages += 1
+            if template in self._templates or len(self._templates) < self.max_tracked_templates:
+                self._templates[template] += 1
+            else:
+                self._untracked += 1
+
+    def stats(self, top=10, templates=True):
+        """
+        Qué fracción del tráfico se concentra en cuántas plantillas. Las plantillas son
+        mensajes de usuarios apenas normalizados: con templates=False no se incluyen
+        """
+        with self._lock:
+            total = self.messages
+            unique = len(self._templates)
+            most_common = self._templates.most_common(top)
+            top_share = sum(count for _, count in most_common)
+            result = {
+                "messages": total,
+                "templates": unique,
+                "untracked_messages": self._untracked,
+                # Fracción de mensajes que comparten plantilla con uno anterior
+                "collapse_ratio": round(1 - unique / total, 3) if total else 0.0,
+                f"top_{top}_share": round(top_share / total, 3) if total else 0.0,
+            }
+            if templates:
+                result["top_templates"] = [{"template": t, "messages": c} for t, c in most_common]
+            return result
+
+def abstract_parameters(parameters, slots):
+    """
+    Sustituye el limite por una referencia al slot del que proviene
+    ("<N0>" = primer número del mensaje) para reutilizarlo con otros valores
+    """
+    if not isinstance(parameters, dict) or 'limite' not in parameters:
+        return parameters
+    try:
+        limite = int(parameters['limite'])
+    except (ValueError, TypeError):
+        return parameters
+    if limite in slots:
+        return dict(parameters, limite=f"<N{slots.index(limite)}>")
+    return parameters
+
+def fill_parameters(parameters, slots):
+    """Rellena las referencias a slots con los valores del mensaje actual"""
+    if not isinstance(parameters, dict):
+        return parameters
+    limite = parameters.get('limite')
+    if isinstance(limite, str) and limite.startswith('<N') and limite.endswith('>'):
+        index = int(limite[2:-1])
+        if index < len(slots):
+            return dict(parameters, limite=slots[index])
+        return {k: v for k, v in parameters.items() if k != 'limite'}
+    return parameters
@@ -1,20 +1,55 @@
 from app.services.fallback_service import FallbackService
-from app.services.openai_service import OpenAIService
+from app.services.llm_provider import LLMProvider
+from app.services.prompts import resolve_version
+from app.services.hedging import HedgedIntentDetector, is_valid_intent
+from app.services.circuit_breaker import BreakerGuardedService, CircuitBreaker, circuit_breakers
+from app.services.intent_cache import IntentCache
+from app.services.canonicalizer import MessageCanonicalizer
+from app.services.local_first import ShadowChecker, is_confident, local_first_stats
+from app.utils.metrics import MeteredService, record_cascade_depth, record_intent_source, record_message
+from app.utils.tracing import span
 from app.models.database import (
     consultar_mejores_compradores,
     consultar_deudores_altos,
     contar_compradores,
-    contar_deudores
+    contar_deudores,
+    consultar_pagina_ranking,
+    iterar_ranking,
+    encode_cursor,
+    decode_cursor
 )
 from flask import current_app
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from pathlib import Path
+import asyncio
+import time
 import traceback
 
+# Campo de monto de cada fila según la intención (para formatear los resultados)
+ROW_AMOUNT_FIELDS = {
+    'mejores_compradores': 'total_compras',
+    'deudores_altos': 'monto_adeudado',
+}
+
+# Tabla de cada intención de ranking (paginación por cursor y exportación)
+RANKING_TABLES = {
+    'mejores_compradores': 'compradores',
+    'deudores_altos': 'deudores',
+}
+
 class ChatbotService:
     def __init__(self):
         self.deepseek_service = None
         self.openai_service = None
         self.fallback_service = None
         self.nlp_service_preference = None
+        self.hedged_detector = None
+        self.breaker_settings = None
+        self.intent_cache = None
+        self.local_first_threshold = None
+        self.shadow_checker = None
+        self._initialized = False
     
     def initialize(self):
         """Inicializa los servicios de detección de intenciones según configuración"""
@@ -31,7 +66,7 @@ class ChatbotService:
             if self.deepseek_service is None:
                 if current_app:
                     current_app.logger.info("Inicializando servicio DeepSeek...")
-                self.deepseek_service = OpenAIService(use_deepseek=True).initialize()
+                self.deepseek_service = LLMProvider('deepseek').initialize()
                 if self.deepseek_service is not None and current_app:
                     current_app.logger.info("Servicio DeepSeek inicializado correctamente")
                 else:
@@ -41,7 +76,7 @@ class ChatbotService:
             if self.openai_service is None:
                 if current_app:
                     current_app.logger.info("Inicializando servicio OpenAI...")
-                self.openai_service = OpenAIService(use_deepseek=False).initialize()
+                self.openai_service = LLMProvider('openai').initialize()
                 if self.openai_service is not None and current_app:
                     current_app.logger.info("Servicio OpenAI inicializado correctamente")
                 else:
@@ -52,7 +87,44 @@ class ChatbotService:
                 self.nlp_service_preference = current_app.config.get('NLP_SERVICE', 'auto')
                 if current_app:
                     current_app.logger.info(f"Preferencia de servicio NLP configurada: {self.nlp_service_preference}")
-                
+            
+            # Umbrales de los circuit breakers de los proveedores
+            if current_app.config.get('CIRCUIT_BREAKER_ENABLED', True):
+                self.breaker_settings = {
+                    "window_seconds": current_app.config.get('CIRCUIT_BREAKER_WINDOW', 60),
+                    "min_calls": current_app.config.get('CIRCUIT_BREAKER_MIN_CALLS', 10),
+                    "error_rate": current_app.config.get('CIRCUIT_BREAKER_ERROR_RATE', 0.5),
+                    "slow_call_seconds": current_app.config.get('CIRCUIT_BREAKER_SLOW_CALL_SECONDS', 10),
+                    "slow_call_rate": current_app.config.get('CIRCUIT_BREAKER_SLOW_CALL_RATE', 0.5),
+                    "open_seconds": current_app.config.get('CIRCUIT_BREAKER_OPEN_SECONDS', 30),
+                    "probe_ratio": current_app.config.get('CIRCUIT_BREAKER_PROBE_RATIO', 0.1),
+                }
+            
+            # Caché de intenciones (memoria del proceso + SQLite compartida entre workers),
+            # solo útil si hay algún proveedor LLM que consultar
+            has_llm = self.nlp_service_preference != 'fallback' and (
+                self.deepseek_service is not None or self.openai_service is not None
+            )
+            if current_app.config.get('INTENT_CACHE_ENABLED', True) and has_llm and self.intent_cache is None:
+                self.intent_cache = self._build_intent_cache()
+            
+            # Preparar el detector hedged si está configurado
+            if self.nlp_service_preference == 'hedged' and self.hedged_detector is None:
+                self.hedged_detector = HedgedIntentDetector(
+                    hedge_delay=current_app.config.get('HEDGE_DELAY_MS', 500) / 1000,
+                    timeout=current_app.config.get('HEDGE_TIMEOUT', 30),
+                    max_workers=current_app.config.get('HEDGE_MAX_WORKERS', 32)
+                )
+            
+            # Modo local_first: el detector local responde si su confianza supera el umbral
+            if self.nlp_service_preference == 'local_first' and self.local_first_threshold is None:
+                self.local_first_threshold = current_app.config.get('LOCAL_FIRST_THRESHOLD', 0.8)
+                shadow_rate = current_app.config.get('LOCAL_FIRST_SHADOW_RATE', 0)
+                if shadow_rate > 0 and has_llm:
+                    self.shadow_checker = ShadowChecker(shadow_rate)
+            
+            # Los proveedores sin API key quedan en None; no reintentar en cada mensaje
+            self._initialized = True
             return self
         except Exception as e:
             if current_app:
@@ -60,13 +132,46 @@ class ChatbotService:
                 current_app.logger.error(traceback.format_exc())
             return self  # Devolver self incluso con error para que al menos tengamos el fallback
     
-    def process_message(self, user_message):
+    def _build_intent_cache(self):
+        """Crea la caché de intenciones con un espacio de claves propio de la configuración actual"""
+        config = current_app.config
+        namespace = "|".join([
+            self.nlp_service_preference or 'auto',
+            str(config.get('DEEPSEEK_MODEL')),
+            str(config.get('OPENAI_MODEL')),
+            # Otro servidor (por ejemplo el simulado de las pruebas de carga) no comparte entradas
+            str(config.get('DEEPSEEK_BASE_URL')),
+            str(config.get('OPENAI_BASE_URL')),
+            resolve_version(config),
+        ])
+        
+        shared_db_path = None
+        if config.get('INTENT_CACHE_SHARED', True):
+            shared_db_path = config.get('INTENT_CACHE_DB_PATH') or str(
+                Path(current_app.root_path).parent / 'data' / 'intent_cache.db'
+            )
+        
+        # Agrupar variaciones triviales ("top 5"/"top 7", acentos, relleno) en una plantilla
+        canonicalizer = MessageCanonicalizer() if config.get('INTENT_CACHE_CANONICALIZE', True) else None
+        
+        return IntentCache(
+            namespace,
+            maxsize=config.get('INTENT_CACHE_SIZE', 10000),
+            ttl=config.get('INTENT_CACHE_TTL', 3600),
+            shared_db_path=shared_db_path,
+            canonicalizer=canonicalizer
+        )
+    
+    def process_message(self, user_message, cursor=None):
         """
-        Procesa el mensaje del usuario y genera una respuesta basada en la intención detectada
+        Procesa el mensaje del usuario y genera una respuesta basada en la intención detectada.
+        Con cursor (el next_cursor de una respuesta anterior) devuelve la página siguiente del ranking
         """
+        start = time.perf_counter()
+        intent = 'desconocido'
         try:
             # Inicializar los servicios si es necesario
-            if self.deepseek_service is None or self.openai_service is None or self.fallback_service is None:
+            if not self._initialized or self.fallback_service is None:
                 if current_app:
                     current_app.logger.info("Servicios no inicializados, inicializando ahora...")
                 self.initialize()
@@ -75,7 +180,8 @@ class ChatbotService:
             if current_app:
                 current_app.logger.info(f"Procesando mensaje: '{user_message}'")
             
-            intent_data = self._detect_intent(user_message)
+            with span('detect'):
+                intent_data = self._detect_intent(user_message)
             intent = intent_data.get('intent', 'desconocido')
             parameters = intent_data.get('parameters', {})
             
@@ -84,159 +190,528 @@ class ChatbotService:
                 current_app.logger.info(f"Intención detectada: {intent}, parámetros: {parameters}")
             
             # Procesar la intención detectada
-            if intent == "mejores_compradores":
-                if current_app:
-                    current_app.logger.info("Manejando intención: mejores_compradores")
-                return self._handle_mejores_compradores(parameters)
-            elif intent == "deudores_altos":
-                if current_app:
-                    current_app.logger.info("Manejando intención: deudores_altos")
-                return self._handle_deudores_altos(parameters)
-            elif intent == "contar_compradores":
-                if current_app:
-                    current_app.logger.info("Manejando intención: contar_compradores")
-                return self._handle_contar_compradores()
-            elif intent == "contar_deudores":
-                if current_app:
-                    current_app.logger.info("Manejando intención: contar_deudores")
-                return self._handle_contar_deudores()
-            else:
-                if current_app:
-                    current_app.logger.warning(f"Intención desconocida: {intent}")
-                return {
-                    "status": "error",
-                    "message": "No he entendido tu consulta. Por favor, intenta preguntar sobre los compradores o deudores de nuestra base de datos."
-                }
+            with span('dispatch'):
+                response = self._dispatch_intent(intent, self._with_cursor(parameters, cursor))
         
         except Exception as e:
             if current_app:
                 current_app.logger.error(f"Error en el procesamiento del chatbot: {str(e)}")
                 current_app.logger.error(traceback.format_exc())
-            return {
+            response = {
                 "status": "error",
                 "message": "Ocurrió un error al procesar tu consulta."
             }
+        
+        record_message(intent, response.get("status"), time.perf_counter() - start)
+        return response
     
-    def _detect_intent(self, user_message):
-        """Detecta la intención utilizando el servicio apropiado según configuración"""
-        service_to_use = self.nlp_service_preference
-        
-        # Si está configurado como 'auto', decidir basado en disponibilidad
-        if service_to_use == 'auto':
-            if self.deepseek_service is not None:
-                service_to_use = 'deepseek'
-            elif self.openai_service is not None:
-                service_to_use = 'openai'
-            else:
-                service_to_use = 'fallback'
+    async def process_message_async(self, user_message, cursor=None):
+        """
+        Versión asíncrona de process_message para el servidor ASGI.
+        Las llamadas a los proveedores LLM no bloquean el event loop y las consultas
+        a la base de datos se ejecutan en un hilo con su propio contexto de aplicación
+        """
+        start = time.perf_counter()
+        intent = 'desconocido'
+        try:
+            if not self._initialized or self.fallback_service is None:
+                self.initialize()
+            
+            if current_app:
+                current_app.logger.info(f"Procesando mensaje (async): '{user_message}'")
+            
+            with span('detect'):
+                intent_data = await self._detect_intent_async(user_message)
+            intent = intent_data.get('intent', 'desconocido')
+            parameters = intent_data.get('parameters', {})
+            
+            if current_app:
+                current_app.logger.info(f"Intención detectada: {intent}, parámetros: {parameters}")
+            
+            # SQLite es bloqueante: sacar la consulta del event loop
+            app = current_app._get_current_object()
+            
+            def dispatch():
+                with app.app_context(), span('dispatch'):
+                    return self._dispatch_intent(intent, self._with_cursor(parameters, cursor))
+            
+            response = await asyncio.to_thread(dispatch)
         
-        # Registrar el servicio seleccionado
-        if current_app:
-            current_app.logger.info(f"Servicio seleccionado para detectar intención: {service_to_use}")
+        except Exception as e:
+            if current_app:
+                current_app.logger.error(f"Error en el procesamiento del chatbot (async): {str(e)}")
+                current_app.logger.error(traceback.format_exc())
+            response = {
+                "status": "error",
+                "message": "Ocurrió un error al procesar tu consulta."
+            }
         
-        # Usar DeepSeek
-        if service_to_use == 'deepseek' and self.deepseek_service is not None:
+        record_message(intent, response.get("status"), time.perf_counter() - start)
+        return response
+    
+    async def _detect_intent_async(self, user_message):
+        """Versión asíncrona de _detect_intent (con la misma caché de intenciones)"""
+        start = time.perf_counter()
+        local_data, confident = self._detect_local(user_message)
+        if confident:
+            record_intent_source('local')
+            return local_data
+        
+        intent_data, source = None, None
+        if self.intent_cache is not None:
+            # El nivel en memoria es inmediato; la tabla SQLite se consulta fuera del event loop
+            with span('cache.get'):
+                cached, lookup = self.intent_cache.get_local(user_message)
+                if cached is None:
+                    cached = await asyncio.to_thread(self.intent_cache.get_shared, lookup)
+            if cached is not None:
+                intent_data, source = cached, 'cache'
+        
+        if intent_data is None:
+            intent_data, source = await self._detect_intent_uncached_async(user_message)
+            
+            if self.intent_cache is not None and source != 'fallback':
+                with span('cache.set'):
+                    await asyncio.to_thread(self.intent_cache.set, user_message, intent_data)
+        
+        record_intent_source(source)
+        if local_data is not None:
+            local_first_stats.record_escalation(local_data, intent_data, source, time.perf_counter() - start)
+        return intent_data
+    
+    async def _detect_intent_uncached_async(self, user_message):
+        """Detecta la intención recorriendo los proveedores LLM de forma asíncrona"""
+        chain = self._provider_chain()
+        if self.nlp_service_preference == 'hedged' and self.hedged_detector is not None:
+            intent_data, source = await self.hedged_detector.detect_async(chain, self._metered_fallback(), user_message)
+            record_cascade_depth(chain, source)
+            return intent_data, source
+        
+        for name, service in chain:
             try:
-                if current_app:
-                    current_app.logger.info("Intentando detectar intención con DeepSeek...")
-                
-                intent_data = self.deepseek_service.detect_intent(user_message)
-                
-                # Verificar si hay error en la respuesta
-                if 'error' in intent_data and intent_data.get('intent') == 'desconocido':
-                    if current_app:
-                        current_app.logger.warning(f"Error con DeepSeek: {intent_data.get('error')}. Intentando con OpenAI.")
-                    
-                    # Intentar con OpenAI como segundo respaldo
-                    if self.openai_service is not None:
-                        try:
-                            if current_app:
-                                current_app.logger.info("Intentando detectar intención con OpenAI...")
-                            
-                            intent_data = self.openai_service.detect_intent(user_message)
-                            
-                            if 'error' not in intent_data or intent_data.get('intent') != 'desconocido':
-                                if current_app:
-                                    current_app.logger.info("Intención detectada correctamente con OpenAI")
-                                return intent_data
-                            else:
-                                if current_app:
-                                    current_app.logger.warning(f"Error con OpenAI: {intent_data.get('error')}. Usando fallback.")
-                        except Exception as e:
-                            if current_app:
-                                current_app.logger.error(f"Excepción con OpenAI: {str(e)}")
-                    
-                    # Si todo falla, usar fallback
+                intent_data = await service.detect_intent_async(user_message)
+                if is_valid_intent(intent_data):
                     if current_app:
-                        current_app.logger.info("Usando servicio de fallback como último recurso")
-                    return self.fallback_service.detect_intent(user_message)
+                        current_app.logger.info(f"Intención detectada correctamente con {name}")
+                    record_cascade_depth(chain, name)
+                    return intent_data, name
                 
                 if current_app:
-                    current_app.logger.info("Intención detectada correctamente con DeepSeek")
-                return intent_data
-            
+                    current_app.logger.warning(f"Error con {name}: {intent_data.get('error') if isinstance(intent_data, dict) else intent_data}")
             except Exception as e:
                 if current_app:
-                    current_app.logger.error(f"Excepción al usar DeepSeek: {str(e)}")
-                    current_app.logger.error(traceback.format_exc())
-                    current_app.logger.info("Intentando con OpenAI después de excepción...")
-                
-                # Intentar con OpenAI como segundo respaldo
-                if self.openai_service is not None:
+                    current_app.logger.error(f"Excepción con {name}: {str(e)}")
+        
+        # Si todo falla (o no hay proveedores configurados), usar fallback
+        if current_app:
+            current_app.logger.info("Usando servicio de fallback")
+        record_cascade_depth(chain, 'fallback')
+        return self._metered_fallback().detect_intent(user_message), 'fallback'
+    
+    def _dispatch_intent(self, intent, parameters):
+        """Ejecuta el manejador correspondiente a la intención detectada"""
+        if intent == "mejores_compradores":
+            if current_app:
+                current_app.logger.info("Manejando intención: mejores_compradores")
+            return self._handle_mejores_compradores(parameters)
+        elif intent == "deudores_altos":
+            if current_app:
+                current_app.logger.info("Manejando intención: deudores_altos")
+            return self._handle_deudores_altos(parameters)
+        elif intent == "contar_compradores":
+            if current_app:
+                current_app.logger.info("Manejando intención: contar_compradores")
+            return self._handle_contar_compradores()
+        elif intent == "contar_deudores":
+            if current_app:
+                current_app.logger.info("Manejando intención: contar_deudores")
+            return self._handle_contar_deudores()
+        else:
+            if current_app:
+                current_app.logger.warning(f"Intención desconocida: {intent}")
+            return {
+                "status": "error",
+                "message": "No he entendido tu consulta. Por favor, intenta preguntar sobre los compradores o deudores de nuestra base de datos."
+            }
+    
+    def process_batch(self, messages, max_workers=8):
+        """
+        Procesa una lista de mensajes y devuelve las respuestas en el mismo orden.
+        Los mensajes idénticos se clasifican una sola vez, los únicos se clasifican en
+        paralelo con un pool acotado y cada consulta a la base de datos se ejecuta una
+        vez por cada (intención, límite) distinto. Los errores se reportan por elemento.
+        """
+        if not self._initialized or self.fallback_service is None:
+            self.initialize()
+        
+        unique_messages = list(dict.fromkeys(m.strip() for m in messages if isinstance(m, str) and m.strip()))
+        
+        if current_app:
+            current_app.logger.info(f"Procesando lote: {len(messages)} mensajes, {len(unique_messages)} únicos")
+        
+        # Clasificar los mensajes únicos en paralelo; cada hilo necesita su propio contexto de aplicación
+        app = current_app._get_current_object()
+        
+        def classify(message):
+            with app.app_context():
+                return self._detect_intent(message)
+        
+        intents = {}
+        if unique_messages:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique_messages)))) as executor:
+                # Cada hilo hereda la traza de la solicitud para que sus tramos se registren
+                futures = {
+                    message: executor.submit(contextvars.copy_context().run, classify, message)
+                    for message in unique_messages
+                }
+                for message, future in futures.items():
                     try:
-                        intent_data = self.openai_service.detect_intent(user_message)
-                        if 'error' not in intent_data or intent_data.get('intent') != 'desconocido':
-                            if current_app:
-                                current_app.logger.info("Intención detectada correctamente con OpenAI después de fallar DeepSeek")
-                            return intent_data
-                    except Exception as e2:
+                        intents[message] = future.result()
+                    except Exception as e:
                         if current_app:
-                            current_app.logger.error(f"Excepción con OpenAI: {str(e2)}")
-                
-                # Si todo falla, usar fallback
-                if current_app:
-                    current_app.logger.info("Usando servicio de fallback como último recurso después de fallos")
-                return self.fallback_service.detect_intent(user_message)
+                            current_app.logger.error(f"Error al clasificar mensaje del lote: {str(e)}")
+                        intents[message] = None
         
-        # Usar OpenAI
-        elif service_to_use == 'openai' and self.openai_service is not None:
+        # Agrupar por (intención, límite) para ejecutar cada consulta una sola vez
+        responses_by_key = {}
+        results = []
+        for message in messages:
+            if not isinstance(message, str):
+                results.append({
+                    "status": "error",
+                    "message": "El mensaje debe ser un texto"
+                })
+                continue
+            
+            if not message.strip():
+                results.append({
+                    "status": "error",
+                    "message": "El mensaje no puede estar vacío"
+                })
+                continue
+            
+            intent_data = intents.get(message.strip())
+            if intent_data is None:
+                results.append({
+                    "status": "error",
+                    "message": "Ocurrió un error al procesar tu consulta."
+                })
+                continue
+            
             try:
-                if current_app:
-                    current_app.logger.info("Intentando detectar intención con OpenAI...")
+                intent = intent_data.get('intent', 'desconocido')
+                parameters = intent_data.get('parameters', {})
                 
-                intent_data = self.openai_service.detect_intent(user_message)
+                if intent in ('mejores_compradores', 'deudores_altos'):
+                    key = (intent, self._normalize_limite(parameters))
+                    parameters = {'limite': key[1]}
+                else:
+                    key = (intent, None)
                 
-                # Verificar si hay error en la respuesta
-                if 'error' in intent_data and intent_data.get('intent') == 'desconocido':
-                    if current_app:
-                        current_app.logger.warning(f"Error con OpenAI: {intent_data.get('error')}. Usando fallback.")
-                    return self.fallback_service.detect_intent(user_message)
+                if key not in responses_by_key:
+                    responses_by_key[key] = self._dispatch_intent(intent, parameters)
                 
-                if current_app:
-                    current_app.logger.info("Intención detectada correctamente con OpenAI")
-                return intent_data
-            
+                results.append(dict(responses_by_key[key], intent=intent))
             except Exception as e:
                 if current_app:
-                    current_app.logger.error(f"Excepción al usar OpenAI: {str(e)}")
+                    current_app.logger.error(f"Error al procesar mensaje del lote: {str(e)}")
                     current_app.logger.error(traceback.format_exc())
-                    current_app.logger.info("Usando servicio de fallback después de excepción con OpenAI")
-                return self.fallback_service.detect_intent(user_message)
+                results.append({
+                    "status": "error",
+                    "message": "Ocurrió un error al procesar tu consulta."
+                })
+        
+        return {
+            "results": results,
+            "stats": {
+                "total": len(messages),
+                "unique": len(unique_messages),
+                "queries": len(responses_by_key)
+            }
+        }
+    
+    def _provider_chain(self):
+        """
+        Devuelve la lista ordenada de proveedores LLM (nombre, servicio) a intentar
+        según la preferencia configurada, antes de recurrir al fallback
+        """
+        preference = self.nlp_service_preference
+        
+        if preference in ('auto', 'hedged', 'local_first'):
+            chain = [('deepseek', self.deepseek_service), ('openai', self.openai_service)]
+        elif preference == 'deepseek':
+            # Sin DeepSeek disponible se usa directamente el fallback
+            if self.deepseek_service is None:
+                return []
+            chain = [('deepseek', self.deepseek_service), ('openai', self.openai_service)]
+        elif preference == 'openai':
+            chain = [('openai', self.openai_service)]
+        else:
+            chain = []
+        
+        # Cada llamada real a un proveedor se mide (las rechazadas por el breaker no llegan aquí)
+        chain = [(name, MeteredService(name, service)) for name, service in chain if service is not None]
+        
+        # Cada proveedor pasa por su circuit breaker (se salta de inmediato si está abierto)
+        if self.breaker_settings is not None:
+            chain = [
+                (name, BreakerGuardedService(service, circuit_breakers.get(name, **self.breaker_settings)))
+                for name, service in chain
+            ]
+        
+        return chain
+    
+    def _metered_fallback(self):
+        """El fallback local como último detector de la cascada, con sus llamadas medidas"""
+        return MeteredService('fallback', self.fallback_service)
+    
+    def stream_message(self, user_message, cursor=None):
+        """
+        Procesa el mensaje generando eventos progresivos (evento, datos):
+        'intent' en cuanto se conoce la intención, 'parameters' con la intención final,
+        'row' por cada fila del resultado y 'done' con la respuesta completa
+        """
+        message_start = time.perf_counter()
+        try:
+            if not self._initialized or self.fallback_service is None:
+                self.initialize()
+            
+            if current_app:
+                current_app.logger.info(f"Procesando mensaje en streaming: '{user_message}'")
+            
+            intent_data = None
+            announced_intent = None
+            source = None
+            start = time.perf_counter()
+            
+            # Modo local_first: si el detector local está seguro no se consulta ningún proveedor
+            local_data, confident = self._detect_local(user_message)
+            if confident:
+                intent_data = local_data
+                announced_intent = local_data.get('intent', 'desconocido')
+                source = 'local'
+                yield "intent", {"intent": announced_intent, "provider": "local"}
+            
+            # Con un acierto de caché la intención se conoce de inmediato
+            cached = self.intent_cache.get(user_message) if self.intent_cache is not None and source is None else None
+            if cached is not None:
+                intent_data = cached
+                announced_intent = cached.get('intent', 'desconocido')
+                source = 'cache'
+                yield "intent", {"intent": announced_intent, "provider": "cache"}
+            
+            chain = [] if source is not None else self._provider_chain()
+            for name, service in chain:
+                for event in service.stream_intent(user_message):
+                    if event["type"] == "intent":
+                        announced_intent = event["intent"]
+                        yield "intent", {"intent": announced_intent, "provider": name}
+                    elif event["type"] == "result":
+                        intent_data = event["data"]
+                
+                if is_valid_intent(intent_data):
+                    if self.intent_cache is not None:
+                        self.intent_cache.set(user_message, intent_data)
+                    source = name
+                    break
+                
+                if current_app:
+                    current_app.logger.warning(f"Error en streaming con {name}: {intent_data.get('error') if intent_data else None}")
+                intent_data = None
+            
+            # Si ningún proveedor respondió correctamente, usar el fallback
+            if intent_data is None:
+                intent_data = local_data if local_data is not None else self._metered_fallback().detect_intent(user_message)
+                source = 'fallback'
+            
+            record_intent_source(source)
+            if source not in ('local', 'cache'):
+                record_cascade_depth(chain, source)
+            
+            if local_data is not None and source != 'local':
+                local_first_stats.record_escalation(local_data, intent_data, source, time.perf_counter() - start)
+            
+            intent = intent_data.get('intent', 'desconocido')
+            parameters = intent_data.get('parameters', {})
+            
+            # Corregir la intención anunciada si el resultado final es distinto
+            if intent != announced_intent:
+                yield "intent", {"intent": intent, "provider": None}
+            yield "parameters", {"intent": intent, "parameters": parameters}
+            
+            with span('dispatch'):
+                response = self._dispatch_intent(intent, self._with_cursor(parameters, cursor))
+            
+            # Enviar las filas del resultado una a una
+            amount_field = ROW_AMOUNT_FIELDS.get(intent)
+            if amount_field and isinstance(response.get("data"), list):
+                for position, row in enumerate(response["data"], response.get("first_position", 1)):
+                    yield "row", {
+                        "position": position,
+                        "text": self._format_row(position, row, amount_field),
+                        "row": row
+                    }
+            
+            record_message(intent, response.get("status"), time.perf_counter() - message_start)
+            yield "done", response
+        
+        except Exception as e:
+            if current_app:
+                current_app.logger.error(f"Error en el procesamiento en streaming del chatbot: {str(e)}")
+                current_app.logger.error(traceback.format_exc())
+            record_message('desconocido', 'error', time.perf_counter() - message_start)
+            yield "done", {
+                "status": "error",
+                "message": "Ocurrió un error al procesar tu consulta."
+            }
+    
+    def _detect_local(self, user_message):
+        """
+        Paso previo del modo local_first: devuelve (intención local, segura).
+        Fuera de ese modo devuelve (None, False) y no hace nada
+        """
+        if self.nlp_service_preference != 'local_first' or self.local_first_threshold is None:
+            return None, False
+        
+        start = time.perf_counter()
+        local_data = self.fallback_service.detect_intent(user_message)
+        if not is_confident(local_data, self.local_first_threshold):
+            if current_app:
+                current_app.logger.info(f"Confianza local insuficiente ({local_data.get('confidence', 0)}), escalando a los proveedores LLM")
+            return local_data, False
+        
+        local_first_stats.record_local(time.perf_counter() - start)
+        if current_app:
+            current_app.logger.info(f"Intención resuelta localmente: {local_data.get('intent')}")
+        if self.shadow_checker is not None:
+            self.shadow_checker.maybe_check(user_message, local_data.get('intent'), self._detect_intent_shadow)
+        return local_data, True
+    
+    def _detect_intent(self, user_message):
+        """
+        Detecta la intención utilizando el servicio apropiado según configuración.
+        Las intenciones obtenidas de un proveedor LLM se guardan en la caché de intenciones
+        """
+        start = time.perf_counter()
+        local_data, confident = self._detect_local(user_message)
+        if confident:
+            record_intent_source('local')
+            return local_data
+        
+        intent_data, source = None, None
+        if self.intent_cache is not None:
+            with span('cache.get'):
+                cached = self.intent_cache.get(user_message)
+            if cached is not None:
+                if current_app:
+                    current_app.logger.info(f"Intención obtenida de la caché: {cached.get('intent')}")
+                intent_data, source = cached, 'cache'
+        
+        if intent_data is None:
+            intent_data, source = self._detect_intent_uncached(user_message)
+            
+            # El resultado del fallback no se guarda: es barato y no debe tapar al LLM
+            if self.intent_cache is not None and source != 'fallback':
+                with span('cache.set'):
+                    self.intent_cache.set(user_message, intent_data)
+        
+        record_intent_source(source)
+        if local_data is not None:
+            local_first_stats.record_escalation(local_data, intent_data, source, time.perf_counter() - start)
+        return intent_data
+    
+    def _detect_intent_uncached(self, user_message):
+        """Recorre los proveedores según configuración; devuelve (intención, origen)"""
+        chain = self._provider_chain()
+        
+        # Modo hedged: carrera entre proveedores con el fallback en paralelo
+        if self.nlp_service_preference == 'hedged' and self.hedged_detector is not None:
+            if current_app:
+                current_app.logger.info("Detectando intención en modo hedged")
+            intent_data, source = self.hedged_detector.detect(chain, self._metered_fallback(), user_message)
+            record_cascade_depth(chain, source)
+            return intent_data, source
+        
+        
+        # Registrar el servicio seleccionado
+        if current_app:
+            service_to_use = chain[0][0] if chain else 'fallback'
+            current_app.logger.info(f"Servicio seleccionado para detectar intención: {service_to_use}")
+        
+        # Intentar cada proveedor en orden; el siguiente solo se usa si el anterior falla
+        for name, service in chain:
+            intent_data = self._call_provider(name, service, user_message)
+            if intent_data is not None:
+                record_cascade_depth(chain, name)
+                return intent_data, name
         
         # Usar fallback en cualquier otro caso
         if current_app:
-            if service_to_use != 'fallback':
-                current_app.logger.info(f"Servicio {service_to_use} no disponible, usando fallback.")
+            if chain:
+                current_app.logger.info("Usando servicio de fallback como último recurso")
+            elif self.nlp_service_preference not in ('fallback', 'auto', 'local_first'):
+                current_app.logger.info(f"Servicio {self.nlp_service_preference} no disponible, usando fallback.")
             else:
                 current_app.logger.info("Usando servicio de fallback por configuración.")
-                
-        return self.fallback_service.detect_intent(user_message)
+        
+        record_cascade_depth(chain, 'fallback')
+        return self._metered_fallback().detect_intent(user_message), 'fallback'
     
-    def _handle_mejores_compradores(self, parameters):
-        """Maneja la intención de consultar los mejores compradores"""
+    def _detect_intent_shadow(self, user_message):
+        """
+        Detección de las verificaciones en segundo plano de local_first; devuelve
+        (intención, origen). Llama a los proveedores directamente, sin MeteredService,
+        sin circuit breaker ni hedging, para que ese tráfico no cuente en las métricas
+        de proveedores y de la cascada ni en las ventanas de los breakers. Los
+        proveedores con el circuito abierto o semiabierto se saltan
+        """
+        for name, service in (('deepseek', self.deepseek_service), ('openai', self.openai_service)):
+            if service is None:
+                continue
+            if self.breaker_settings is not None:
+                if circuit_breakers.get(name, **self.breaker_settings).state != CircuitBreaker.CLOSED:
+                    continue
+            try:
+                intent_data = service.detect_intent(user_message)
+            except Exception as e:
+                if current_app:
+                    current_app.logger.warning(f"Error en la verificación en segundo plano con {name}: {str(e)}")
+                continue
+            if is_valid_intent(intent_data):
+                return intent_data, name
+        return None, 'fallback'
+    
+    def _call_provider(self, name, service, user_message):
+        """
+        Llama a un proveedor LLM y devuelve su intención, o None si falló
+        (error en la respuesta o excepción) para continuar con el siguiente
+        """
+        try:
+            if current_app:
+                current_app.logger.info(f"Intentando detectar intención con {name}...")
+            
+            intent_data = service.detect_intent(user_message)
+            
+            # Verificar si hay error en la respuesta
+            if not is_valid_intent(intent_data):
+                if current_app:
+                    current_app.logger.warning(f"Error con {name}: {intent_data.get('error') if isinstance(intent_data, dict) else intent_data}")
+                return None
+            
+            if current_app:
+                current_app.logger.info(f"Intención detectada correctamente con {name}")
+            return intent_data
+        
+        except Exception as e:
+            if current_app:
+                current_app.logger.error(f"Excepción al usar {name}: {str(e)}")
+                current_app.logger.error(traceback.format_exc())
+            return None
+    
+    def _normalize_limite(self, parameters):
+        """Valida y convierte el parámetro límite, usando 3 por defecto"""
         limite = parameters.get('limite', 3)
         
-        # Validar y convertir el límite
         try:
             limite = int(limite)
             if limite <= 0:
@@ -244,71 +719,155 @@ class ChatbotService:
         except (ValueError, TypeError):
             limite = 3
         
+        return limite
+    
+    def _format_row(self, position, row, amount_field):
+        """Formatea una fila del resultado como una línea de la respuesta"""
+        return f"{position}. {row['nombre']} - ${row[amount_field]:.2f}"
+    
+    def _with_cursor(self, parameters, cursor):
+        """Agrega el cursor de paginación de la solicitud a los parámetros detectados"""
+        if cursor is None:
+            return parameters
+        return dict(parameters, cursor=cursor)
+    
+    def _max_limite(self, config_key, default):
+        return current_app.config.get(config_key, default) if current_app else default
+    
+    def _ranking_page(self, intent, parameters):
+        """
+        Lee la página del ranking que corresponde a los parámetros: como mucho MAX_LIMITE
+        filas, empezando por la posición del cursor si lo hay. Devuelve (filas, posición
+        de la primera fila, límite pedido, cursor de la página siguiente o None).
+        Lanza ValueError si el cursor no es válido
+        """
+        tabla = RANKING_TABLES[intent]
+        limite = self._normalize_limite(parameters)
+        page_size = min(limite, self._max_limite('MAX_LIMITE', 100))
+        
+        cursor = parameters.get('cursor')
+        if cursor is None:
+            served = 0
+            if intent == 'mejores_compradores':
+                rows = consultar_mejores_compradores(page_size)
+            else:
+                rows = consultar_deudores_altos(page_size)
+        else:
+            position, served = decode_cursor(cursor, tabla)
+            page_size = min(page_size, max(limite - served, 0))
+            rows = consultar_pagina_ranking(tabla, page_size, position) if page_size else []
+        
+        next_cursor = None
+        if rows and len(rows) == page_size and served + len(rows) < limite:
+            next_cursor = encode_cursor(tabla, rows[-1], served + len(rows))
+        return rows, served + 1, limite, next_cursor
+    
+    def _ranking_response(self, rows, first_position, limite, next_cursor, title, amount_field):
+        """Respuesta de una página del ranking; el mensaje solo incluye las filas de la página"""
+        if first_position == 1 and next_cursor is None:
+            header = f"Los {len(rows)} {title} son:"
+        else:
+            last_position = first_position + len(rows) - 1
+            header = f"{title[0].upper()}{title[1:]} del {first_position} al {last_position} (de {limite} pedidos):"
+        lines = [header]
+        lines.extend(self._format_row(position, row, amount_field) for position, row in enumerate(rows, first_position))
+        
+        return {
+            "status": "success",
+            "message": "\n".join(lines),
+            "data": rows,
+            "first_position": first_position,
+            "next_cursor": next_cursor
+        }
+    
+    def _handle_mejores_compradores(self, parameters):
+        """Maneja la intención de consultar los mejores compradores"""
+        limite = self._normalize_limite(parameters)
+        
         if current_app:
             current_app.logger.info(f"Consultando mejores compradores con límite: {limite}")
         
-        compradores = consultar_mejores_compradores(limite)
+        try:
+            compradores, first_position, limite, next_cursor = self._ranking_page('mejores_compradores', parameters)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
         
         if not compradores:
             if current_app:
                 current_app.logger.warning("No se encontraron compradores")
             return {
                 "status": "success",
-                "message": "No hay compradores registrados en el sistema."
+                "message": "No hay compradores registrados en el sistema." if first_position == 1 else "No hay más compradores.",
+                "next_cursor": None
             }
         
-        # Formato de la respuesta
-        message = f"Los {len(compradores)} mejores compradores son:\n"
-        for i, comprador in enumerate(compradores, 1):
-            message += f"{i}. {comprador['nombre']} - ${comprador['total_compras']:.2f}\n"
-        
         if current_app:
             current_app.logger.info(f"Respuesta generada para mejores compradores: {len(compradores)} resultados")
         
-        return {
-            "status": "success",
-            "message": message.strip(),
-            "data": compradores
-        }
+        return self._ranking_response(
+            compradores, first_position, limite, next_cursor, 'mejores compradores', 'total_compras'
+        )
     
     def _handle_deudores_altos(self, parameters):
         """Maneja la intención de consultar los deudores con montos más altos"""
-        limite = parameters.get('limite', 3)
-        
-        # Validar y convertir el límite
-        try:
-            limite = int(limite)
-            if limite <= 0:
-                limite = 3
-        except (ValueError, TypeError):
-            limite = 3
+        limite = self._normalize_limite(parameters)
         
         if current_app:
             current_app.logger.info(f"Consultando deudores altos con límite: {limite}")
         
-        deudores = consultar_deudores_altos(limite)
+        try:
+            deudores, first_position, limite, next_cursor = self._ranking_page('deudores_altos', parameters)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
         
         if not deudores:
             if current_app:
                 current_app.logger.warning("No se encontraron deudores")
             return {
                 "status": "success",
-                "message": "No hay deudores registrados en el sistema."
+                "message": "No hay deudores registrados en el sistema." if first_position == 1 else "No hay más deudores.",
+                "next_cursor": None
             }
         
-        # Formato de la respuesta
-        message = f"Los {len(deudores)} deudores con montos más altos son:\n"
-        for i, deudor in enumerate(deudores, 1):
-            message += f"{i}. {deudor['nombre']} - ${deudor['monto_adeudado']:.2f}\n"
-        
         if current_app:
             current_app.logger.info(f"Respuesta generada para deudores altos: {len(deudores)} resultados")
         
-        return {
-            "status": "success",
-            "message": message.strip(),
-            "data": deudores
-        }
+        return self._ranking_response(
+            deudores, first_position, limite, next_cursor, 'deudores con montos más altos', 'monto_adeudado'
+        )
+    
+    def export_ranking(self, user_message, limite=None, cursor=None):
+        """
+        Detecta la intención del mensaje y devuelve (intención, generador de filas) para
+        exportar un ranking completo en streaming, hasta EXPORT_MAX_ROWS filas. Con limite
+        se ignora el detectado; con cursor se continúa donde terminó una página.
+        Devuelve (intención, None) si la intención no es un ranking.
+        Lanza ValueError si el cursor no es válido
+        """
+        if not self._initialized or self.fallback_service is None:
+            self.initialize()
+        
+        intent_data = self._detect_intent(user_message)
+        intent = intent_data.get('intent', 'desconocido')
+        if intent not in RANKING_TABLES:
+            return intent, None
+        
+        tabla = RANKING_TABLES[intent]
+        amount_field = ROW_AMOUNT_FIELDS[intent]
+        if limite is None:
+            limite = self._normalize_limite(intent_data.get('parameters', {}))
+        limite = min(limite, self._max_limite('EXPORT_MAX_ROWS', 1000000))
+        
+        position, served = (None, 0) if cursor is None else decode_cursor(cursor, tabla)
+        
+        if current_app:
+            current_app.logger.info(f"Exportando {intent}: hasta {limite} filas desde la posición {served + 1}")
+        
+        def rows():
+            for number, row in enumerate(iterar_ranking(tabla, max(limite - served, 0), position), served + 1):
+                yield {"position": number, "id": row['id'], "nombre": row['nombre'], amount_field: row[amount_field]}
+        
+        return intent, rows()
     
     def _handle_contar_compradores(self):
         """Maneja la intención de contar el número total de compradores"""
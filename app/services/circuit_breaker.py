@@ -0,0 +1,239 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from app.services.hedging import is_valid_intent
+
+class CircuitBreaker:
+    """
+    Circuit breaker por proveedor basado en una ventana deslizante de llamadas.
+    - closed: todas las llamadas pasan; se abre si la tasa de errores o de llamadas
+      lentas de la ventana supera el umbral (con un mínimo de llamadas)
+    - open: las llamadas se rechazan de inmediato durante open_seconds
+    - half_open: solo una pequeña fracción del tráfico prueba el proveedor; tras
+      varias pruebas correctas se cierra, y con un fallo vuelve a abrirse
+    El estado es compartido por todos los hilos del proceso.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, window_seconds=60, min_calls=10, error_rate=0.5,
+                 slow_call_seconds=10.0, slow_call_rate=0.5, open_seconds=30,
+                 probe_ratio=0.1, half_open_successes=3, max_probes=2):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = deque()  # (instante, ok, lenta)
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._probes_in_flight = 0
+        self._half_open_successes = 0
+        self.configure(
+            window_seconds=window_seconds,
+            min_calls=min_calls,
+            error_rate=error_rate,
+            slow_call_seconds=slow_call_seconds,
+            slow_call_rate=slow_call_rate,
+            open_seconds=open_seconds,
+            probe_ratio=probe_ratio,
+            half_open_successes=half_open_successes,
+            max_probes=max_probes,
+        )
+
+    def configure(self, **settings):
+        """Actualiza los umbrales del breaker"""
+        with self._lock:
+            for key, value in settings.items():
+                setattr(self, key, value)
+
+    def _prune(self, now):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        self._probes_in_flight = 0
+        self._half_open_successes = 0
+
+    def allow_request(self):
+        """Indica si se puede llamar al proveedor ahora (reserva una prueba en half_open)"""
+        with self._lock:
+            now = time.monotonic()
+
+            if self.state == self.OPEN:
+                if now - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probes_in_flight = 0
+                self._half_open_successes = 0
+
+            if self.state == self.HALF_OPEN:
+                if self._probes_in_flight >= self.max_probes or random.random() >= self.probe_ratio:
+                    self.rejected += 1
+                    return False
+                self._probes_in_flight += 1
+
+            return True
+
+    def record(self, ok, latency):
+        """Registra el resultado de una llamada permitida"""
+        with self._lock:
+            now = time.monotonic()
+            slow = latency >= self.slow_call_seconds
+
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if ok and not slow:
+                    self._half_open_successes += 1
+                    if self._half_open_successes >= self.half_open_successes:
+                        self.state = self.CLOSED
+                        self.opened_at = None
+                        self._calls.clear()
+                else:
+                    self._open(now)
+                return
+
+            if self.state == self.OPEN:
+                # Llamada que empezó antes de abrirse el circuito
+                return
+
+            self._calls.append((now, ok, slow))
+            self._prune(now)
+
+            total = len(self._calls)
+            if total >= self.min_calls:
+                failures = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+                slow_calls = sum(1 for _, _, call_slow in self._calls if call_slow)
+                if failures / total >= self.error_rate or slow_calls / total >= self.slow_call_rate:
+                    self._open(now)
+
+    def release(self):
+        """Libera una prueba reservada cuya llamada se canceló sin resultado"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def snapshot(self):
+        """Estado actual del breaker como diccionario serializable"""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            total = len(self._calls)
+            failures = sum(1 for _, ok, _ in self._calls if not ok)
+            slow_calls = sum(1 for _, _, slow in self._calls if slow)
+            result = {
+                "state": self.state,
+                "calls_in_window": total,
+                "error_rate": round(failures / total, 3) if total else 0.0,
+                "slow_call_rate": round(slow_calls / total, 3) if total else 0.0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+            if self.state == self.OPEN:
+                result["retry_in_seconds"] = round(max(0, self.open_seconds - (now - self.opened_at)), 1)
+            return result
+
+class CircuitBreakerRegistry:
+    """Breakers del proceso, uno por proveedor"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def get(self, name, **settings):
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = CircuitBreaker(name, **settings)
+                    self._breakers[name] = breaker
+                    return breaker
+        if settings:
+            breaker.configure(**settings)
+        return breaker
+
+    def snapshot(self):
+        return {name: breaker.snapshot() for name, breaker in sorted(self._breakers.items())}
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+# Breakers compartidos por todos los hilos del proceso
+circuit_breakers = CircuitBreakerRegistry()
+
+class BreakerGuardedService:
+    """
+    Envuelve un proveedor LLM: si su circuito está abierto responde de inmediato
+    con un error (para pasar al siguiente proveedor) y, si no, registra el
+    resultado y la latencia de la llamada en el breaker
+    """
+
+    def __init__(self, service, breaker):
+        self.service = service
+        self.breaker = breaker
+
+    def __getattr__(self, name):
+        return getattr(self.service, name)
+
+    def _rejected(self):
+        return {
+            "intent": "desconocido",
+            "parameters": {},
+            "error": f"Circuito abierto para {self.breaker.name}"
+        }
+
+    def detect_intent(self, user_message):
+        if not self.breaker.allow_request():
+            return self._rejected()
+
+        start = time.perf_counter()
+        try:
+            intent_data = self.service.detect_intent(user_message)
+        except Exception:
+            self.breaker.record(False, time.perf_counter() - start)
+            raise
+        self.breaker.record(is_valid_intent(intent_data), time.perf_counter() - start)
+        return intent_data
+
+    async def detect_intent_async(self, user_message):
+        if not self.breaker.allow_request():
+            return self._rejected()
+
+        start = time.perf_counter()
+        try:
+            intent_data = await self.service.detect_intent_async(user_message)
+        except asyncio.CancelledError:
+            # Perdedor cancelado en modo hedged: no es un fallo del proveedor
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record(False, time.perf_counter() - start)
+            raise
+        self.breaker.record(is_valid_intent(intent_data), time.perf_counter() - start)
+        return intent_data
+
+    def stream_intent(self, user_message):
+        if not self.breaker.allow_request():
+            yield {"type": "result", "data": self._rejected()}
+            return
+
+        start = time.perf_counter()
+        recorded = False
+        try:
+            for event in self.service.stream_intent(user_message):
+                if event["type"] == "result":
+                    self.breaker.record(is_valid_intent(event["data"]), time.perf_counter() - start)
+                    recorded = True
+                yield event
+        finally:
+            if not recorded:
+                self.breaker.release()
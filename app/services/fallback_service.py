@@ -45,11 +45,71 @@ class FallbackService:
                 r'contar\s+deudores'
             ]
         }
+        
+        # Compilar una sola vez los patrones, las palabras clave y el índice invertido
+        self._compile_patterns()
     
     def initialize(self):
         """Método para mantener compatibilidad con la interfaz"""
         return self
     
+    def _compile_patterns(self):
+        """
+        Prepara las estructuras de búsqueda a partir de intent_patterns.
+        Debe volver a llamarse si se modifican los patrones después de crear el servicio.
+        """
+        self._intent_order = list(self.intent_patterns)
+        
+        # Una alternancia con un grupo con nombre por intención: descarta en una sola
+        # pasada los mensajes sin ninguna coincidencia y dice qué intención encontró primero
+        self._combined_pattern = re.compile(
+            '|'.join(
+                f"(?P<{intent}>{'|'.join(f'(?:{p})' for p in patterns)})"
+                for intent, patterns in self.intent_patterns.items()
+            ),
+            re.IGNORECASE
+        )
+        
+        # Una alternancia por intención para respetar el orden de prioridad
+        self._intent_regexes = {
+            intent: re.compile('|'.join(f'(?:{p})' for p in patterns), re.IGNORECASE)
+            for intent, patterns in self.intent_patterns.items()
+        }
+        
+        # Palabras clave de cada patrón (en el orden de los patrones) e índice invertido
+        # palabra -> {intención: índices de los patrones que la contienen}
+        self._pattern_keywords = {}
+        self._keyword_index = {}
+        for intent, patterns in self.intent_patterns.items():
+            keyword_sets = []
+            for position, pattern in enumerate(patterns):
+                keywords = re.sub(r'[()[\]{}?+*\\|]', ' ', pattern)
+                keywords = re.sub(r'\s+', ' ', keywords).strip()
+                pattern_words = frozenset(keywords.lower().split())
+                keyword_sets.append(pattern_words)
+                for word in pattern_words:
+                    self._keyword_index.setdefault(word, {}).setdefault(intent, []).append(position)
+            self._pattern_keywords[intent] = keyword_sets
+        
+        self._limit_pattern = re.compile(r'(?:top|primeros|mejores|principales)\s+(\d+)')
+        self._limit_pattern_verb = re.compile(r'(?:muéstrame|muestra|dame|ver|obtener)\s+(\d+)')
+    
+    def _match_intent(self, message):
+        """Primera intención (en orden de prioridad) con algún patrón que coincida, o None"""
+        match = self._combined_pattern.search(message)
+        if match is None:
+            return None
+        
+        # La coincidencia más a la izquierda puede ser de una intención de menor prioridad:
+        # solo hace falta comprobar las intenciones anteriores a ella
+        found = match.lastgroup
+        for intent in self._intent_order:
+            if intent == found:
+                return found
+            if self._intent_regexes[intent].search(message):
+                return intent
+        return found
+    
     def detect_intent(self, user_message):
         """
         Detecta la intención del usuario a partir de su mensaje usando patrones predefinidos
@@ -61,32 +121,32 @@ class FallbackService:
             current_app.logger.info(f"Detectando intención para: '{message}'")
         
         # Buscar coincidencias con los patrones
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, message, re.IGNORECASE):
-                    # Si encuentra una coincidencia, extraer parámetros
-                    parameters = self._extract_parameters(message, intent)
-                    if current_app:
-                        current_app.logger.info(f"Intención detectada: {intent}, parámetros: {parameters}")
-                    return {
-                        "intent": intent,
-                        "parameters": parameters,
-                        "confidence": 0.8  # Confianza estimada
-                    }
+        intent = self._match_intent(message)
+        if intent is not None:
+            # Si encuentra una coincidencia, extraer parámetros
+            parameters = self._extract_parameters(message, intent)
+            if current_app:
+                current_app.logger.info(f"Intención detectada: {intent}, parámetros: {parameters}")
+            return {
+                "intent": intent,
+                "parameters": parameters,
+                "confidence": 0.8  # Confianza estimada
+            }
         
         # Si no hay coincidencias claras, intentar detectar intenciones parciales
         best_intent = None
         best_score = 0
         best_params = {}
         
-        for intent, patterns in self.intent_patterns.items():
-            score = self._calculate_partial_match(message, patterns)
+        scores = self._partial_scores(message)
+        for intent in self._intent_order:
+            score = scores.get(intent, 0)
             if score > best_score and score > 0.4:  # Umbral mínimo de confianza
                 best_score = score
                 best_intent = intent
-                best_params = self._extract_parameters(message, intent)
         
         if best_intent:
+            best_params = self._extract_parameters(message, best_intent)
             if current_app:
                 current_app.logger.info(f"Intención parcial detectada: {best_intent}, parámetros: {best_params}, confianza: {best_score}")
             return {
@@ -104,15 +164,29 @@ class FallbackService:
             "confidence": 0
         }
     
-    def _calculate_partial_match(self, message, patterns):
-        """Calcula una puntuación de coincidencia parcial basada en palabras clave"""
+    def _partial_scores(self, message):
+        """
+        Puntuación de coincidencia parcial de cada intención, consultando solo los
+        patrones que comparten alguna palabra clave con el mensaje
+        """
         message_words = set(message.lower().split())
+        candidates = {}
+        for word in message_words:
+            for intent, positions in self._keyword_index.get(word, {}).items():
+                candidates.setdefault(intent, set()).update(positions)
+        
+        return {
+            intent: self._calculate_partial_match(message_words, intent, sorted(positions))
+            for intent, positions in candidates.items()
+        }
+    
+    def _calculate_partial_match(self, message_words, intent, positions):
+        """Calcula una puntuación de coincidencia parcial basada en palabras clave"""
+        keyword_sets = self._pattern_keywords[intent]
         
-        for pattern in patterns:
-            # Convertir el patrón a palabras clave simples
-            keywords = re.sub(r'[()[\]{}?+*\\|]', ' ', pattern)
-            keywords = re.sub(r'\s+', ' ', keywords).strip()
-            pattern_words = set(keywords.lower().split())
+        # Los patrones se recorren en su orden original; se devuelve el primero que supera el umbral
+        for position in positions:
+            pattern_words = keyword_sets[position]
             
             # Calcular la intersección de palabras
             common_words = message_words.intersection(pattern_words)
@@ -132,7 +206,7 @@ class FallbackService:
         # Extraer límite si se menciona
         if intent in ['mejores_compradores', 'deudores_altos']:
             # Buscar menciones de números para el límite
-            limit_match = re.search(r'(?:top|primeros|mejores|principales)\s+(\d+)', message)
+            limit_match = self._limit_pattern.search(message)
             if limit_match:
                 try:
                     parameters['limite'] = int(limit_match.group(1))
@@ -140,11 +214,11 @@ class FallbackService:
                     parameters['limite'] = 3
             
             # Otra forma de especificar límite: "muéstrame 5 compradores"
-            limit_match2 = re.search(r'(?:muéstrame|muestra|dame|ver|obtener)\s+(\d+)', message)
+            limit_match2 = self._limit_pattern_verb.search(message)
             if not 'limite' in parameters and limit_match2:
                 try:
                     parameters['limite'] = int(limit_match2.group(1))
                 except ValueError:
                     parameters['limite'] = 3
         
-        return parameters
\ No newline at end of file
+        return parameters
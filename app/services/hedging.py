@@ -0,0 +1,364 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from flask import current_app
+
+def is_valid_intent(intent_data):
+    """Indica si la respuesta de un proveedor es una intención bien formada"""
+    if not isinstance(intent_data, dict) or 'intent' not in intent_data:
+        return False
+    return not ('error' in intent_data and intent_data.get('intent') == 'desconocido')
+
+class HedgeStats:
+    """
+    Estadísticas del modo hedged por proveedor: victorias, derrotas, errores y
+    latencias recientes, para ajustar HEDGE_DELAY_MS con el tráfico real
+    """
+
+    def __init__(self, max_samples=1000):
+        self._lock = threading.Lock()
+        self.max_samples = max_samples
+        self.wins = defaultdict(int)
+        self.losses = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.hedges_fired = 0
+        self.hedges_skipped = 0
+        self.inline = 0
+        self.requests = 0
+        self.latencies = defaultdict(lambda: deque(maxlen=self.max_samples))
+
+    def record_call(self, provider, seconds, valid):
+        """Registra la latencia (y si falló) de una llamada a un proveedor"""
+        with self._lock:
+            self.latencies[provider].append(seconds)
+            if not valid:
+                self.errors[provider] += 1
+
+    def record_saturation(self, inline):
+        """
+        Registra un proveedor que no se lanzó en el pool porque estaba lleno: la
+        llamada se hizo en el hilo de la solicitud (inline) o el hedge se omitió
+        """
+        with self._lock:
+            if inline:
+                self.inline += 1
+            else:
+                self.hedges_skipped += 1
+
+    def record_outcome(self, winner, participants, hedge_fired):
+        """Registra qué proveedor ganó la carrera y cuáles perdieron"""
+        with self._lock:
+            self.requests += 1
+            if hedge_fired:
+                self.hedges_fired += 1
+            self.wins[winner] += 1
+            for provider in participants:
+                if provider != winner:
+                    self.losses[provider] += 1
+
+    def _percentile(self, samples, percentile):
+        index = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self):
+        """Devuelve las estadísticas actuales como diccionario serializable"""
+        with self._lock:
+            providers = set(self.wins) | set(self.losses) | set(self.errors) | set(self.latencies)
+            result = {
+                "requests": self.requests,
+                "hedges_fired": self.hedges_fired,
+                "hedges_skipped": self.hedges_skipped,
+                "inline": self.inline,
+                "providers": {}
+            }
+            for provider in sorted(providers):
+                samples = sorted(self.latencies[provider])
+                stats = {
+                    "wins": self.wins[provider],
+                    "losses": self.losses[provider],
+                    "errors": self.errors[provider],
+                    "samples": len(samples),
+                }
+                if samples:
+                    for percentile in (50, 90, 95, 99):
+                        stats[f"p{percentile}_ms"] = round(self._percentile(samples, percentile) * 1000, 1)
+                result["providers"][provider] = stats
+            return result
+
+    def reset(self):
+        with self._lock:
+            self.wins.clear()
+            self.losses.clear()
+            self.errors.clear()
+            self.latencies.clear()
+            self.hedges_fired = 0
+            self.hedges_skipped = 0
+            self.inline = 0
+            self.requests = 0
+
+# Estadísticas compartidas por todo el proceso (sobreviven a la reconstrucción de servicios)
+hedge_stats = HedgeStats()
+
+class HedgedIntentDetector:
+    """
+    Detección de intención con solicitudes "hedged": envía la petición al proveedor
+    principal, lanza el secundario si el principal no responde antes de hedge_delay
+    (o falla), ejecuta el fallback local en paralelo y devuelve la primera intención
+    bien formada. Si ningún proveedor responde bien, se usa el resultado del fallback.
+
+    Las llamadas solo se envían al pool si tiene un hilo libre, así que nunca esperan en
+    su cola mientras corren hedge_delay y timeout. Con el pool lleno el proveedor se
+    llama en el hilo de la solicitud (sin carrera) y los hedges se omiten; max_workers
+    debe cubrir dos llamadas por solicitud en curso (gunicorn.conf.py lo calcula)
+    """
+
+    def __init__(self, hedge_delay=0.5, timeout=30.0, max_workers=32, stats=None):
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.stats = stats or hedge_stats
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        """Pool de hilos propio del proceso (se recrea tras un fork)"""
+        pid = os.getpid()
+        if self._executor is None or self._executor_pid != pid:
+            with self._lock:
+                if self._executor is None or self._executor_pid != pid:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='hedge'
+                    )
+                    self._slots = threading.BoundedSemaphore(self.max_workers)
+                    self._executor_pid = pid
+        return self._executor
+
+    def _try_submit(self, func, *args):
+        """Envía func al pool si hay un hilo libre; devuelve el future o None si está lleno"""
+        executor = self._get_executor()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            return None
+
+        def run():
+            try:
+                return func(*args)
+            finally:
+                slots.release()
+
+        try:
+            return executor.submit(run)
+        except Exception:
+            slots.release()
+            raise
+
+    def _timed_call(self, app, name, service, user_message):
+        """Llama a un proveedor dentro de un contexto de aplicación y registra su latencia"""
+        start = time.perf_counter()
+        intent_data = None
+        try:
+            with app.app_context():
+                intent_data = service.detect_intent(user_message)
+            return intent_data
+        finally:
+            self.stats.record_call(name, time.perf_counter() - start, is_valid_intent(intent_data))
+
+    def detect(self, providers, fallback_service, user_message):
+        """
+        Ejecuta la carrera entre proveedores.
+        providers es la lista ordenada [(nombre, servicio)] (principal primero).
+        Devuelve (intención, proveedor ganador o 'fallback')
+        """
+        if not providers:
+            return fallback_service.detect_intent(user_message), 'fallback'
+
+        app = current_app._get_current_object()
+        deadline = time.monotonic() + self.timeout
+
+        pending = {}
+        participants = []
+        remaining = list(providers)
+
+        def launch():
+            """Lanza el siguiente proveedor en el pool; False si el pool está lleno"""
+            name, service = remaining[0]
+            # El hilo hereda la traza de la solicitud (tramo de cada proveedor en la carrera)
+            future = self._try_submit(contextvars.copy_context().run, self._timed_call, app, name, service, user_message)
+            if future is None:
+                return False
+            remaining.pop(0)
+            pending[future] = name
+            participants.append(name)
+            return True
+
+        if not launch():
+            # Pool lleno: cascada sin carrera en el hilo de la solicitud
+            return self._detect_inline(app, remaining, fallback_service, user_message)
+
+        # El fallback local corre mientras el principal está en vuelo
+        fallback_start = time.perf_counter()
+        fallback_data = fallback_service.detect_intent(user_message)
+        self.stats.record_call('fallback', time.perf_counter() - fallback_start, True)
+
+        hedge_fired = False
+        # Con retraso 0 se lanzan todos los proveedores a la vez
+        next_hedge_at = time.monotonic() + self.hedge_delay
+
+        while pending or remaining:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+
+            if remaining and (now >= next_hedge_at or not pending):
+                if launch():
+                    hedge_fired = True
+                    next_hedge_at = now + self.hedge_delay
+                    continue
+                if pending:
+                    # Pool lleno: sin hedge; el secundario solo se probará si el principal falla
+                    self.stats.record_saturation(inline=False)
+                    next_hedge_at = deadline
+                    continue
+                # El principal falló y el pool está lleno: el secundario va en este hilo
+                self.stats.record_saturation(inline=True)
+                name, service = remaining.pop(0)
+                participants.append(name)
+                intent_data = self._timed_call(app, name, service, user_message)
+                if is_valid_intent(intent_data):
+                    self.stats.record_outcome(name, participants, hedge_fired)
+                    return intent_data, name
+                continue
+
+            wait_until = deadline if not remaining else min(deadline, next_hedge_at)
+            done, _ = wait(list(pending), timeout=max(0, wait_until - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    intent_data = future.result()
+                except Exception as e:
+                    if current_app:
+                        current_app.logger.error(f"Excepción con {name} en modo hedged: {str(e)}")
+                    intent_data = None
+
+                if is_valid_intent(intent_data):
+                    # Cancelar los perdedores que aún no empezaron; los que están en vuelo se ignoran
+                    for loser in pending:
+                        loser.cancel()
+                    self.stats.record_outcome(name, participants, hedge_fired)
+                    if current_app:
+                        current_app.logger.info(f"Intención detectada en modo hedged por {name}")
+                    return intent_data, name
+
+                # Un fallo del principal dispara el secundario de inmediato
+                next_hedge_at = time.monotonic()
+
+        for loser in pending:
+            loser.cancel()
+        self.stats.record_outcome('fallback', participants, hedge_fired)
+        if current_app:
+            current_app.logger.info("Ningún proveedor respondió en modo hedged, usando fallback")
+        return fallback_data, 'fallback'
+
+    def _detect_inline(self, app, providers, fallback_service, user_message):
+        """Cascada secuencial en el hilo de la solicitud, para cuando el pool está lleno"""
+        self.stats.record_saturation(inline=True)
+        participants = []
+        for name, service in providers:
+            participants.append(name)
+            try:
+                intent_data = self._timed_call(app, name, service, user_message)
+            except Exception as e:
+                if current_app:
+                    current_app.logger.error(f"Excepción con {name} en modo hedged: {str(e)}")
+                continue
+            if is_valid_intent(intent_data):
+                self.stats.record_outcome(name, participants, False)
+                return intent_data, name
+
+        fallback_start = time.perf_counter()
+        fallback_data = fallback_service.detect_intent(user_message)
+        self.stats.record_call('fallback', time.perf_counter() - fallback_start, True)
+        self.stats.record_outcome('fallback', participants, False)
+        return fallback_data, 'fallback'
+
+    async def detect_async(self, providers, fallback_service, user_message):
+        """Versión asíncrona de detect: los perdedores se cancelan de verdad"""
+        if not providers:
+            return fallback_service.detect_intent(user_message), 'fallback'
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        pending = {}
+        participants = []
+        remaining = list(providers)
+
+        async def timed_call(name, service):
+            start = time.perf_counter()
+            try:
+                intent_data = await service.detect_intent_async(user_message)
+            except asyncio.CancelledError:
+                # Perdedor cancelado: no cuenta como error del proveedor
+                raise
+            except Exception:
+                self.stats.record_call(name, time.perf_counter() - start, False)
+                raise
+            self.stats.record_call(name, time.perf_counter() - start, is_valid_intent(intent_data))
+            return intent_data
+
+        def launch():
+            name, service = remaining.pop(0)
+            pending[asyncio.ensure_future(timed_call(name, service))] = name
+            participants.append(name)
+
+        launch()
+
+        fallback_start = time.perf_counter()
+        fallback_data = fallback_service.detect_intent(user_message)
+        self.stats.record_call('fallback', time.perf_counter() - fallback_start, True)
+
+        hedge_fired = False
+        next_hedge_at = loop.time() + self.hedge_delay
+
+        try:
+            while pending or remaining:
+                now = loop.time()
+                if now >= deadline:
+                    break
+
+                if remaining and (now >= next_hedge_at or not pending):
+                    launch()
+                    hedge_fired = True
+                    next_hedge_at = now + self.hedge_delay
+                    continue
+
+                wait_until = deadline if not remaining else min(deadline, next_hedge_at)
+                done, _ = await asyncio.wait(list(pending), timeout=max(0, wait_until - now), return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        intent_data = task.result()
+                    except Exception as e:
+                        if current_app:
+                            current_app.logger.error(f"Excepción con {name} en modo hedged: {str(e)}")
+                        intent_data = None
+
+                    if is_valid_intent(intent_data):
+                        self.stats.record_outcome(name, participants, hedge_fired)
+                        return intent_data, name
+
+                    next_hedge_at = loop.time()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        self.stats.record_outcome('fallback', participants, hedge_fired)
+        return fallback_data, 'fallback'
@@ -0,0 +1,235 @@
+import email.utils
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from flask import current_app
+from app.utils.metrics import record_llm_connection, record_llm_http_request, record_llm_retry
+
+# Estados HTTP con los que la solicitud no llegó a procesarse (límite de tasa o pasarela
+# sin servidor detrás): repetirla no duplica nada
+RETRY_STATUSES = (429, 502, 503, 504)
+
+DEFAULTS = {
+    "pool_connections": 4,
+    "pool_maxsize": 100,
+    "connect_timeout": 3.05,
+    "read_timeout": 30.0,
+    "max_retries": 2,
+    "backoff": 0.25,
+    "max_backoff": 4.0,
+}
+
+class ConnectionStats:
+    """Solicitudes, conexiones nuevas y reintentos por host del proceso actual"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, host):
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = self._hosts.setdefault(host, {"requests": 0, "connections": 0, "retries": 0})
+        return entry
+
+    def count(self, host, field):
+        with self._lock:
+            self._host(host)[field] += 1
+
+    def snapshot(self):
+        with self._lock:
+            hosts = {host: dict(entry) for host, entry in self._hosts.items()}
+        for entry in hosts.values():
+            # Fracción de solicitudes que usaron una conexión ya abierta (sin handshake)
+            reused = max(0, entry["requests"] - entry["connections"])
+            entry["reuse_rate"] = round(reused / entry["requests"], 4) if entry["requests"] else None
+        return hosts
+
+    def _after_fork(self):
+        # El worker empieza sin las cifras del proceso padre
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+# Contadores compartidos por todo el proceso
+connection_stats = ConnectionStats()
+
+def _count_connection(host):
+    connection_stats.count(host, "connections")
+    record_llm_connection(host)
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count_connection(self.host)
+        return super()._new_conn()
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count_connection(self.host)
+        return super()._new_conn()
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter cuyos pools cuentan cada conexión TCP (y TLS) que abren"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+class HTTPClient:
+    """
+    Cliente HTTP de los proveedores LLM compartido por todo el proceso: una sola
+    requests.Session con un pool de conexiones keep-alive por host, de modo que solo la
+    primera llamada de cada conexión paga el handshake TCP y TLS. Aplica timeouts de
+    conexión y de lectura explícitos y reintenta, con espera exponencial aleatoria, los
+    fallos con los que la solicitud no llegó a procesarse. La sesión se crea en el
+    proceso que la usa: tras un fork cada worker abre sus propias conexiones
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+        self.settings = dict(DEFAULTS)
+
+    def configure(self, config):
+        """Lee los parámetros LLM_* de la configuración; los cambios crean una sesión nueva"""
+        settings = {
+            "pool_connections": config.get('LLM_POOL_CONNECTIONS', DEFAULTS["pool_connections"]),
+            "pool_maxsize": config.get('LLM_POOL_MAXSIZE', DEFAULTS["pool_maxsize"]),
+            "connect_timeout": config.get('LLM_CONNECT_TIMEOUT', DEFAULTS["connect_timeout"]),
+            "read_timeout": config.get('LLM_READ_TIMEOUT', DEFAULTS["read_timeout"]),
+            "max_retries": config.get('LLM_MAX_RETRIES', DEFAULTS["max_retries"]),
+            "backoff": config.get('LLM_RETRY_BACKOFF_MS', DEFAULTS["backoff"] * 1000) / 1000,
+            "max_backoff": config.get('LLM_RETRY_MAX_BACKOFF_MS', DEFAULTS["max_backoff"] * 1000) / 1000,
+        }
+        with self._lock:
+            if settings != self.settings:
+                self.settings = settings
+                self._discard()
+        return self
+
+    def _discard(self):
+        # Sin cerrarla: tras un fork sus sockets siguen siendo del proceso padre
+        self._session = None
+        self._pid = None
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._discard()
+
+    def session(self):
+        """Sesión del proceso actual, creándola si es necesario"""
+        session = self._session
+        if session is not None and self._pid == os.getpid():
+            return session
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                session = requests.Session()
+                # Los reintentos los hace post(), que conoce qué fallos se pueden repetir
+                adapter = CountingHTTPAdapter(
+                    pool_connections=self.settings["pool_connections"],
+                    pool_maxsize=self.settings["pool_maxsize"],
+                    max_retries=0
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+                self._pid = os.getpid()
+            return self._session
+
+    @property
+    def timeout(self):
+        return (self.settings["connect_timeout"], self.settings["read_timeout"])
+
+    def post(self, url, provider, **kwargs):
+        """
+        POST con el pool compartido. Se reintentan los errores de conexión (la solicitud no
+        se envió o la conexión reutilizada estaba cerrada) y los estados de RETRY_STATUSES;
+        un timeout de lectura no se reintenta, porque el proveedor ya está tardando.
+        Devuelve la respuesta (raise_for_status ya aplicado) o lanza la última excepción
+        """
+        host = urlsplit(url).hostname
+        session = self.session()
+        kwargs.setdefault("timeout", self.timeout)
+        max_retries = self.settings["max_retries"]
+
+        for attempt in range(max_retries + 1):
+            connection_stats.count(host, "requests")
+            record_llm_http_request(host)
+            retry_after = None
+            try:
+                response = session.post(url, **kwargs)
+            except requests.exceptions.ReadTimeout:
+                raise
+            except requests.exceptions.ConnectionError as e:
+                if attempt == max_retries:
+                    raise
+                reason = "connect_timeout" if isinstance(e, requests.exceptions.ConnectTimeout) else "connection"
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+                    if not response.ok:
+                        # Libera la conexión también en las respuestas en streaming
+                        response.close()
+                    response.raise_for_status()
+                    return response
+                reason = str(response.status_code)
+                retry_after = self.retry_after(response)
+                response.close()
+
+            delay = self.backoff(attempt, retry_after)
+            connection_stats.count(host, "retries")
+            record_llm_retry(provider, reason)
+            if current_app:
+                current_app.logger.warning(
+                    f"Reintentando la llamada a {provider} ({reason}) en {delay * 1000:.0f} ms, "
+                    f"intento {attempt + 2} de {max_retries + 1}"
+                )
+            time.sleep(delay)
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Espera antes del reintento: aleatoria entre 0 y backoff * 2^intento (full jitter),
+        para que los workers que fallan a la vez no reintenten a la vez. Un Retry-After
+        del proveedor se respeta si no supera max_backoff
+        """
+        cap = self.settings["max_backoff"]
+        if retry_after is not None and retry_after <= cap:
+            return retry_after
+        return random.uniform(0, min(cap, self.settings["backoff"] * 2 ** attempt))
+
+    @staticmethod
+    def retry_after(response):
+        """Segundos pedidos por la cabecera Retry-After (en segundos o como fecha HTTP), o None"""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def stats(self):
+        """Parámetros del pool y estadísticas de reutilización de conexiones por host"""
+        return {
+            "pool_maxsize": self.settings["pool_maxsize"],
+            "connect_timeout": self.settings["connect_timeout"],
+            "read_timeout": self.settings["read_timeout"],
+            "max_retries": self.settings["max_retries"],
+            "hosts": connection_stats.snapshot(),
+        }
+
+# Cliente único por proceso
+http_client = HTTPClient()
+os.register_at_fork(after_in_child=http_client._after_fork)
+os.register_at_fork(after_in_child=connection_stats._after_fork)
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from app.utils.security import sanitize_input
+from app.services.canonicalizer import CANONICALIZER_VERSION, abstract_parameters, fill_parameters
+
+class LRUCache:
+    """Caché LRU en memoria con TTL y tamaño máximo, segura entre hilos"""
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class SQLiteIntentCache:
+    """
+    Segundo nivel de la caché en una base SQLite propia, compartida por todos los
+    workers de gunicorn y persistente entre reinicios. Se usa un archivo separado
+    de data/database.db para no competir con los datos por el bloqueo de escritura.
+    """
+
+    # Cada cuántas escrituras se purgan las entradas caducadas
+    PURGE_EVERY = 500
+
+    def __init__(self, db_path, ttl=3600):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        self.errors = 0
+
+    def _connection(self):
+        """Conexión propia del hilo (y del proceso, para no compartirla tras un fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=1.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS intent_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        try:
+            row = self._connection().execute(
+                'SELECT value, expires_at FROM intent_cache WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._log_error(e)
+            return None
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key, value):
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO intent_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                    (key, value, time.time() + self.ttl)
+                )
+                self._writes += 1
+                if self._writes % self.PURGE_EVERY == 0:
+                    conn.execute('DELETE FROM intent_cache WHERE expires_at < ?', (time.time(),))
+        except sqlite3.Error as e:
+            self._log_error(e)
+
+    def clear(self):
+        try:
+            conn = self._connection()
+            with conn:
+                deleted = conn.execute('DELETE FROM intent_cache').rowcount
+            return deleted
+        except sqlite3.Error as e:
+            self._log_error(e)
+            return 0
+
+    def _log_error(self, error):
+        self.errors += 1
+        if current_app:
+            current_app.logger.warning(f"Error en la caché compartida de intenciones: {str(error)}")
+
+class IntentCache:
+    """
+    Caché de intenciones de dos niveles delante de los proveedores LLM:
+    LRU en memoria del proceso y tabla SQLite compartida entre workers.
+    La clave es el mensaje sanitizado más el proveedor/modelo y la versión del prompt.
+    """
+
+    def __init__(self, namespace, maxsize=10000, ttl=3600, shared_db_path=None, canonicalizer=None):
+        self.namespace = namespace
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.shared = SQLiteIntentCache(shared_db_path, ttl=ttl) if shared_db_path else None
+        # Con canonicalizador la clave es la plantilla del mensaje ("top <N> compradores")
+        self.canonicalizer = canonicalizer
+        self._lock = threading.Lock()
+        self.hits_local = 0
+        self.hits_shared = 0
+        self.misses = 0
+        self.stores = 0
+
+    def make_key(self, user_message):
+        """
+        Clave de caché: mensaje sanitizado (o su plantilla canónica) + proveedor/modelo
+        + versión del prompt. Devuelve (clave, valores de los slots del mensaje)
+        """
+        key, slots, _ = self._make_key(user_message)
+        return key, slots
+
+    def _make_key(self, user_message):
+        if self.canonicalizer is not None:
+            template, slots = self.canonicalizer.canonicalize(user_message)
+            raw = f"{self.namespace}|{CANONICALIZER_VERSION}|{template}"
+        else:
+            template, slots = None, []
+            raw = f"{self.namespace}|{sanitize_input(user_message)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest(), slots, template
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _decode(self, value, slots):
+        intent_data = json.loads(value)
+        if self.canonicalizer is not None:
+            intent_data['parameters'] = fill_parameters(intent_data.get('parameters', {}), slots)
+        return intent_data
+
+    def get_local(self, user_message):
+        """
+        Busca solo en el nivel en memoria (no bloquea en disco). Devuelve (intención o
+        None, búsqueda): con un fallo, get_shared(búsqueda) continúa en la tabla
+        compartida sin volver a canonicalizar el mensaje. La plantilla se cuenta aquí,
+        una vez por búsqueda
+        """
+        key, slots, template = self._make_key(user_message)
+        if template is not None:
+            self.canonicalizer.record(template)
+        value = self.local.get(key)
+        if value is not None:
+            self._count('hits_local')
+            return self._decode(value, slots), (key, slots)
+        return None, (key, slots)
+
+    def get(self, user_message):
+        """Busca en memoria y después en la tabla compartida; devuelve None si no está"""
+        intent_data, lookup = self.get_local(user_message)
+        if intent_data is not None:
+            return intent_data
+        return self.get_shared(lookup)
+
+    def get_shared(self, lookup):
+        """Continúa en la tabla compartida una búsqueda de get_local que falló en memoria"""
+        key, slots = lookup
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                # Promocionar al nivel en memoria
+                self.local.set(key, value)
+                self._count('hits_shared')
+                return self._decode(value, slots)
+
+        self._count('misses')
+        return None
+
+    def set(self, user_message, intent_data):
+        """Guarda una intención detectada por un proveedor LLM en ambos niveles"""
+        key, slots = self.make_key(user_message)
+        if self.canonicalizer is not None:
+            intent_data = dict(intent_data, parameters=abstract_parameters(intent_data.get('parameters', {}), slots))
+        value = json.dumps(intent_data, ensure_ascii=False)
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+        self._count('stores')
+
+    def flush(self):
+        """Vacía ambos niveles y devuelve cuántas entradas compartidas se borraron"""
+        self.local.clear()
+        return self.shared.clear() if self.shared is not None else 0
+
+    def stats(self, templates=False):
+        """Contadores de la caché; con templates=True incluye las plantillas más frecuentes"""
+        lookups = self.hits_local + self.hits_shared + self.misses
+        return {
+            "hits_local": self.hits_local,
+            "hits_shared": self.hits_shared,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits_local + self.hits_shared) / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.local.evictions,
+            "expirations": self.local.expirations,
+            "local_size": len(self.local),
+            "shared_errors": self.shared.errors if self.shared is not None else 0,
+            "canonicalization": self.canonicalizer.stats(templates=templates) if self.canonicalizer is not None else None,
+        }
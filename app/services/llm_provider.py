@@ -0,0 +1,343 @@
+import asyncio
+import json
+import re
+import traceback
+from flask import current_app
+from app.utils.security import sanitize_input
+from app.services.http_client import RETRY_STATUSES, http_client
+from app.services.prompts import (
+    DEFAULT_MAX_TOKENS,
+    PROMPT_VERSION,
+    account_tokens,
+    build_messages,
+    completion_options,
+    parse_intent,
+    resolve_version
+)
+from app.utils.metrics import record_llm_retry
+from app.utils.tracing import span
+
+# Detecta el campo "intent" completo dentro de una respuesta JSON parcial
+INTENT_FIELD_PATTERN = re.compile(r'"intent"\s*:\s*"([^"\\]*)"')
+
+# Proveedores LLM compatibles con /chat/completions de OpenAI. La configuración de cada
+# uno se lee de <prefix>_API_KEY, <prefix>_MODEL y <prefix>_BASE_URL; con la URL base
+# se puede apuntar cualquiera de ellos a otra API compatible (un modelo propio, el
+# servidor simulado de las pruebas de carga...)
+PROVIDERS = {
+    'deepseek': {
+        'label': 'DeepSeek',
+        'prefix': 'DEEPSEEK',
+        'base_url': 'https://api.deepseek.com',
+        'model': 'deepseek-chat',
+        # Sin DEEPSEEK_API_KEY se prueba con la de OpenAI
+        'fallback_key': 'OPENAI_API_KEY',
+    },
+    'openai': {
+        'label': 'OpenAI',
+        'prefix': 'OPENAI',
+        'base_url': 'https://api.openai.com/v1',
+        'model': 'gpt-3.5-turbo',
+    },
+}
+
+class LLMProvider:
+    """
+    Detector de intenciones con un proveedor de PROVIDERS. Las llamadas síncronas y en
+    streaming usan el cliente HTTP compartido del proceso (http_client.py): pool de
+    conexiones keep-alive, timeouts y reintentos comunes a todos los proveedores. La
+    versión asíncrona usa el SDK de openai, con los mismos timeouts y la misma política
+    de reintentos (aplicada aquí, no por el SDK)
+    """
+
+    def __init__(self, name, api_key=None, model=None, base_url=None):
+        if name not in PROVIDERS:
+            raise ValueError(f"Proveedor LLM desconocido: {name} (proveedores: {', '.join(PROVIDERS)})")
+        # No accedemos a current_app en el constructor
+        self.name = name
+        self.label = PROVIDERS[name]['label']
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.url = None
+        self.headers = None
+        # Versión del prompt y parámetros de la llamada (ver prompts.py)
+        self.prompt_version = PROMPT_VERSION
+        self.options = completion_options()
+        # Cliente asíncrono, creado bajo demanda y ligado al event loop que lo usa
+        self.async_client = None
+        self._async_client_loop = None
+
+    def initialize(self):
+        """
+        Inicializa el proveedor con la configuración de la aplicación Flask.
+        Devuelve None si no hay API key
+        """
+        try:
+            config = current_app.config
+            spec = PROVIDERS[self.name]
+            prefix = spec['prefix']
+            if not self.api_key:
+                self.api_key = config.get(f'{prefix}_API_KEY')
+                if not self.api_key and spec.get('fallback_key'):
+                    self.api_key = config.get(spec['fallback_key'])
+            if not self.model:
+                self.model = config.get(f'{prefix}_MODEL') or spec['model']
+            if not self.base_url:
+                self.base_url = config.get(f'{prefix}_BASE_URL') or spec['base_url']
+
+            self.prompt_version = resolve_version(config)
+            self.options = completion_options(
+                max_tokens=config.get('LLM_MAX_TOKENS', DEFAULT_MAX_TOKENS),
+                json_mode=config.get('LLM_JSON_MODE', True)
+            )
+
+            # Verificar que tengamos una API key
+            if not self.api_key:
+                if current_app:
+                    current_app.logger.warning(f"No se encontró {prefix}_API_KEY. El servicio {self.label} no funcionará.")
+                return None
+
+            # La misma ruta que el SDK añade a la URL base
+            self.url = f"{self.base_url.rstrip('/')}/chat/completions"
+            self.headers = {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {self.api_key}"
+            }
+            http_client.configure(config)
+
+            if current_app:
+                current_app.logger.info(f"Inicializando proveedor {self.label}")
+                current_app.logger.info(f"Usando API key: {self.api_key[:4]}...{self.api_key[-4:] if len(self.api_key) > 8 else ''}")
+                current_app.logger.info(f"Modelo seleccionado: {self.model}")
+                current_app.logger.info(f"URL: {self.url}")
+
+            return self
+        except Exception as e:
+            if current_app:
+                current_app.logger.error(f"Error general al inicializar el proveedor {self.label}: {str(e)}")
+                current_app.logger.error(traceback.format_exc())
+            return None
+
+    def _payload(self, messages, stream=False):
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            **self.options
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _error(self, message):
+        return {
+            "intent": "desconocido",
+            "parameters": {},
+            "error": message
+        }
+
+    def detect_intent(self, user_message):
+        """
+        Detecta la intención del usuario a partir de su mensaje
+        Incluye protección contra prompt injection
+        """
+        # Verificar que el proveedor esté inicializado
+        if not self.url:
+            if current_app:
+                current_app.logger.error(f"Proveedor {self.label} no inicializado")
+            return self._error(f"Proveedor {self.label} no inicializado")
+
+        # Sanitizar la entrada del usuario
+        safe_message = sanitize_input(user_message)
+
+        try:
+            if current_app:
+                current_app.logger.info(f"Realizando llamada a {self.label} con modelo {self.model}")
+
+            messages = build_messages(safe_message, self.prompt_version)
+            # El tramo incluye los reintentos
+            with span(f"{self.name}.http"):
+                response = http_client.post(
+                    self.url,
+                    self.name,
+                    headers=self.headers,
+                    json=self._payload(messages)
+                )
+
+            with span(f"{self.name}.decode"):
+                result_json = response.json()
+                result_text = result_json.get("choices", [{}])[0].get("message", {}).get("content") or "{}"
+
+            if current_app:
+                current_app.logger.info(f"Respuesta de {self.label}: {result_text[:200]}...")
+
+            account_tokens(self.name, self.model, messages, result_text, result_json.get("usage"))
+            with span(f"{self.name}.parse"):
+                return self._parse_result(result_text)
+
+        except Exception as e:
+            if current_app:
+                current_app.logger.error(f"Error al detectar intención con {self.label}: {str(e)}")
+            return self._error(f"Error al procesar la intención: {str(e)}")
+
+    def _parse_result(self, result_text):
+        """Convierte el texto devuelto por el modelo en un diccionario de intención"""
+        return parse_intent(result_text)
+
+    def stream_intent(self, user_message):
+        """
+        Detecta la intención usando la API en modo streaming.
+        Genera {"type": "intent", ...} en cuanto el campo "intent" está completo en los
+        tokens recibidos y al final {"type": "result", "data": ...} con el resultado completo
+        """
+        # Verificar que el proveedor esté inicializado
+        if not self.url:
+            yield {"type": "result", "data": self._error(f"Proveedor {self.label} no inicializado")}
+            return
+
+        # Sanitizar la entrada del usuario
+        safe_message = sanitize_input(user_message)
+
+        try:
+            if current_app:
+                current_app.logger.info(f"Realizando llamada en streaming a {self.label} con modelo {self.model}")
+
+            messages = build_messages(safe_message, self.prompt_version)
+            result_text = ""
+            intent_emitted = False
+            with http_client.post(
+                self.url,
+                self.name,
+                headers=self.headers,
+                json=self._payload(messages, stream=True),
+                stream=True
+            ) as response:
+                # Eventos SSE: una línea "data: <chunk JSON>" por fragmento y "data: [DONE]" al final
+                for line in response.iter_lines():
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        break
+                    choices = json.loads(data).get("choices")
+                    if not choices:
+                        continue
+                    result_text += (choices[0].get("delta") or {}).get("content") or ""
+
+                    # Emitir la intención en cuanto el campo esté completo, sin esperar al resto
+                    if not intent_emitted:
+                        intent_match = INTENT_FIELD_PATTERN.search(result_text)
+                        if intent_match:
+                            intent_emitted = True
+                            yield {"type": "intent", "intent": intent_match.group(1)}
+
+            if current_app:
+                current_app.logger.info(f"Respuesta en streaming de {self.label}: {result_text[:200]}...")
+
+            account_tokens(self.name, self.model, messages, result_text)
+            yield {"type": "result", "data": self._parse_result(result_text)}
+
+        except Exception as e:
+            if current_app:
+                current_app.logger.error(f"Error al detectar intención en streaming con {self.label}: {str(e)}")
+            yield {"type": "result", "data": self._error(f"Error al procesar la intención: {str(e)}")}
+
+    def _get_async_client(self):
+        """Obtiene el cliente asíncrono para el event loop actual, creándolo si es necesario"""
+        loop = asyncio.get_running_loop()
+        if self.async_client is None or self._async_client_loop is not loop:
+            # Importación diferida: el SDK solo se carga si se usa el camino asíncrono.
+            # Su pool de conexiones es propio del event loop (uno por worker de uvicorn)
+            from openai import AsyncOpenAI, Timeout
+            settings = http_client.settings
+            # Sin los reintentos del SDK, que repetirían también los timeouts de lectura:
+            # los hace _create_completion con la política de http_client.post
+            self.async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=Timeout(settings["read_timeout"], connect=settings["connect_timeout"]),
+                max_retries=0
+            )
+            self._async_client_loop = loop
+        return self.async_client
+
+    async def _create_completion(self, messages):
+        """
+        Llamada asíncrona con la política de reintentos de http_client.post: se reintentan
+        los errores de conexión (también el timeout de conexión) y los estados de
+        RETRY_STATUSES; un timeout de lectura no, porque el proveedor ya está tardando
+        """
+        from openai import APIConnectionError, APIStatusError, APITimeoutError
+        try:
+            from httpx import ConnectTimeout
+        except ImportError:
+            # Distribuciones del SDK que empaquetan httpx con otro nombre
+            from httpx2 import ConnectTimeout
+        client = self._get_async_client()
+        max_retries = http_client.settings["max_retries"]
+
+        for attempt in range(max_retries + 1):
+            retry_after = None
+            try:
+                return await client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    stream=False,
+                    **self.options
+                )
+            except APITimeoutError as e:
+                if not isinstance(e.__cause__, ConnectTimeout) or attempt == max_retries:
+                    raise
+                reason = "connect_timeout"
+            except APIConnectionError:
+                if attempt == max_retries:
+                    raise
+                reason = "connection"
+            except APIStatusError as e:
+                if e.status_code not in RETRY_STATUSES or attempt == max_retries:
+                    raise
+                reason = str(e.status_code)
+                retry_after = http_client.retry_after(e.response)
+
+            delay = http_client.backoff(attempt, retry_after)
+            record_llm_retry(self.name, reason)
+            if current_app:
+                current_app.logger.warning(
+                    f"Reintentando la llamada asíncrona a {self.name} ({reason}) en {delay * 1000:.0f} ms, "
+                    f"intento {attempt + 2} de {max_retries + 1}"
+                )
+            await asyncio.sleep(delay)
+
+    async def detect_intent_async(self, user_message):
+        """
+        Versión asíncrona de detect_intent: la llamada a la API no bloquea el event loop
+        """
+        if not self.url:
+            return self._error(f"Proveedor {self.label} no inicializado")
+
+        # Sanitizar la entrada del usuario
+        safe_message = sanitize_input(user_message)
+
+        try:
+            if current_app:
+                current_app.logger.info(f"Realizando llamada asíncrona a {self.label} con modelo {self.model}")
+
+            messages = build_messages(safe_message, self.prompt_version)
+            # El tramo incluye los reintentos
+            with span(f"{self.name}.http"):
+                response = await self._create_completion(messages)
+
+            result_text = response.choices[0].message.content or "{}"
+            account_tokens(self.name, self.model, messages, result_text, response.usage)
+
+            if current_app:
+                current_app.logger.info(f"Respuesta de {self.label}: {result_text[:200]}...")
+
+            with span(f"{self.name}.parse"):
+                return self._parse_result(result_text)
+
+        except Exception as e:
+            if current_app:
+                current_app.logger.error(f"Error al detectar intención con {self.label}: {str(e)}")
+                current_app.logger.error(traceback.format_exc())
+            return self._error(f"Error al procesar la intención: {str(e)}")
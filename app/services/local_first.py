@@ -0,0 +1,139 @@
+import random
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+def is_confident(local_data, threshold):
+    """Indica si la respuesta del detector local es suficiente para contestar sin LLM"""
+    return local_data.get('intent', 'desconocido') != 'desconocido' and local_data.get('confidence', 0) >= threshold
+
+class LocalFirstStats:
+    """
+    Estadísticas del modo local_first: cuántas consultas responde el detector local,
+    cuántas se escalan al LLM (y por qué), cuánto tarda cada camino y en qué casos
+    el detector local y el LLM no coinciden, para ajustar LOCAL_FIRST_THRESHOLD
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.paths = Counter()          # local, cache, llm, llm_failed
+            self.escalation_reasons = Counter()  # unknown, low_confidence
+            self.path_seconds = Counter()
+            self.agreements = 0
+            self.disagreements = Counter()  # "local->llm"
+            self.shadow_checks = 0
+            self.shadow_dropped = 0  # verificaciones descartadas con todos los hilos ocupados
+            self.shadow_disagreements = Counter()
+            self.local_confidence = Counter()  # confianza local redondeada, en consultas escaladas
+
+    def record_local(self, seconds):
+        with self._lock:
+            self.paths['local'] += 1
+            self.path_seconds['local'] += seconds
+
+    def record_escalation(self, local_data, intent_data, source, seconds):
+        """Registra una consulta escalada y si el LLM coincidió con el detector local"""
+        local_intent = local_data.get('intent', 'desconocido')
+        with self._lock:
+            if local_intent == 'desconocido':
+                self.escalation_reasons['unknown'] += 1
+            else:
+                self.escalation_reasons['low_confidence'] += 1
+            self.local_confidence[round(local_data.get('confidence', 0), 1)] += 1
+
+            path = 'cache' if source == 'cache' else ('llm_failed' if source == 'fallback' else 'llm')
+            self.paths[path] += 1
+            self.path_seconds[path] += seconds
+
+            if path != 'llm_failed' and local_intent != 'desconocido':
+                llm_intent = intent_data.get('intent', 'desconocido')
+                if llm_intent == local_intent:
+                    self.agreements += 1
+                else:
+                    self.disagreements[f"{local_intent}->{llm_intent}"] += 1
+
+    def record_shadow(self, local_intent, llm_intent):
+        """Resultado de una verificación en segundo plano de una respuesta local segura"""
+        with self._lock:
+            self.shadow_checks += 1
+            if llm_intent != local_intent:
+                self.shadow_disagreements[f"{local_intent}->{llm_intent}"] += 1
+
+    def record_shadow_dropped(self):
+        with self._lock:
+            self.shadow_dropped += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = sum(self.paths.values())
+            return {
+                "requests": total,
+                "local_ratio": round(self.paths['local'] / total, 3) if total else 0.0,
+                "paths": dict(self.paths),
+                "mean_ms": {
+                    path: round(self.path_seconds[path] / count * 1000, 2)
+                    for path, count in self.paths.items() if count
+                },
+                "escalation_reasons": dict(self.escalation_reasons),
+                "escalated_local_confidence": {str(k): v for k, v in sorted(self.local_confidence.items())},
+                "agreements": self.agreements,
+                "disagreements": dict(self.disagreements),
+                "shadow_checks": self.shadow_checks,
+                "shadow_dropped": self.shadow_dropped,
+                "shadow_disagreements": dict(self.shadow_disagreements),
+            }
+
+# Estadísticas compartidas por todo el proceso
+local_first_stats = LocalFirstStats()
+
+class ShadowChecker:
+    """
+    Envía en segundo plano una fracción de las respuestas locales seguras al LLM
+    para medir cuántas veces el detector local se equivoca por encima del umbral.
+    Como mucho hay max_workers verificaciones en curso; las que llegan con todos los
+    hilos ocupados se descartan (shadow_dropped) en lugar de acumularse en la cola
+    """
+
+    def __init__(self, rate, stats=None, max_workers=2):
+        self.rate = rate
+        self.stats = stats or local_first_stats
+        self.max_workers = max_workers
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+
+    def maybe_check(self, user_message, local_intent, detect):
+        """Lanza la verificación con probabilidad rate; detect(mensaje) devuelve (intención, origen)"""
+        if self.rate <= 0 or random.random() >= self.rate:
+            return
+
+        if not self._slots.acquire(blocking=False):
+            self.stats.record_shadow_dropped()
+            return
+
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='shadow')
+
+        app = current_app._get_current_object()
+
+        def check():
+            try:
+                with app.app_context():
+                    intent_data, source = detect(user_message)
+                    if source != 'fallback':
+                        self.stats.record_shadow(local_intent, intent_data.get('intent', 'desconocido'))
+            finally:
+                self._slots.release()
+
+        try:
+            self._executor.submit(check)
+        except RuntimeError:
+            # Executor cerrado al terminar el proceso
+            self._slots.release()
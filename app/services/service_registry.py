@@ -0,0 +1,102 @@
+import os
+import threading
+from flask import current_app
+from app.services.chatbot_service import ChatbotService
+
+# Claves de configuración que determinan cómo se construyen los servicios.
+# Si alguna cambia, los servicios se reconstruyen en la siguiente solicitud.
+CONFIG_KEYS = (
+    'DEEPSEEK_API_KEY',
+    'DEEPSEEK_MODEL',
+    'DEEPSEEK_BASE_URL',
+    'OPENAI_API_KEY',
+    'OPENAI_MODEL',
+    'OPENAI_BASE_URL',
+    'NLP_SERVICE',
+    'HEDGE_DELAY_MS',
+    'HEDGE_TIMEOUT',
+    'HEDGE_MAX_WORKERS',
+    'LOCAL_FIRST_THRESHOLD',
+    'LOCAL_FIRST_SHADOW_RATE',
+    'CIRCUIT_BREAKER_ENABLED',
+    'CIRCUIT_BREAKER_WINDOW',
+    'CIRCUIT_BREAKER_MIN_CALLS',
+    'CIRCUIT_BREAKER_ERROR_RATE',
+    'CIRCUIT_BREAKER_SLOW_CALL_SECONDS',
+    'CIRCUIT_BREAKER_SLOW_CALL_RATE',
+    'CIRCUIT_BREAKER_OPEN_SECONDS',
+    'CIRCUIT_BREAKER_PROBE_RATIO',
+    'INTENT_CACHE_ENABLED',
+    'INTENT_CACHE_SIZE',
+    'INTENT_CACHE_TTL',
+    'INTENT_CACHE_SHARED',
+    'INTENT_CACHE_DB_PATH',
+    'INTENT_CACHE_CANONICALIZE',
+    'INTENT_PROMPT_VERSION',
+    'LLM_MAX_TOKENS',
+    'LLM_JSON_MODE',
+    'LLM_POOL_CONNECTIONS',
+    'LLM_POOL_MAXSIZE',
+    'LLM_CONNECT_TIMEOUT',
+    'LLM_READ_TIMEOUT',
+    'LLM_MAX_RETRIES',
+    'LLM_RETRY_BACKOFF_MS',
+    'LLM_RETRY_MAX_BACKOFF_MS',
+)
+
+class ServiceRegistry:
+    """
+    Registro de servicios a nivel de proceso.
+    Mantiene un único ChatbotService inicializado (con sus clientes HTTP) por
+    proceso worker y lo reutiliza entre solicitudes y entre hilos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (pid, huella de configuración, servicio) se guarda como una sola tupla
+        # para poder leerla de forma atómica sin tomar el lock
+        self._entry = None
+        self.builds = 0
+
+    def _config_fingerprint(self, config):
+        """Calcula la huella de la configuración relevante para los servicios"""
+        return tuple(config.get(key) for key in CONFIG_KEYS)
+
+    def get_chatbot_service(self):
+        """Obtiene el servicio del chatbot, construyéndolo solo si es necesario"""
+        fingerprint = self._config_fingerprint(current_app.config)
+        pid = os.getpid()
+
+        # Camino rápido: servicio ya construido en este proceso con la misma configuración
+        entry = self._entry
+        if entry is not None and entry[0] == pid and entry[1] == fingerprint:
+            return entry[2]
+
+        with self._lock:
+            entry = self._entry
+            if entry is None or entry[0] != pid or entry[1] != fingerprint:
+                if entry is not None and current_app:
+                    if entry[0] != pid:
+                        current_app.logger.info("Proceso nuevo detectado (fork), reconstruyendo servicios del chatbot")
+                    else:
+                        current_app.logger.info("Configuración de servicios modificada, reconstruyendo servicios del chatbot")
+
+                service = ChatbotService().initialize()
+                entry = (pid, fingerprint, service)
+                self._entry = entry
+                self.builds += 1
+
+            return entry[2]
+
+    def reset(self):
+        """Descarta los servicios actuales; se reconstruirán en la siguiente solicitud"""
+        with self._lock:
+            self._entry = None
+
+# Registro único por proceso. Tras un fork, la comprobación del pid hace que
+# cada worker de gunicorn construya sus propios servicios y clientes.
+service_registry = ServiceRegistry()
+
+def get_chatbot_service():
+    """Obtener el servicio del chatbot compartido por el proceso actual"""
+    return service_registry.get_chatbot_service()
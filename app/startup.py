@@ -0,0 +1,66 @@
+import gc
+import importlib
+import os
+import time
+from app.models.database import close_all_connections, init_db
+from app.services.fallback_service import FallbackService
+from app.services.prompts import token_counter
+
+# Modos de NLP que nunca llaman a un proveedor LLM
+LOCAL_ONLY_MODES = ('fallback',)
+
+def provider_configured(config):
+    """Indica si algún proveedor LLM está configurado y puede llegar a usarse"""
+    if config.get('NLP_SERVICE', 'auto') in LOCAL_ONLY_MODES:
+        return False
+    return bool(config.get('DEEPSEEK_API_KEY') or config.get('OPENAI_API_KEY'))
+
+def provider_sdk_needed(config):
+    """
+    Indica si el SDK de openai llegará a usarse: las llamadas síncronas van por
+    http_client.py y solo el camino asíncrono lo necesita (ASGI=true, que fijan
+    asgi.py y el perfil asgi de gunicorn.conf.py)
+    """
+    return provider_configured(config) and config.get('ASGI', False)
+
+def init_database(app):
+    """Crea la carpeta de la base si hace falta y aplica las migraciones y los datos de ejemplo"""
+    with app.app_context():
+        data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+        os.makedirs(data_dir, exist_ok=True)
+        init_db()
+        # Si es el proceso maestro, los workers no deben heredar la conexión abierta
+        close_all_connections()
+        app.logger.info("Base de datos inicializada correctamente.")
+
+def preload(app):
+    """
+    Deja listo en el proceso maestro lo que los workers solo leen, para que tras el fork
+    lo compartan copia-en-escritura en lugar de construirlo cada uno. Las tablas del
+    sanitizador, el canonicalizador y el prompt ya se crean al importar sus módulos; aquí
+    se añaden:
+    - la codificación de tiktoken de los modelos configurados, para contar tokens (sin
+      ella, cada worker la carga en segundo plano y estima los tokens mientras tanto)
+    - el SDK de openai, si se sirve asgi.py con un proveedor configurado (los módulos, no
+      los clientes: los clientes HTTP no sobreviven al fork y cada worker crea los suyos
+      en la primera solicitud)
+    - las expresiones del detector local, que quedan en la caché del módulo re y que el
+      FallbackService de cada worker recupera ya compiladas
+    Al final congela el GC: los objetos creados hasta aquí pasan a la generación permanente
+    y las recolecciones de los workers ya no los recorren (recorrerlos escribe en sus
+    cabeceras y obliga a copiar las páginas compartidas)
+    """
+    start = time.perf_counter()
+    if provider_configured(app.config):
+        for model in (app.config.get('DEEPSEEK_MODEL'), app.config.get('OPENAI_MODEL')):
+            token_counter.load(model, app.logger)
+    if provider_sdk_needed(app.config):
+        importlib.import_module('openai')
+    FallbackService()
+
+    gc.collect()
+    gc.freeze()
+    app.logger.info(
+        f"Precarga completada en {(time.perf_counter() - start) * 1000:.0f} ms "
+        f"({gc.get_freeze_count()} objetos congelados)"
+    )
@@ -3,6 +3,14 @@ document.addEventListener('DOMContentLoaded', function() {
     const userInput = document.getElementById('user-input');
     const sendButton = document.getElementById('send-button');
     
+    // Descripciones de las intenciones para mostrar el progreso
+    const intentLabels = {
+        'mejores_compradores': 'Consultando los mejores compradores...',
+        'deudores_altos': 'Consultando los deudores con montos más altos...',
+        'contar_compradores': 'Contando compradores...',
+        'contar_deudores': 'Contando deudores...'
+    };
+    
     // Función para enviar mensajes
     function sendMessage() {
         const message = userInput.value.trim();
@@ -18,7 +26,21 @@ document.addEventListener('DOMContentLoaded', function() {
         // Mostrar indicador de escritura
         showTypingIndicator();
         
-        // Enviar mensaje al servidor y procesar respuesta
+        // Usar streaming si el navegador lo soporta; si no, la petición completa
+        if (window.ReadableStream && window.TextDecoder) {
+            sendMessageStream(message).catch(error => {
+                console.error('Error en streaming, reintentando sin streaming:', error);
+                sendMessageFull(message);
+            });
+        } else {
+            sendMessageFull(message);
+        }
+    }
+    
+    // Envía el mensaje a /chatbot y muestra la respuesta completa
+    function sendMessageFull(message) {
+        showTypingIndicator();
+        
         fetch('/chatbot', {
             method: 'POST',
             headers: {
@@ -32,11 +54,7 @@ document.addEventListener('DOMContentLoaded', function() {
             hideTypingIndicator();
             
             // Mostrar respuesta del chatbot
-            if (data.status === 'success') {
-                addMessage(data.message, 'bot');
-            } else {
-                addMessage('Ha ocurrido un error: ' + data.message, 'bot');
-            }
+            showFinalResponse(data);
         })
         .catch(error => {
             // Ocultar indicador de escritura
@@ -48,6 +66,117 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Envía el mensaje a /chatbot/stream y muestra los eventos a medida que llegan
+    async function sendMessageStream(message) {
+        const response = await fetch('/chatbot/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify({ message: message })
+        });
+        
+        if (!response.ok || !response.body) {
+            throw new Error('Respuesta de streaming no válida: ' + response.status);
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let progressElement = null;
+        let finished = false;
+        
+        try {
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                
+                buffer += decoder.decode(value, { stream: true });
+                
+                // Los eventos SSE terminan con una línea en blanco
+                let separator;
+                while ((separator = buffer.indexOf('\n\n')) >= 0) {
+                    const rawEvent = buffer.slice(0, separator);
+                    buffer = buffer.slice(separator + 2);
+                    
+                    const event = parseSseEvent(rawEvent);
+                    if (!event) continue;
+                    
+                    if (event.name === 'intent') {
+                        hideTypingIndicator();
+                        const label = intentLabels[event.data.intent] || 'Procesando tu consulta...';
+                        if (!progressElement) {
+                            progressElement = addMessage(label, 'bot');
+                        } else {
+                            setMessageText(progressElement, label);
+                        }
+                    } else if (event.name === 'row') {
+                        if (progressElement) {
+                            appendMessageLine(progressElement, event.data.text);
+                        }
+                    } else if (event.name === 'done') {
+                        hideTypingIndicator();
+                        finished = true;
+                        if (progressElement) {
+                            progressElement.remove();
+                        }
+                        showFinalResponse(event.data);
+                    }
+                }
+            }
+        } catch (error) {
+            // La respuesta final ya se mostró: no hace falta repetir la consulta
+            if (finished) return;
+            // Si la conexión se corta a mitad, se quita la respuesta parcial antes de
+            // que sendMessage repita la consulta sin streaming
+            if (progressElement) {
+                progressElement.remove();
+            }
+            throw error;
+        }
+        
+        if (!finished) {
+            hideTypingIndicator();
+            if (progressElement) {
+                progressElement.remove();
+            }
+            addMessage('Error de conexión. Por favor, intenta de nuevo más tarde.', 'bot');
+        }
+    }
+    
+    // Convierte un bloque SSE en {name, data}
+    function parseSseEvent(rawEvent) {
+        let name = 'message';
+        const dataLines = [];
+        
+        rawEvent.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                name = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        });
+        
+        if (dataLines.length === 0) return null;
+        
+        try {
+            return { name: name, data: JSON.parse(dataLines.join('\n')) };
+        } catch (error) {
+            console.error('Evento SSE no válido:', rawEvent);
+            return null;
+        }
+    }
+    
+    // Muestra la respuesta final del chatbot
+    function showFinalResponse(data) {
+        if (data.status === 'success') {
+            addMessage(data.message, 'bot');
+        } else {
+            addMessage('Ha ocurrido un error: ' + data.message, 'bot');
+        }
+    }
+    
     // Función para agregar un mensaje al chat
     function addMessage(message, sender) {
         const messageElement = document.createElement('div');
@@ -64,10 +193,29 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Scroll al último mensaje
         chatMessages.scrollTop = chatMessages.scrollHeight;
+        
+        return messageElement;
+    }
+    
+    // Reemplaza el texto de un mensaje existente
+    function setMessageText(messageElement, text) {
+        const messageContent = messageElement.querySelector('.message-content');
+        messageContent.textContent = text;
+    }
+    
+    // Agrega una línea a un mensaje existente (filas recibidas por streaming)
+    function appendMessageLine(messageElement, text) {
+        const messageContent = messageElement.querySelector('.message-content');
+        messageContent.appendChild(document.createElement('br'));
+        messageContent.appendChild(document.createTextNode(text));
+        chatMessages.scrollTop = chatMessages.scrollHeight;
     }
     
     // Función para mostrar indicador de escritura
     function showTypingIndicator() {
+        // No duplicar el indicador si ya está visible
+        if (document.getElementById('typing-indicator')) return;
+        
         const typingElement = document.createElement('div');
         typingElement.id = 'typing-indicator';
         typingElement.classList.add('message', 'bot', 'typing-indicator');
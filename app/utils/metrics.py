@@ -0,0 +1,376 @@
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from flask import g, request
+from app.services.hedging import is_valid_intent
+from app.utils.tracing import current_trace, span
+
+# Límites de los histogramas (segundos). Las solicitudes y los proveedores LLM
+# tardan de milisegundos a decenas de segundos; las consultas SQLite, microsegundos
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+DEPTH_BUCKETS = (1, 2, 3, 4)
+# Tokens por llamada al LLM: la salida de una clasificación ocupa decenas, el prompt cientos
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+# Métricas expuestas: nombre -> (tipo, ayuda, límites de los histogramas)
+METRICS = {
+    'http_requests_total': ('counter', 'Solicitudes HTTP atendidas por ruta, método y código', None),
+    'http_request_duration_seconds': ('histogram', 'Duración de las solicitudes HTTP por ruta', REQUEST_BUCKETS),
+    'http_requests_in_flight': ('gauge', 'Solicitudes HTTP en curso por ruta', None),
+    'chatbot_messages_total': ('counter', 'Mensajes procesados por intención y estado de la respuesta', None),
+    'chatbot_message_duration_seconds': ('histogram', 'Duración del procesamiento de un mensaje por intención', REQUEST_BUCKETS),
+    'chatbot_intent_source_total': ('counter', 'Origen de la intención (local, cache, proveedor o fallback)', None),
+    'chatbot_intent_cascade_depth': ('histogram', 'Detectores consultados en la cascada hasta obtener la intención', DEPTH_BUCKETS),
+    'llm_provider_calls_total': ('counter', 'Llamadas a cada detector de intenciones por resultado', None),
+    'llm_provider_call_duration_seconds': ('histogram', 'Duración de las llamadas a cada detector de intenciones', REQUEST_BUCKETS),
+    'llm_prompt_tokens': ('histogram', 'Tokens de entrada de cada llamada al LLM (tiktoken)', TOKEN_BUCKETS),
+    'llm_completion_tokens': ('histogram', 'Tokens de salida de cada llamada al LLM (tiktoken)', TOKEN_BUCKETS),
+    'llm_tokens_total': ('counter', 'Tokens enviados y recibidos por proveedor y tipo (prompt, completion, cached_prompt)', None),
+    'llm_http_requests_total': ('counter', 'Solicitudes HTTP a los proveedores LLM por host (cada reintento cuenta)', None),
+    'llm_http_connections_total': ('counter', 'Conexiones nuevas (handshake TCP y TLS) a los proveedores LLM por host', None),
+    'llm_http_retries_total': ('counter', 'Reintentos de las llamadas a los proveedores LLM por motivo', None),
+    'db_query_duration_seconds': ('histogram', 'Duración de las consultas a la base de datos por función', DB_BUCKETS),
+    'db_query_errors_total': ('counter', 'Consultas a la base de datos que lanzaron una excepción', None),
+}
+
+class MetricsRegistry:
+    """
+    Contadores, gauges e histogramas del proceso en memoria. Registrar un valor solo
+    toma un lock y actualiza un diccionario; no hay E/S en el camino de la solicitud.
+
+    Con varios workers de gunicorn cada proceso tiene sus propios valores. Si hay un
+    directorio configurado (METRICS_DIR), un hilo de cada proceso vuelca sus series a
+    metrics-<pid>.json cada flush_seconds, y render() suma los archivos de todos los
+    workers. Los contadores e histogramas de los workers terminados se siguen sumando
+    (los totales nunca bajan); sus gauges se descartan.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._values = {}
+        self._changes = 0
+        self._flushed_changes = 0
+        self._flusher = None
+        self.enabled = True
+        self.directory = None
+        self.flush_seconds = 1.0
+
+    def configure(self, enabled=True, directory=None, flush_seconds=1.0):
+        self.enabled = enabled
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        if enabled and directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _after_fork(self):
+        # El worker empieza sin los valores del proceso padre, que ya están en su propio archivo
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._values = {}
+        self._changes = 0
+        self._flushed_changes = 0
+        self._flusher = None
+
+    def inc(self, name, amount=1, **labels):
+        """Suma amount a un contador o gauge"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            self._changes += 1
+        if self._flusher is None and self.directory:
+            self._start_flusher()
+
+    def observe(self, name, value, **labels):
+        """Registra una observación en un histograma"""
+        if not self.enabled:
+            return
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect_left(buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Un contador por límite, uno para +Inf y la suma de los valores al final
+                series = self._values[key] = [0] * (len(buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+            self._changes += 1
+        if self._flusher is None and self.directory:
+            self._start_flusher()
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+            self._changes += 1
+
+    def _snapshot(self):
+        with self._lock:
+            return [
+                [name, list(labels), list(value) if isinstance(value, list) else value]
+                for (name, labels), value in self._values.items()
+            ]
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def flush(self):
+        """Escribe las series del proceso en su archivo (reemplazo atómico) si cambiaron"""
+        if not self.directory or self._changes == self._flushed_changes:
+            return
+        with self._flush_lock:
+            changes = self._changes
+            pid = os.getpid()
+            tmp_path = self._path(pid) + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"pid": pid, "series": self._snapshot()}, f)
+            os.replace(tmp_path, self._path(pid))
+            self._flushed_changes = changes
+
+    def _collect(self):
+        """Series de todos los workers: [(nombre, etiquetas, valor)]"""
+        if not self.directory:
+            return [(name, tuple(tuple(label) for label in labels), value) for name, labels, value in self._snapshot()]
+
+        self.flush()
+        own_pid = os.getpid()
+        collected = []
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = data["pid"] == own_pid or _pid_alive(data["pid"])
+            for name, labels, value in data["series"]:
+                if name not in METRICS or (METRICS[name][0] == 'gauge' and not alive):
+                    continue
+                collected.append((name, tuple(tuple(label) for label in labels), value))
+        return collected
+
+    def render(self):
+        """Texto en el formato de exposición de Prometheus (text/plain; version=0.0.4)"""
+        merged = {}
+        for name, labels, value in self._collect():
+            key = (name, labels)
+            if isinstance(value, list):
+                current = merged.get(key)
+                merged[key] = value if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                merged[key] = merged.get(key, 0) + value
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            series = sorted((labels, value) for (metric, labels), value in merged.items() if metric == name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                if kind != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(buckets) + [math.inf], value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+# Registro compartido por todo el proceso
+metrics = MetricsRegistry()
+os.register_at_fork(after_in_child=metrics._after_fork)
+
+def init_app(app):
+    """Configura el registro con la aplicación y mide todas las solicitudes HTTP"""
+    metrics.configure(
+        enabled=app.config.get('METRICS_ENABLED', True),
+        directory=app.config.get('METRICS_DIR'),
+        flush_seconds=app.config.get('METRICS_FLUSH_SECONDS', 1.0)
+    )
+    if not metrics.enabled:
+        return
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_route = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+        g.metrics_start = time.perf_counter()
+        metrics.inc('http_requests_in_flight', route=g.metrics_route)
+
+    @app.after_request
+    def record_response_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc=None):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        route = g.metrics_route
+        # Sin after_request (excepción no controlada) la respuesta es un 500
+        record_request(route, request.method, g.pop('metrics_status', 500), time.perf_counter() - start)
+
+def record_request(route, method, status, seconds):
+    """Cierra una solicitud HTTP iniciada con http_requests_in_flight += 1"""
+    metrics.inc('http_requests_in_flight', -1, route=route)
+    metrics.inc('http_requests_total', route=route, method=method, code=str(status))
+    metrics.observe('http_request_duration_seconds', seconds, route=route)
+
+def record_message(intent, status, seconds):
+    metrics.inc('chatbot_messages_total', intent=intent, status=status)
+    metrics.observe('chatbot_message_duration_seconds', seconds, intent=intent)
+
+def record_intent_source(source):
+    metrics.inc('chatbot_intent_source_total', source=source)
+
+def record_llm_tokens(provider, prompt_tokens, completion_tokens, cached_prompt_tokens=None):
+    """Tokens de una llamada al LLM; cached_prompt_tokens es la parte del prompt servida desde la caché del proveedor"""
+    metrics.observe('llm_prompt_tokens', prompt_tokens, provider=provider)
+    metrics.observe('llm_completion_tokens', completion_tokens, provider=provider)
+    metrics.inc('llm_tokens_total', prompt_tokens, provider=provider, kind='prompt')
+    metrics.inc('llm_tokens_total', completion_tokens, provider=provider, kind='completion')
+    if cached_prompt_tokens:
+        metrics.inc('llm_tokens_total', cached_prompt_tokens, provider=provider, kind='cached_prompt')
+
+def record_llm_http_request(host):
+    metrics.inc('llm_http_requests_total', host=host)
+
+def record_llm_connection(host):
+    metrics.inc('llm_http_connections_total', host=host)
+
+def record_llm_retry(provider, reason):
+    metrics.inc('llm_http_retries_total', provider=provider, reason=reason)
+
+def record_cascade_depth(chain, source):
+    """
+    Cuántos detectores se consultaron al recorrer la cascada de proveedores (chain):
+    la posición del proveedor que respondió, o todos más el fallback
+    """
+    names = [name for name, _ in chain]
+    depth = names.index(source) + 1 if source in names else len(names) + 1
+    metrics.observe('chatbot_intent_cascade_depth', depth)
+
+def timed_query(func):
+    """Mide la duración (y los errores) de una función de consulta de database.py, con su tramo de traza"""
+    name = func.__name__
+    span_name = f"db.{name}"
+
+    @wraps(func)
+    def wrapped(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with span(span_name):
+                return func(*args, **kwargs)
+        except Exception:
+            metrics.inc('db_query_errors_total', function=name)
+            raise
+        finally:
+            metrics.observe('db_query_duration_seconds', time.perf_counter() - start, function=name)
+
+    return wrapped
+
+class MeteredService:
+    """
+    Envuelve un detector de intenciones (proveedor LLM o fallback) y registra la
+    duración y el resultado de cada llamada: ok, error (respuesta no válida) o exception
+    """
+
+    def __init__(self, name, service):
+        self.name = name
+        self.service = service
+
+    def __getattr__(self, name):
+        return getattr(self.service, name)
+
+    def _record(self, start, outcome):
+        metrics.inc('llm_provider_calls_total', provider=self.name, outcome=outcome)
+        metrics.observe('llm_provider_call_duration_seconds', time.perf_counter() - start, provider=self.name)
+
+    def detect_intent(self, user_message):
+        start = time.perf_counter()
+        try:
+            with span(self.name):
+                intent_data = self.service.detect_intent(user_message)
+        except Exception:
+            self._record(start, 'exception')
+            raise
+        self._record(start, 'ok' if is_valid_intent(intent_data) else 'error')
+        return intent_data
+
+    async def detect_intent_async(self, user_message):
+        start = time.perf_counter()
+        try:
+            with span(self.name):
+                intent_data = await self.service.detect_intent_async(user_message)
+        except Exception:
+            self._record(start, 'exception')
+            raise
+        self._record(start, 'ok' if is_valid_intent(intent_data) else 'error')
+        return intent_data
+
+    def stream_intent(self, user_message):
+        # El generador se reanuda entre eventos: el tramo se añade al terminar, sin abrirlo
+        trace = current_trace()
+        start = time.perf_counter()
+        intent_data = None
+        try:
+            for event in self.service.stream_intent(user_message):
+                if event["type"] == "result":
+                    intent_data = event["data"]
+                yield event
+        except Exception:
+            self._record(start, 'exception')
+            raise
+        finally:
+            if trace is not None:
+                trace.add(self.name, start, time.perf_counter(), 0)
+        self._record(start, 'ok' if is_valid_intent(intent_data) else 'error')
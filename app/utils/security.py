@@ -1,5 +1,43 @@
 import re
-import html
+import hmac
+from functools import lru_cache, wraps
+from flask import current_app, request, jsonify
+from app.utils.tracing import span
+
+# Caracteres que podrían manipular el prompt (se sustituyen por espacios)
+STRIPPED_CHARACTERS = '\\`*_{}[]()#+-.!'
+
+# Palabras clave que podrían ser utilizadas para manipular el sistema
+PROMPT_INJECTION_KEYWORDS = (
+    'ignora', 'olvida', 'sistema', 'instrucciones',
+    'prompt', 'desatender', 'override', 'bypass',
+    'advertencia', 'alerta', 'warning', 'alert',
+    'sql', 'select', 'insert', 'update', 'delete',
+    'drop', 'alter', 'create', 'execute', 'exec'
+)
+
+# Escapado HTML y eliminación de caracteres en una sola pasada de str.translate.
+# Equivale a html.escape seguido de la sustitución de STRIPPED_CHARACTERS: por eso
+# el '#' de la entidad &#x27; también queda como espacio
+_SANITIZE_TABLE = str.maketrans({
+    **{char: ' ' for char in STRIPPED_CHARACTERS},
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '& x27;',
+})
+
+# Todas las palabras clave en una sola expresión (el orden no importa: cada
+# alternativa exige límites de palabra a ambos lados)
+_INJECTION_PATTERN = re.compile(
+    r'\b(?:' + '|'.join(PROMPT_INJECTION_KEYWORDS) + r')\b',
+    re.IGNORECASE
+)
+
+# Mensajes sanitizados que se recuerdan: el mismo texto pasa por el fallback,
+# el proveedor LLM, la caché de intenciones y el canonicalizador
+SANITIZE_CACHE_SIZE = 4096
 
 def sanitize_input(text):
     """
@@ -13,31 +51,31 @@ def sanitize_input(text):
         text = str(text)
     
     # Limitar la longitud del texto
-    text = text[:1000]  # Limitar a 1000 caracteres
-    
-    # Escapar caracteres HTML para prevenir XSS
-    text = html.escape(text)
-    
-    # Remover caracteres de control y secuencias potencialmente maliciosas
-    # Eliminar caracteres que podrían manipular el prompt
-    text = re.sub(r'[\\`\*_\{\}\[\]\(\)#\+\-\.!]', ' ', text)
+    with span('sanitize'):
+        return _sanitize(text[:1000])  # Limitar a 1000 caracteres
+
+@lru_cache(maxsize=SANITIZE_CACHE_SIZE)
+def _sanitize(text):
+    # Escapar caracteres HTML para prevenir XSS y eliminar los que podrían manipular el prompt
+    text = text.translate(_SANITIZE_TABLE)
     
     # Eliminar palabras clave que podrían ser utilizadas para manipular el sistema
-    prompt_injection_patterns = [
-        r'\bignora\b', r'\bolvida\b', r'\bsistema\b', r'\binstrucciones\b',
-        r'\bprompt\b', r'\bdesatender\b', r'\boverride\b', r'\bbypass\b',
-        r'\badvertencia\b', r'\balerta\b', r'\bwarning\b', r'\balert\b',
-        r'\bsql\b', r'\bselect\b', r'\binsert\b', r'\bupdate\b', r'\bdelete\b',
-        r'\bdrop\b', r'\balter\b', r'\bcreate\b', r'\bexecute\b', r'\bexec\b'
-    ]
-    
-    for pattern in prompt_injection_patterns:
-        text = re.sub(pattern, '[redactado]', text, flags=re.IGNORECASE)
+    text = _INJECTION_PATTERN.sub('[redactado]', text)
     
     # Normalizar espacios
-    text = re.sub(r'\s+', ' ', text).strip()
-    
-    return text
+    return ' '.join(text.split())
+
+def sanitize_cache_stats():
+    """Aciertos y fallos de la memoización de sanitize_input en este proceso"""
+    info = _sanitize.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_ratio": round(info.hits / lookups, 3) if lookups else 0.0,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+    }
 
 def validate_json_input(json_data, required_fields=None):
     """
@@ -51,4 +89,24 @@ def validate_json_input(json_data, required_fields=None):
         if missing_fields:
             return False, f"Faltan campos requeridos: {', '.join(missing_fields)}"
     
-    return True, ""
\ No newline at end of file
+    return True, ""
+
+def require_admin_token(view):
+    """
+    Protege un endpoint de administración con el token ADMIN_TOKEN (cabecera X-Admin-Token).
+    Si no hay token configurado, el endpoint queda deshabilitado
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        expected = current_app.config.get('ADMIN_TOKEN')
+        provided = request.headers.get('X-Admin-Token', '')
+        
+        if not expected or not hmac.compare_digest(provided, expected):
+            return jsonify({
+                "status": "error",
+                "message": "No autorizado"
+            }), 403
+        
+        return view(*args, **kwargs)
+    
+    return wrapped
@@ -0,0 +1,198 @@
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from flask import g, request
+
+# Traza de la solicitud en curso y profundidad del tramo abierto. Son ContextVar y no
+# variables de hilo: asyncio.to_thread y las tareas asyncio heredan la traza, y los
+# hilos de un pool la reciben si se lanzan con contextvars.copy_context().run
+_current_trace = contextvars.ContextVar('trace', default=None)
+_depth = contextvars.ContextVar('span_depth', default=0)
+
+class Trace:
+    """Tramos (nombre, inicio, duración, profundidad) de una solicitud, en segundos desde su inicio"""
+
+    __slots__ = ('trace_id', 'route', 'method', 'started_at', 'start', 'spans', 'status', 'duration')
+
+    def __init__(self, route, method):
+        self.trace_id = os.urandom(8).hex()
+        self.route = route
+        self.method = method
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self.status = None
+        self.duration = None
+
+    def add(self, name, start, end, depth):
+        # list.append es atómico: los tramos pueden llegar de varios hilos a la vez
+        self.spans.append((name, start - self.start, end - start, depth))
+
+    def elapsed(self):
+        return self.duration if self.duration is not None else time.perf_counter() - self.start
+
+    def server_timing(self):
+        """
+        Cabecera Server-Timing: la duración total y la suma de los tramos de cada nombre
+        (un nombre repetido, como dos consultas a la base, aparece una vez con su número)
+        """
+        totals = {}
+        for name, _, duration, _ in self.spans:
+            total, count = totals.get(name, (0.0, 0))
+            totals[name] = (total + duration, count + 1)
+        entries = [f"total;dur={self.elapsed() * 1000:.2f}"]
+        for name, (total, count) in totals.items():
+            entry = f"{name};dur={total * 1000:.2f}"
+            if count > 1:
+                entry += f';desc="x{count}"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "route": self.route,
+            "method": self.method,
+            "status": self.status,
+            "started_at": round(self.started_at, 3),
+            "duration_ms": round(self.elapsed() * 1000, 3),
+            "spans": [
+                {"name": name, "start_ms": round(start * 1000, 3), "duration_ms": round(duration * 1000, 3), "depth": depth}
+                for name, start, duration, depth in sorted(self.spans, key=lambda s: s[1])
+            ],
+        }
+
+class span:
+    """
+    Tramo de la traza en curso: with span('db.contar_compradores'): ...
+    Sin traza (solicitud no muestreada o fuera de una solicitud) no hace nada más
+    que leer una ContextVar
+    """
+
+    __slots__ = ('name', 'trace', 'start', 'token')
+
+    def __init__(self, name):
+        self.name = name
+        self.trace = _current_trace.get()
+
+    def __enter__(self):
+        if self.trace is not None:
+            self.token = _depth.set(_depth.get() + 1)
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is not None:
+            end = time.perf_counter()
+            _depth.reset(self.token)
+            self.trace.add(self.name, self.start, end, _depth.get())
+        return False
+
+def current_trace():
+    return _current_trace.get()
+
+class TraceBuffer:
+    """Las últimas size trazas terminadas y las size más lentas del proceso"""
+
+    def __init__(self, size=100):
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self.resize(size)
+
+    def resize(self, size):
+        with self._lock:
+            self.size = size
+            self.recent = deque(maxlen=size)
+            # Montículo de mínimos por duración: la raíz es la más rápida de las guardadas
+            self.slowest = []
+
+    def add(self, trace):
+        with self._lock:
+            self.recent.append(trace)
+            item = (trace.duration, next(self._sequence), trace)
+            if len(self.slowest) < self.size:
+                heapq.heappush(self.slowest, item)
+            elif trace.duration > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, item)
+
+    def snapshot(self, limit=None):
+        with self._lock:
+            recent = list(reversed(self.recent))
+            slowest = [item[2] for item in sorted(self.slowest, reverse=True)]
+        return {
+            "recent": [trace.to_dict() for trace in recent[:limit]],
+            "slowest": [trace.to_dict() for trace in slowest[:limit]],
+        }
+
+class Tracer:
+    """Decide qué solicitudes se trazan y guarda las trazas terminadas"""
+
+    def __init__(self):
+        self.enabled = True
+        self.sample_rate = 0.1
+        self.server_timing = True
+        self.buffer = TraceBuffer()
+
+    def configure(self, enabled=True, sample_rate=0.1, server_timing=True, buffer_size=100):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.server_timing = server_timing
+        if buffer_size != self.buffer.size:
+            self.buffer.resize(buffer_size)
+
+    def start(self, route, method, force=False):
+        """Empieza la traza de una solicitud si se muestrea; devuelve (traza, token) o (None, None)"""
+        if not self.enabled or not (force or random.random() < self.sample_rate):
+            return None, None
+        trace = Trace(route, method)
+        return trace, _current_trace.set(trace)
+
+    def finish(self, trace, token, status):
+        trace.duration = time.perf_counter() - trace.start
+        trace.status = status
+        _current_trace.reset(token)
+        self.buffer.add(trace)
+
+# Trazador compartido por todo el proceso
+tracer = Tracer()
+
+def init_app(app):
+    """
+    Traza una fracción TRACE_SAMPLE_RATE de las solicitudes (todas las que traen la
+    cabecera X-Trace: 1) y devuelve sus tramos en la cabecera Server-Timing
+    """
+    tracer.configure(
+        enabled=app.config.get('TRACING_ENABLED', True),
+        sample_rate=app.config.get('TRACE_SAMPLE_RATE', 0.1),
+        server_timing=app.config.get('TRACE_SERVER_TIMING', True),
+        buffer_size=app.config.get('TRACE_BUFFER_SIZE', 100)
+    )
+    if not tracer.enabled:
+        return
+
+    @app.before_request
+    def start_trace():
+        route = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+        g.trace, g.trace_token = tracer.start(route, request.method, force=request.headers.get('X-Trace') == '1')
+
+    @app.after_request
+    def add_server_timing(response):
+        trace = g.get('trace')
+        if trace is not None:
+            trace.status = response.status_code
+            response.headers['X-Trace-Id'] = trace.trace_id
+            if tracer.server_timing:
+                response.headers['Server-Timing'] = trace.server_timing()
+        return response
+
+    @app.teardown_request
+    def finish_trace(exc=None):
+        trace = g.pop('trace', None)
+        if trace is not None:
+            # Sin after_request (excepción no controlada) la respuesta es un 500
+            tracer.finish(trace, g.pop('trace_token'), trace.status or 500)
@@ -0,0 +1,12 @@
+import os
+
+# Modo de servidor explícito para run.py (precarga del SDK de openai, ver app/startup.py):
+# debe fijarse antes de importarlo
+if not os.environ.get('ASGI'):
+    os.environ['ASGI'] = 'true'
+
+from run import app as flask_app
+from app.asgi import create_asgi_app
+
+# Punto de entrada ASGI: uvicorn asgi:app --workers 2
+app = create_asgi_app(flask_app)
@@ -0,0 +1,106 @@
+"""
+Consultas por segundo con varios lectores concurrentes: una conexión nueva por
+solicitud (comportamiento anterior, modo rollback journal) frente a las conexiones
+persistentes por hilo de get_db() en modo WAL con los pragmas ajustados.
+Opcionalmente con un escritor concurrente.
+
+Uso: python -m benchmarks.bench_db_connections [filas] [segundos por caso]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from app.models.database import get_db, init_db
+from benchmarks.common import create_bench_app
+
+QUERY = 'SELECT id, nombre, total_compras FROM compradores ORDER BY total_compras DESC, id ASC LIMIT 10'
+
+def populate(db_path, rows, journal_mode):
+    conn = sqlite3.connect(db_path)
+    conn.execute(f'PRAGMA journal_mode={journal_mode}')
+    conn.execute('CREATE TABLE IF NOT EXISTS compradores (id INTEGER PRIMARY KEY, nombre TEXT NOT NULL, total_compras REAL NOT NULL)')
+    rng = random.Random(1)
+    conn.executemany(
+        'INSERT OR REPLACE INTO compradores VALUES (?, ?, ?)',
+        ((i, f'Comprador {i}', round(rng.uniform(10, 10000), 2)) for i in range(1, rows + 1))
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_bench_total ON compradores (total_compras DESC)')
+    conn.commit()
+    conn.close()
+
+def legacy_request(app, db_path):
+    """Lo que hacía cada solicitud antes: calcular la ruta, mkdir, conectar, consultar y cerrar"""
+    data_dir = Path(app.root_path).parent / 'data'
+    data_dir.mkdir(exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    [dict(r) for r in conn.execute(QUERY).fetchall()]
+    conn.close()
+
+def pooled_request(app, db_path):
+    [dict(r) for r in get_db().execute(QUERY).fetchall()]
+
+def run_case(app, request, db_path, readers, seconds, with_writer):
+    stop = threading.Event()
+    counts = [0] * readers
+    write_errors = [0]
+
+    def reader(index):
+        with app.app_context():
+            while not stop.is_set():
+                request(app, db_path)
+                counts[index] += 1
+
+    def writer():
+        conn = sqlite3.connect(db_path, timeout=5)
+        rng = random.Random(2)
+        while not stop.is_set():
+            try:
+                with conn:
+                    conn.execute('UPDATE compradores SET total_compras = ? WHERE id = ?',
+                                 (round(rng.uniform(10, 10000), 2), rng.randint(1, 1000)))
+            except sqlite3.OperationalError:
+                write_errors[0] += 1
+            time.sleep(0.005)
+        conn.close()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    if with_writer:
+        threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds, write_errors[0]
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, 'legacy.db')
+        pooled_path = os.path.join(tmp, 'pooled.db')
+        populate(legacy_path, rows, 'DELETE')
+        populate(pooled_path, rows, 'WAL')
+
+        app = create_bench_app(DATABASE_PATH=pooled_path, QUERY_CACHE_ENABLED=False)
+        with app.app_context():
+            init_db()
+
+        print(f"{rows} filas, {seconds:.0f}s por caso")
+        print(f"{'caso':<28} {'antes (q/s)':>14} {'después (q/s)':>14} {'mejora':>8}")
+        for with_writer in (False, True):
+            for readers in (1, 4, 8):
+                before, _ = run_case(app, legacy_request, legacy_path, readers, seconds, with_writer)
+                after, _ = run_case(app, pooled_request, pooled_path, readers, seconds, with_writer)
+                label = f"{readers} lectores" + (" + escritor" if with_writer else "")
+                print(f"{label:<28} {before:>14.0f} {after:>14.0f} {after / before:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
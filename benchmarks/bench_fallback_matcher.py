@@ -0,0 +1,78 @@
+"""
+Mide cuántos mensajes por segundo clasifica el detector compilado de FallbackService
+frente a la implementación anterior (bucles de re.search sin compilar), en aciertos y
+en fallos. Que ambas den exactamente la misma salida lo comprueba
+tests/test_fallback_matcher.py con la implementación de tests/legacy_fallback.py.
+
+Uso: python -m benchmarks.bench_fallback_matcher [mensajes_aleatorios]
+"""
+import re
+import sys
+import time
+from app.services.fallback_service import FallbackService
+from app.utils.security import sanitize_input
+from benchmarks.common import create_bench_app
+from tests.corpus import EDGE_CASES, random_messages, sample_corpus
+from tests.legacy_fallback import LegacyFallbackService
+
+def throughput(service, messages, min_seconds=1.0):
+    """Mensajes por segundo clasificando repetidamente la lista"""
+    processed = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        for message in messages:
+            service.detect_intent(message)
+        processed += len(messages)
+    return processed / (time.perf_counter() - start)
+
+def legacy_match(service, message):
+    for intent, patterns in service.intent_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, message, re.IGNORECASE):
+                return intent
+    return None
+
+def stage_throughput(match, messages, min_seconds=1.0):
+    """Mensajes por segundo de la etapa de coincidencia de patrones (sin sanitize_input)"""
+    processed = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        for message in messages:
+            match(message)
+        processed += len(messages)
+    return processed / (time.perf_counter() - start)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    corpus = EDGE_CASES + sample_corpus(2000) + random_messages(count)
+
+    # Separar aciertos de patrón (confianza 0.8) de fallos (parciales o desconocidos)
+    legacy = LegacyFallbackService()
+    hits = [m for m in corpus if legacy.detect_intent(m)['confidence'] == 0.8][:2000]
+    misses = [m for m in corpus if legacy.detect_intent(m)['confidence'] != 0.8][:2000]
+
+    app = create_bench_app()
+    print(f"\n{'caso':<40} {'antes (msg/s)':>16} {'después (msg/s)':>16} {'mejora':>8}")
+
+    # Solo la búsqueda de patrones, sobre mensajes ya sanitizados
+    legacy = LegacyFallbackService()
+    compiled = FallbackService()
+    for name, messages in (("aciertos", hits), ("fallos", misses)):
+        sanitized = [sanitize_input(m).lower() for m in messages]
+        before = stage_throughput(lambda m: legacy_match(legacy, m), sanitized)
+        after = stage_throughput(compiled._match_intent, sanitized)
+        print(f"{name + ', solo patrones':<40} {before:>16.0f} {after:>16.0f} {after / before:>7.1f}x")
+
+    for label, context in (("sin contexto de aplicación", None), ("con logging INFO", app)):
+        for name, messages in (("aciertos", hits), ("fallos", misses)):
+            if context is not None:
+                with context.app_context():
+                    before = throughput(LegacyFallbackService(), messages)
+                    after = throughput(FallbackService(), messages)
+            else:
+                before = throughput(LegacyFallbackService(), messages)
+                after = throughput(FallbackService(), messages)
+            print(f"{name + ', ' + label:<40} {before:>16.0f} {after:>16.0f} {after / before:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
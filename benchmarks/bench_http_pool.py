@@ -0,0 +1,69 @@
+"""
+Compara el coste por llamada al proveedor LLM abriendo una conexión nueva en cada
+llamada (requests.post, como el antiguo DeepseekService) frente al pool keep-alive
+compartido de app/services/http_client.py, contra el servidor LLM simulado sin
+latencia o contra la URL indicada. En local solo se ahorra el handshake TCP; contra
+un proveedor real por HTTPS se ahorra además el TLS, decenas de milisegundos.
+
+Uso:
+    python -m benchmarks.bench_http_pool [iteraciones]
+    python -m benchmarks.bench_http_pool 50 --url https://api.deepseek.com/chat/completions --api-key sk-...
+"""
+import argparse
+import subprocess
+import sys
+import time
+import requests
+from app.services.http_client import http_client
+from benchmarks.common import create_bench_app, measure, print_results
+
+def main():
+    parser = argparse.ArgumentParser(description="Conexión nueva por llamada frente al pool compartido")
+    parser.add_argument('iterations', type=int, nargs='?', default=500)
+    parser.add_argument('--url', help='URL de /chat/completions (por defecto, el servidor simulado)')
+    parser.add_argument('--api-key', default='mock')
+    parser.add_argument('--model', default='deepseek-chat')
+    parser.add_argument('--mock-port', type=int, default=8093)
+    args = parser.parse_args()
+
+    mock = None
+    url = args.url
+    if not url:
+        mock = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.mock_llm_server', '--port', str(args.mock_port), '--latency', 'fixed:0'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        url = f"http://127.0.0.1:{args.mock_port}/v1/chat/completions"
+        time.sleep(1)
+
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {args.api_key}"}
+    payload = {
+        "model": args.model,
+        "messages": [{"role": "user", "content": "top 3 compradores"}],
+        "max_tokens": 16,
+    }
+
+    def fresh_connection():
+        requests.post(url, headers=headers, json=payload, timeout=30).raise_for_status()
+
+    def pooled():
+        http_client.post(url, 'bench', headers=headers, json=payload)
+
+    results = {}
+    try:
+        with create_bench_app().app_context():
+            warmup = min(10, args.iterations)
+            results["antes: requests.post (conexión nueva)"] = measure(fresh_connection, args.iterations, warmup)
+            results["después: http_client.post (pool)"] = measure(pooled, args.iterations, warmup)
+    finally:
+        if mock is not None:
+            mock.terminate()
+            mock.wait()
+
+    print_results(f"Coste por llamada a {url}", results)
+    for host, entry in http_client.stats()["hosts"].items():
+        print(f"\nPool {host}: {entry['requests']} solicitudes, {entry['connections']} conexiones nuevas, "
+              f"reutilización {entry['reuse_rate']:.1%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Mide el coste de las métricas en el camino de la solicitud: registrar un contador
+y una observación de histograma, la ida y vuelta de POST /chatbot con y sin
+métricas, y generar /metrics a partir de los archivos de varios workers.
+
+Uso: python -m benchmarks.bench_metrics
+"""
+import os
+import tempfile
+from app.models.database import init_db
+from app.utils.metrics import MetricsRegistry, metrics
+from benchmarks.common import create_bench_app, measure, print_results
+from benchmarks.suite import cycling
+
+ROUNDS = 3
+MESSAGES = ["top 3 compradores", "cuántos deudores hay", "top 10 deudores", "hola"]
+
+def main():
+    results = {}
+
+    registry = MetricsRegistry()
+    results["inc (contador con 2 etiquetas)"] = measure(
+        lambda: registry.inc('chatbot_messages_total', intent='mejores_compradores', status='success'), 100000
+    )
+    results["observe (histograma con 1 etiqueta)"] = measure(
+        lambda: registry.observe('db_query_duration_seconds', 0.0004, function='contar_compradores'), 100000
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        clients = {}
+        for enabled in (False, True):
+            app = create_bench_app(
+                DATABASE_PATH=db_path,
+                NLP_SERVICE='fallback',
+                INTENT_CACHE_ENABLED=False,
+                METRICS_ENABLED=enabled
+            )
+            with app.app_context():
+                init_db()
+            clients[enabled] = app.test_client()
+
+        def post(client, message):
+            response = client.post('/chatbot', json={"message": message})
+            assert response.status_code == 200
+
+        # Pasadas alternas con y sin métricas; de cada variante se guarda la de menor mediana
+        # (el registro es global del proceso, así que se activa antes de cada pasada)
+        for _ in range(ROUNDS):
+            for enabled, client in clients.items():
+                metrics.enabled = enabled
+                name = f"POST /chatbot (fallback, {'con' if enabled else 'sin'} métricas)"
+                result = measure(cycling(lambda m: post(client, m), MESSAGES), 2000)
+                if name not in results or result["p50_us"] < results[name]["p50_us"]:
+                    results[name] = result
+        metrics.enabled = True
+
+        # /metrics con 8 workers simulados: cada uno escribe su archivo en el directorio
+        metrics_dir = os.path.join(tmp, 'metrics')
+        app = create_bench_app(DATABASE_PATH=db_path, NLP_SERVICE='fallback', METRICS_DIR=metrics_dir)
+        client = app.test_client()
+        for message in MESSAGES * 25:
+            client.post('/chatbot', json={"message": message})
+        metrics.flush()
+        own_file = os.path.join(metrics_dir, f"metrics-{os.getpid()}.json")
+        with open(own_file, encoding='utf-8') as f:
+            content = f.read().replace(f'"pid": {os.getpid()}', '"pid": {pid}')
+        for fake_pid in range(1, 8):
+            with open(os.path.join(metrics_dir, f"metrics-{10 ** 7 + fake_pid}.json"), 'w', encoding='utf-8') as f:
+                f.write(content.replace('{pid}', str(10 ** 7 + fake_pid)))
+        results["GET /metrics (8 workers)"] = measure(lambda: client.get('/metrics'), 300)
+        metrics.configure(directory=None)
+
+    print_results("Coste de las métricas", results)
+
+if __name__ == '__main__':
+    main()
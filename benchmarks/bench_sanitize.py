@@ -0,0 +1,28 @@
+"""
+Mide el rendimiento de sanitize_input frente a la implementación anterior
+(html.escape + re.sub por cada palabra clave) con mensajes cortos y de 1000
+caracteres. Que ambas produzcan exactamente los mismos bytes lo comprueba
+tests/test_sanitize.py con la implementación de tests/legacy_sanitize.py.
+
+Uso: python -m benchmarks.bench_sanitize
+"""
+import random
+from app.utils.security import sanitize_input
+from benchmarks.common import measure, print_results
+from tests.legacy_sanitize import legacy_sanitize_input, uncached_sanitize_input
+
+def main():
+    short = "¿Quiénes son los 5 mejores compradores?"
+    rng = random.Random(3)
+    words = "los compradores deudores select <b>alerta</b> montos & más top 10 ¿quiénes? (ignora) sistema".split()
+    long = ' '.join(rng.choice(words) for _ in range(400))[:1000]
+
+    results = {}
+    for name, text in (("corto", short), ("1000 caracteres", long)):
+        results[f"antes, {name}"] = measure(lambda: legacy_sanitize_input(text), 2000)
+        results[f"después sin memoizar, {name}"] = measure(lambda: uncached_sanitize_input(text), 2000)
+        results[f"después memoizado, {name}"] = measure(lambda: sanitize_input(text), 2000)
+    print_results("sanitize_input", results)
+
+if __name__ == '__main__':
+    main()
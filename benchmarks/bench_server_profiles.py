@@ -0,0 +1,154 @@
+"""
+Compara el rendimiento de los perfiles de servidor (server_profiles.py) con el
+proveedor simulado: arranca el servidor simulado y, para cada perfil, gunicorn con
+gunicorn.conf.py; lanza la prueba de carga en lazo abierto y muestra rendimiento,
+errores y latencia (app_error son los mensajes sin intención del corpus, no fallos
+del servidor). Los perfiles cuyo paquete no está instalado (gevent, eventlet,
+uvicorn) se omiten.
+
+Con latencia L del LLM, un perfil atiende como mucho (solicitudes en curso) / L
+solicitudes por segundo: sync con 2 x CPU + 1 workers se satura enseguida, mientras
+que gthread, gevent y asgi mantienen cientos de llamadas en curso por proceso.
+
+Uso:
+    python -m benchmarks.bench_server_profiles --rps 100 --duration 20 --latency lognormal:1.0,0.3
+    python -m benchmarks.bench_server_profiles --profiles sync,gthread --workers 2
+"""
+import argparse
+import http.client
+import importlib.util
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.load_test import LoadTest, default_messages, fetch_mock_stats
+from server_profiles import PROFILES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Paquete que necesita cada perfil además de gunicorn
+PROFILE_PACKAGES = {'gevent': 'gevent', 'eventlet': 'eventlet', 'asgi': 'uvicorn'}
+
+def available(profile):
+    package = PROFILE_PACKAGES.get(profile)
+    return package is None or importlib.util.find_spec(package) is not None
+
+def wait_until_ready(port, process, timeout=30.0):
+    """Espera a que el servidor responda a GET /api"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+def stop(process):
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+def run_profile(profile, args, mock_url, db_path, log_path):
+    port = args.port
+    env = dict(
+        os.environ,
+        SERVER_PROFILE=profile,
+        SERVER_BIND=f"127.0.0.1:{port}",
+        SERVER_ACCESS_LOG=os.devnull,
+        LOG_LEVEL='WARNING',
+        DATABASE_PATH=db_path,
+        INTENT_CACHE_ENABLED='false',
+        NLP_SERVICE='deepseek',
+        DEEPSEEK_API_KEY='mock',
+        DEEPSEEK_BASE_URL=mock_url,
+        TRACING_ENABLED='false',
+    )
+    if args.workers:
+        env['SERVER_WORKERS'] = str(args.workers)
+    if args.llm_latency_ms:
+        env['SERVER_LLM_LATENCY_MS'] = str(args.llm_latency_ms)
+
+    with open(log_path, 'w', encoding='utf-8') as log:
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+            cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+    try:
+        if not wait_until_ready(port, process):
+            return None
+        test = LoadTest(f"http://127.0.0.1:{port}/chatbot", args.messages, timeout=args.timeout)
+        return test.run(args.rps, args.duration, args.warmup, args.concurrency, 'poisson')
+    finally:
+        stop(process)
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendimiento de cada perfil de servidor con el LLM simulado")
+    parser.add_argument('--profiles', default=','.join(PROFILES), help='Perfiles separados por comas')
+    parser.add_argument('--rps', type=float, default=100)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--latency', default='lognormal:1.0,0.3', help='Latencia del LLM simulado (ver mock_llm_server)')
+    parser.add_argument('--llm-latency-ms', type=float, help='SERVER_LLM_LATENCY_MS para dimensionar los perfiles')
+    parser.add_argument('--workers', type=int, help='SERVER_WORKERS (por defecto, el del perfil)')
+    parser.add_argument('--concurrency', type=int, default=2000)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--port', type=int, default=5090)
+    parser.add_argument('--mock-port', type=int, default=8091)
+    args = parser.parse_args()
+    args.messages = default_messages()
+
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    mock = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.mock_llm_server', '--port', str(args.mock_port), '--latency', args.latency],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    results = {}
+    try:
+        time.sleep(1)
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(ROOT, 'data', 'database.db')
+            for profile in args.profiles.split(','):
+                if not available(profile):
+                    print(f"{profile}: omitido ({PROFILE_PACKAGES[profile]} no está instalado)")
+                    continue
+                db_path = os.path.join(tmp, f"{profile}.db")
+                if os.path.exists(source):
+                    shutil.copy(source, db_path)
+                log_path = os.path.join(tmp, f"{profile}.log")
+                before = fetch_mock_stats(mock_url)
+                report = run_profile(profile, args, mock_url, db_path, log_path)
+                if report is None:
+                    with open(log_path, encoding='utf-8') as f:
+                        print(f"{profile}: el servidor no arrancó\n{f.read()[-2000:]}")
+                    continue
+                after = fetch_mock_stats(mock_url)
+                if before and after:
+                    report['llm_calls'] = after.get('requests', 0) - before.get('requests', 0)
+                results[profile] = report
+                print(f"{profile}: {report['success_rps']:.1f} rps correctas, "
+                      + ", ".join(f"{name}={count}" for name, count in sorted(report['outcomes'].items())))
+    finally:
+        stop(mock)
+
+    print(f"\nPerfiles con {args.rps:g} rps objetivo, LLM simulado {args.latency}")
+    print(f"{'perfil':<10} {'rps':>8} {'correctas':>10} {'errores':>8} {'p50 (ms)':>10} {'p99 (ms)':>10} {'retraso cliente':>16}")
+    for profile, report in results.items():
+        latency = report['latency'] or {}
+        print(f"{profile:<10} {report['throughput_rps']:>8.1f} {report['success_rps']:>10.1f} {report['error_rate']:>8.1%} "
+              f"{latency.get('p50_ms', 0):>10.0f} {latency.get('p99_ms', 0):>10.0f} {report['max_client_lag_ms']:>13.0f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Compara el coste por solicitud de construir ChatbotService en cada mensaje
+frente a reutilizar el servicio del registro del proceso.
+
+Uso: python -m benchmarks.bench_service_registry [iteraciones]
+"""
+import sys
+from app.services.chatbot_service import ChatbotService
+from app.services.service_registry import get_chatbot_service, service_registry
+from benchmarks.common import create_bench_app, measure, print_results
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    # Claves ficticias: se construyen los clientes reales pero no se hace ninguna llamada
+    app = create_bench_app(
+        DEEPSEEK_API_KEY='sk-bench-deepseek-0000',
+        OPENAI_API_KEY='sk-bench-openai-0000',
+        NLP_SERVICE='auto',
+    )
+
+    results = {}
+    with app.app_context():
+        results["antes: ChatbotService().initialize()"] = measure(
+            lambda: ChatbotService().initialize(), iterations
+        )
+
+        service_registry.reset()
+        results["después: get_chatbot_service()"] = measure(
+            get_chatbot_service, iterations
+        )
+
+    print_results("Sobrecarga por solicitud de la construcción de servicios", results)
+    print(f"\nServicios construidos por el registro: {service_registry.builds}")
+
+if __name__ == '__main__':
+    main()
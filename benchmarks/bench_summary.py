@@ -0,0 +1,85 @@
+"""
+Comprueba que los triggers mantienen exacto el resumen materializado (filas, sumas
+y ranking top K) tras una secuencia aleatoria de inserciones, actualizaciones y
+borrados, y compara el coste de los conteos y rankings contra la tabla completa.
+
+Uso: python -m benchmarks.bench_summary [filas] [operaciones aleatorias]
+"""
+import os
+import random
+import sys
+import tempfile
+from app.models.database import get_db, init_db
+from app.models.summary import LEADERBOARD_SIZE, check_summary
+from benchmarks.common import create_bench_app, measure, print_results
+
+def random_operations(db, operations, seed=5):
+    """Inserciones, actualizaciones (de monto, nombre o id) y borrados con muchos empates"""
+    rng = random.Random(seed)
+    amounts = [round(rng.uniform(0, 500), 2) for _ in range(50)]  # pocos valores: muchos empates
+    next_id = db.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM compradores').fetchone()[0]
+    for step in range(operations):
+        ids = [row[0] for row in db.execute('SELECT id FROM compradores ORDER BY RANDOM() LIMIT 3')]
+        action = rng.random()
+        with db:
+            if action < 0.4 or not ids:
+                db.execute('INSERT INTO compradores VALUES (?, ?, ?)', (next_id, f'C{next_id}', rng.choice(amounts)))
+                next_id += 1
+            elif action < 0.6:
+                db.execute('UPDATE compradores SET total_compras = ? WHERE id = ?', (rng.choice(amounts), ids[0]))
+            elif action < 0.65:
+                db.execute('UPDATE compradores SET nombre = nombre || ? WHERE id = ?', ('x', ids[0]))
+            elif action < 0.7:
+                db.execute('UPDATE compradores SET id = ? WHERE id = ?', (next_id, ids[0]))
+                next_id += 1
+            elif action < 0.75:
+                # Actualización de varias filas en una sola sentencia
+                db.execute('UPDATE compradores SET total_compras = total_compras + 1 WHERE total_compras < ?', (rng.choice(amounts),))
+            else:
+                db.execute('DELETE FROM compradores WHERE id = ?', (ids[0],))
+        if step % 100 == 0:
+            problems = check_summary(db)
+            if problems:
+                return step, problems
+    return operations, check_summary(db)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    operations = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_bench_app(DATABASE_PATH=os.path.join(tmp, 'bench.db'), QUERY_CACHE_ENABLED=False)
+        with app.app_context():
+            init_db()
+            db = get_db()
+
+            # Consistencia con una tabla pequeña (el ranking se vacía y se llena varias veces)
+            db.execute('DELETE FROM compradores')
+            db.commit()
+            step, problems = random_operations(db, operations)
+            print(f"Consistencia tras {step} operaciones aleatorias: {'OK' if not problems else 'ERROR'}")
+            for problem in problems:
+                print(f"  {problem}")
+
+            # Rendimiento con una tabla grande
+            rng = random.Random(9)
+            with db:
+                db.execute('DELETE FROM compradores')
+                db.executemany(
+                    'INSERT INTO compradores VALUES (?, ?, ?)',
+                    ((i, f'Comprador {i}', round(rng.uniform(10, 10000), 2)) for i in range(1, rows + 1))
+                )
+
+            results = {
+                "COUNT(*) de la tabla": measure(lambda: db.execute('SELECT COUNT(*) FROM compradores').fetchone(), 200),
+                "filas del resumen": measure(lambda: db.execute("SELECT filas FROM resumen_tablas WHERE tabla = 'compradores'").fetchone(), 200),
+                "top 10 sin índice (ORDER BY)": measure(lambda: db.execute('SELECT id, nombre, total_compras FROM compradores NOT INDEXED ORDER BY total_compras DESC, id ASC LIMIT 10').fetchall(), 20),
+                "top 10 por índice": measure(lambda: db.execute('SELECT id, nombre, total_compras FROM compradores ORDER BY total_compras DESC, id ASC LIMIT 10').fetchall(), 200),
+                "top 10 del ranking": measure(lambda: db.execute('SELECT id, nombre, total_compras FROM ranking_compradores ORDER BY total_compras DESC, id ASC LIMIT 10').fetchall(), 200),
+            }
+            print_results(f"Consultas con {rows} filas (ranking de {LEADERBOARD_SIZE})", results)
+
+        sys.exit(1 if problems else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Mide el coste de las trazas: un tramo sin traza activa (el caso de las solicitudes no
+muestreadas), un tramo dentro de una traza, y la ida y vuelta de POST /chatbot sin
+trazas, con trazas no muestreadas y con todas las solicitudes trazadas.
+
+Uso: python -m benchmarks.bench_tracing
+"""
+import os
+import tempfile
+from app.models.database import init_db
+from app.utils.tracing import Trace, _current_trace, span, tracer
+from benchmarks.common import create_bench_app, measure, print_results
+from benchmarks.suite import cycling
+
+ROUNDS = 3
+MESSAGES = ["top 3 compradores", "cuántos deudores hay", "top 10 deudores", "hola"]
+
+def enter_span():
+    with span('db.contar_compradores'):
+        pass
+
+def main():
+    results = {}
+
+    results["span sin traza activa"] = measure(enter_span, 100000)
+    token = _current_trace.set(Trace('/bench', 'GET'))
+    try:
+        # Traza nueva cada 1000 tramos para que la lista no crezca sin límite
+        def traced_span(count=[0]):
+            count[0] += 1
+            if count[0] % 1000 == 0:
+                _current_trace.set(Trace('/bench', 'GET'))
+            enter_span()
+        results["span dentro de una traza"] = measure(traced_span, 100000)
+    finally:
+        _current_trace.reset(token)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        variants = {
+            "sin trazas": dict(TRACING_ENABLED=False),
+            "trazas, muestreo 0": dict(TRACE_SAMPLE_RATE=0.0),
+            "trazas, muestreo 1": dict(TRACE_SAMPLE_RATE=1.0),
+        }
+        clients = {}
+        for name, overrides in variants.items():
+            app = create_bench_app(
+                DATABASE_PATH=db_path,
+                NLP_SERVICE='fallback',
+                INTENT_CACHE_ENABLED=False,
+                METRICS_ENABLED=False,
+                **overrides
+            )
+            with app.app_context():
+                init_db()
+            clients[name] = (app.test_client(), overrides)
+
+        def post(client, message):
+            response = client.post('/chatbot', json={"message": message})
+            assert response.status_code == 200
+
+        # Pasadas alternas; el trazador es global del proceso, así que se configura antes
+        # de cada pasada. De cada variante se guarda la de menor mediana
+        for _ in range(ROUNDS):
+            for name, (client, overrides) in clients.items():
+                tracer.configure(
+                    enabled=overrides.get('TRACING_ENABLED', True),
+                    sample_rate=overrides.get('TRACE_SAMPLE_RATE', 0.0)
+                )
+                label = f"POST /chatbot (fallback, {name})"
+                result = measure(cycling(lambda m: post(client, m), MESSAGES), 2000)
+                if label not in results or result["p50_us"] < results[label]["p50_us"]:
+                    results[label] = result
+
+    print_results("Coste de las trazas", results)
+
+if __name__ == '__main__':
+    main()
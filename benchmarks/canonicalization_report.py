@@ -0,0 +1,63 @@
+"""
+Informe de cuánto tráfico se agrupa en plantillas canónicas para la caché de intenciones.
+
+Uso:
+    python -m benchmarks.canonicalization_report corpus.txt   # un mensaje por línea (o JSONL con "message")
+    python -m benchmarks.canonicalization_report              # corpus sintético de ejemplo
+"""
+import json
+import sys
+from collections import Counter
+from app.services.canonicalizer import MessageCanonicalizer
+from app.utils.security import sanitize_input
+from tests.corpus import sample_corpus
+
+def load_corpus(path):
+    messages = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                line = json.loads(line).get('message', '')
+            messages.append(line)
+    return messages
+
+def coverage(counter, total, fractions=(0.5, 0.8, 0.95)):
+    """Cuántas claves hacen falta para cubrir cada fracción del tráfico"""
+    result = {}
+    accumulated = 0
+    needed = 0
+    pending = list(fractions)
+    for _, count in counter.most_common():
+        accumulated += count
+        needed += 1
+        while pending and accumulated / total >= pending[0]:
+            result[pending.pop(0)] = needed
+    return result
+
+def main():
+    corpus = load_corpus(sys.argv[1]) if len(sys.argv) > 1 else sample_corpus()
+    total = len(corpus)
+
+    exact = Counter(sanitize_input(m) for m in corpus)
+    canonicalizer = MessageCanonicalizer(max_tracked_templates=len(corpus) + 1)
+    templates = Counter(canonicalizer.canonicalize(m)[0] for m in corpus)
+
+    print(f"Mensajes: {total}")
+    for name, counter in (("clave exacta (sanitize_input)", exact), ("plantilla canónica", templates)):
+        unique = len(counter)
+        # Con una caché caliente, solo el primer mensaje de cada clave llega al LLM
+        print(f"\n{name}")
+        print(f"  claves distintas: {unique}")
+        print(f"  tasa de aciertos máxima: {1 - unique / total:.1%}")
+        for fraction, needed in coverage(counter, total).items():
+            print(f"  {fraction:.0%} del tráfico cubierto por {needed} claves")
+
+    print("\nPlantillas más frecuentes:")
+    for template, count in templates.most_common(10):
+        print(f"  {count:>6}  {template}")
+
+if __name__ == '__main__':
+    main()
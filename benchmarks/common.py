@@ -0,0 +1,46 @@
+import logging
+import os
+import statistics
+import time
+from app import create_app
+from app.config import Config
+
+def create_bench_app(**overrides):
+    """Crea una aplicación Flask para benchmarks con la configuración indicada"""
+    config_class = type('BenchConfig', (Config,), overrides)
+    app = create_app(config_class)
+
+    # Mantener el coste real de los logs INFO pero sin escribir en la terminal
+    app.logger.handlers = [logging.StreamHandler(open(os.devnull, 'w'))]
+    app.logger.setLevel(logging.INFO)
+    app.logger.propagate = False
+    return app
+
+def measure(func, iterations=1000, warmup=10):
+    """Ejecuta func repetidamente y devuelve estadísticas de latencia en microsegundos"""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+
+    samples.sort()
+    total = sum(samples)
+    return {
+        "iterations": iterations,
+        "mean_us": total / iterations,
+        "p50_us": statistics.median(samples),
+        "p95_us": samples[min(iterations - 1, int(iterations * 0.95))],
+        "ops_per_sec": iterations / (total / 1e6) if total else float('inf'),
+    }
+
+def print_results(title, results):
+    """Imprime una tabla con los resultados de varios benchmarks"""
+    width = max([40] + [len(name) for name in results])
+    print(f"\n{title}")
+    print(f"{'caso':<{width}} {'media (us)':>12} {'p50 (us)':>12} {'p95 (us)':>12} {'ops/s':>14}")
+    for name, r in results.items():
+        print(f"{name:<{width}} {r['mean_us']:>12.1f} {r['p50_us']:>12.1f} {r['p95_us']:>12.1f} {r['ops_per_sec']:>14.0f}")
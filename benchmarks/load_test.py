@@ -0,0 +1,227 @@
+"""
+Generador de carga para /chatbot a una tasa objetivo de solicitudes por segundo.
+
+Las solicitudes se lanzan en lazo abierto: cada una tiene una hora de salida
+programada (constante o Poisson) y su latencia se mide desde esa hora, no desde que
+un hilo libre la envía. Así, si el servidor se satura, la espera en la cola del
+cliente cuenta como latencia y no se ocultan los picos (omisión coordinada).
+
+Uso:
+    python -m benchmarks.mock_llm_server --latency lognormal:2.0,0.3 &
+    DEEPSEEK_API_KEY=mock DEEPSEEK_BASE_URL=http://127.0.0.1:8001 NLP_SERVICE=deepseek \\
+        gunicorn -w 4 --threads 64 run:app &
+    python -m benchmarks.load_test --rps 200 --duration 60 --mock-url http://127.0.0.1:8001
+"""
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from benchmarks.canonicalization_report import load_corpus
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def default_messages():
+    """Mezcla del corpus sintético: mayoría de aciertos, algunos parciales y fallos"""
+    from benchmarks.common import create_bench_app
+    from benchmarks.synthetic_data import message_corpus
+    with create_bench_app().app_context():
+        corpus = message_corpus(300)
+    return corpus['hit'] * 3 + corpus['partial'] + corpus['miss']
+
+class LoadTest:
+    """Envía solicitudes a /chatbot y acumula latencias y resultados por categoría"""
+
+    def __init__(self, url, messages, timeout=30.0, seed=1):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.path = parts.path or '/chatbot'
+        self.messages = messages
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.outcomes = Counter()
+        self.latencies = []
+        self.ok_latencies = []
+        self.max_lag = 0.0
+
+    def _connection(self):
+        # Una conexión persistente por hilo (keep-alive), como un cliente real con pool
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = conn_class(self.host, self.port, timeout=self.timeout)
+            self.local.conn = conn
+        return conn
+
+    def _reset_connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        self.local.conn = None
+
+    def send(self, message, scheduled, record):
+        """Envía un mensaje; la latencia se mide desde la hora programada"""
+        lag = time.perf_counter() - scheduled
+        body = json.dumps({"message": message}).encode('utf-8')
+        try:
+            conn = self._connection()
+            conn.request('POST', self.path, body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            payload = response.read()
+            if response.status != 200:
+                outcome = f"http_{response.status}"
+            else:
+                status = json.loads(payload).get('status')
+                outcome = 'ok' if status == 'success' else 'app_error'
+        except TimeoutError:
+            outcome = 'timeout'
+            self._reset_connection()
+        except (OSError, http.client.HTTPException):
+            outcome = 'connection_error'
+            self._reset_connection()
+        except ValueError:
+            outcome = 'invalid_json'
+
+        latency = time.perf_counter() - scheduled
+        if not record:
+            return
+        with self.lock:
+            self.outcomes[outcome] += 1
+            self.max_lag = max(self.max_lag, lag)
+            if outcome not in ('timeout', 'connection_error'):
+                self.latencies.append(latency)
+            if outcome == 'ok':
+                self.ok_latencies.append(latency)
+
+    def run(self, rps, duration, warmup=0.0, concurrency=1000, arrival='constant'):
+        """Lanza solicitudes a rps durante warmup + duration segundos y devuelve el informe"""
+        total_time = warmup + duration
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='carga')
+        start = time.perf_counter()
+        measured_start = start + warmup
+        scheduled = start
+        sent = 0
+        try:
+            while True:
+                if arrival == 'poisson':
+                    scheduled += self.random.expovariate(rps)
+                else:
+                    scheduled = start + sent / rps
+                if scheduled - start >= total_time:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                message = self.random.choice(self.messages)
+                executor.submit(self.send, message, scheduled, scheduled >= measured_start)
+                sent += 1
+        finally:
+            executor.shutdown(wait=True)
+        elapsed = time.perf_counter() - measured_start
+        return self.report(rps, duration, elapsed)
+
+    def report(self, rps, duration, elapsed):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            ok_latencies = sorted(self.ok_latencies)
+            total = sum(self.outcomes.values())
+
+            def summary(values):
+                if not values:
+                    return None
+                return {
+                    "p50_ms": percentile(values, 0.50) * 1000,
+                    "p95_ms": percentile(values, 0.95) * 1000,
+                    "p99_ms": percentile(values, 0.99) * 1000,
+                    "max_ms": values[-1] * 1000,
+                    "mean_ms": sum(values) / len(values) * 1000,
+                }
+
+            return {
+                "target_rps": rps,
+                "duration_s": duration,
+                "requests": total,
+                # Respuestas por segundo hasta que terminó la última (incluye el vaciado de la cola)
+                "throughput_rps": total / elapsed if elapsed > 0 else 0.0,
+                "success_rps": self.outcomes['ok'] / elapsed if elapsed > 0 else 0.0,
+                "outcomes": dict(self.outcomes),
+                "error_rate": 1 - self.outcomes['ok'] / total if total else 0.0,
+                "latency": summary(latencies),
+                "latency_ok": summary(ok_latencies),
+                # Retraso máximo entre la hora programada y el envío: si es alto, el cliente no
+                # tenía hilos libres (servidor saturado o --concurrency bajo)
+                "max_client_lag_ms": self.max_lag * 1000,
+            }
+
+def fetch_mock_stats(mock_url):
+    parts = urlsplit(mock_url)
+    try:
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=5)
+        conn.request('GET', '/stats')
+        return json.loads(conn.getresponse().read())
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+
+def print_report(report):
+    print(f"\nObjetivo: {report['target_rps']} rps durante {report['duration_s']}s")
+    print(f"Solicitudes: {report['requests']}  rendimiento: {report['throughput_rps']:.1f} rps  "
+          f"correctas: {report['success_rps']:.1f} rps  errores: {report['error_rate']:.1%}")
+    for name, key in (("todas", "latency"), ("correctas", "latency_ok")):
+        latency = report[key]
+        if latency:
+            print(f"Latencia ({name}): p50 {latency['p50_ms']:.0f} ms  p95 {latency['p95_ms']:.0f} ms  "
+                  f"p99 {latency['p99_ms']:.0f} ms  máx {latency['max_ms']:.0f} ms")
+    print("Resultados: " + ", ".join(f"{name}={count}" for name, count in sorted(report['outcomes'].items())))
+    print(f"Retraso máximo del cliente: {report['max_client_lag_ms']:.0f} ms")
+    if report.get('mock'):
+        print(f"Servidor simulado: {report['mock']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de /chatbot a una tasa objetivo")
+    parser.add_argument('--url', default='http://127.0.0.1:5000/chatbot')
+    parser.add_argument('--rps', type=float, default=50, help='Solicitudes por segundo objetivo')
+    parser.add_argument('--duration', type=float, default=30, help='Segundos de medición')
+    parser.add_argument('--warmup', type=float, default=5, help='Segundos iniciales que no se miden')
+    parser.add_argument('--arrival', choices=['constant', 'poisson'], default='poisson', help='Llegadas a intervalos fijos o Poisson')
+    parser.add_argument('--concurrency', type=int, default=1000, help='Máximo de solicitudes en curso del cliente')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout de cada solicitud (s)')
+    parser.add_argument('--corpus', help='Archivo de mensajes (uno por línea o JSONL con "message")')
+    parser.add_argument('--mock-url', help='URL del servidor simulado para incluir sus contadores')
+    parser.add_argument('--output', help='Guardar el informe en JSON')
+    args = parser.parse_args()
+
+    messages = load_corpus(args.corpus) if args.corpus else default_messages()
+    test = LoadTest(args.url, messages, timeout=args.timeout)
+    before = fetch_mock_stats(args.mock_url) if args.mock_url else None
+    report = test.run(args.rps, args.duration, args.warmup, args.concurrency, args.arrival)
+    if args.mock_url:
+        after = fetch_mock_stats(args.mock_url)
+        if after is not None:
+            # Llamadas al LLM simulado durante la prueba (menos que solicitudes si hay caché)
+            report['mock'] = {
+                key: value - (before or {}).get(key, 0) if key.startswith(('requests', 'completed', 'streamed', 'errors', 'malformed', 'prompt_tokens', 'json_mode')) else value
+                for key, value in after.items()
+            }
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    sys.exit(0 if report['requests'] else 1)
+
+if __name__ == '__main__':
+    main()
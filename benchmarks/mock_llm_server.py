@@ -0,0 +1,276 @@
+"""
+Servidor LLM simulado compatible con la API /v1/chat/completions de OpenAI y DeepSeek,
+para pruebas de carga sin llamar a los proveedores reales.
+
+Clasifica el último mensaje del usuario con el detector local (FallbackService) y
+responde con el JSON de intención que devolvería el modelo, después de una latencia
+tomada de la distribución configurada, más un coste por cada mil tokens del prompt
+(--prefill-ms-per-1k) para comparar prompts de distinto tamaño. Puede inyectar errores
+HTTP, respuestas que no son JSON válido (salvo con response_format json_object, como
+los modelos reales) y respuestas en streaming (SSE, "stream": true). Informa en usage
+los tokens estimados (4 bytes por token).
+
+Uso:
+    python -m benchmarks.mock_llm_server --port 8001 --latency lognormal:2.0,0.3 \\
+        --error-rate 0.02 --malformed-rate 0.01
+
+y en la aplicación:
+    DEEPSEEK_API_KEY=mock DEEPSEEK_BASE_URL=http://127.0.0.1:8001
+    OPENAI_API_KEY=mock OPENAI_BASE_URL=http://127.0.0.1:8001/v1
+
+GET /stats devuelve los contadores de solicitudes del servidor.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.services.fallback_service import FallbackService
+
+def parse_latency(spec):
+    """
+    Distribución de latencia en segundos a partir de una especificación:
+    fixed:S, uniform:MIN,MAX, normal:MEDIA,DESV, lognormal:MEDIANA,SIGMA o exponential:MEDIA.
+    Devuelve una función sin argumentos que genera una muestra
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(value) for value in args.split(',')] if args else []
+    try:
+        if kind == 'fixed':
+            return lambda: values[0]
+        if kind == 'uniform':
+            return lambda: random.uniform(values[0], values[1])
+        if kind == 'normal':
+            return lambda: max(0.0, random.gauss(values[0], values[1]))
+        if kind == 'lognormal':
+            # La mediana de una log-normal es exp(mu)
+            return lambda: random.lognormvariate(math.log(values[0]), values[1])
+        if kind == 'exponential':
+            return lambda: random.expovariate(1 / values[0])
+    except IndexError:
+        pass
+    raise argparse.ArgumentTypeError(f"Latencia no válida: {spec}")
+
+def estimate_tokens(text):
+    return math.ceil(len(text.encode('utf-8')) / 4)
+
+class MockLLMState:
+    """Configuración del comportamiento simulado y contadores compartidos por los hilos"""
+
+    def __init__(self, latency, error_rate=0.0, error_status=500, malformed_rate=0.0,
+                 stream_chunks=8, prefill_ms_per_1k=0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.malformed_rate = malformed_rate
+        self.stream_chunks = stream_chunks
+        self.prefill_ms_per_1k = prefill_ms_per_1k
+        self.detector = FallbackService()
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def count(self, name, delta=1):
+        with self.lock:
+            self.counters[name] += delta
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def roll(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def answer(self, user_message, json_mode=False):
+        """
+        Contenido que devolvería el modelo: JSON de intención o un texto mal formado.
+        En modo JSON el modelo no puede devolver texto que no sea JSON
+        """
+        intent_data = self.detector.detect_intent(user_message)
+        content = json.dumps(
+            {"intent": intent_data["intent"], "parameters": intent_data["parameters"]}, ensure_ascii=False
+        )
+        if not json_mode and self.roll(self.malformed_rate):
+            self.count('malformed')
+            # Mitad texto sin JSON, mitad JSON truncado
+            if self.roll(0.5):
+                return f"Claro, la intención del usuario parece ser {intent_data['intent']}."
+            return content[:len(content) // 2]
+        return content
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters, in_flight=self.in_flight, max_in_flight=self.max_in_flight)
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 con Content-Length: los clientes reutilizan la conexión como con la API real
+    protocol_version = 'HTTP/1.1'
+    # Cabeceras y cuerpo van en escrituras separadas: sin TCP_NODELAY, en una conexión
+    # reutilizada el cuerpo espera al ACK retardado del cliente (unos 40 ms)
+    disable_nagle_algorithm = True
+    server_version = 'MockLLM/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            return self._send_json(200, self.state.snapshot())
+        self._send_json(404, {"error": {"message": "No encontrado", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+
+        if self.path.rstrip('/') not in ('/chat/completions', '/v1/chat/completions'):
+            return self._send_json(404, {"error": {"message": "No encontrado", "type": "invalid_request_error"}})
+
+        try:
+            request = json.loads(body or b'{}')
+            messages = request.get('messages') or []
+            user_message = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+            prompt_tokens = sum(estimate_tokens(m.get('content') or '') for m in messages)
+            json_mode = (request.get('response_format') or {}).get('type') == 'json_object'
+        except (ValueError, AttributeError):
+            return self._send_json(400, {"error": {"message": "JSON no válido", "type": "invalid_request_error"}})
+
+        state = self.state
+        state.count('requests')
+        state.count('prompt_tokens', prompt_tokens)
+        if json_mode:
+            state.count('json_mode')
+        state.enter()
+        try:
+            time.sleep(state.latency() + prompt_tokens / 1000 * state.prefill_ms_per_1k / 1000)
+
+            if state.roll(state.error_rate):
+                state.count(f'errors_{state.error_status}')
+                return self._send_json(state.error_status, {
+                    "error": {"message": "Error simulado", "type": "server_error"}
+                })
+
+            content = state.answer(user_message, json_mode)
+            model = request.get('model', 'mock')
+            if request.get('stream'):
+                state.count('streamed')
+                return self._send_stream(model, content)
+            state.count('completed')
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": estimate_tokens(content),
+                    "total_tokens": prompt_tokens + estimate_tokens(content)
+                }
+            })
+        finally:
+            state.leave()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, model, content):
+        """Envía el contenido en varios fragmentos SSE, como chat.completion.chunk"""
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        size = max(1, math.ceil(len(content) / self.state.stream_chunks))
+        pieces = [content[i:i + size] for i in range(0, len(content), size)]
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def chunk(delta, finish_reason=None):
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+
+        events = [chunk({"role": "assistant", "content": ""})]
+        events += [chunk({"content": piece}) for piece in pieces]
+        events.append(chunk({}, "stop"))
+        for event in events:
+            self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Cola de conexiones pendientes amplia para ráfagas de cientos de solicitudes
+    request_queue_size = 1024
+
+    def __init__(self, address, state):
+        super().__init__(address, MockLLMHandler)
+        self.state = state
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor LLM simulado compatible con /v1/chat/completions")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=parse_latency, default=parse_latency('lognormal:2.0,0.3'),
+                        help='fixed:S, uniform:MIN,MAX, normal:MEDIA,DESV, lognormal:MEDIANA,SIGMA o exponential:MEDIA (segundos)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fracción de respuestas con error HTTP')
+    parser.add_argument('--error-status', type=int, default=500, help='Código HTTP de los errores (500, 429, 503...)')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Fracción de respuestas que no son JSON válido')
+    parser.add_argument('--prefill-ms-per-1k', type=float, default=0.0, help='Latencia añadida por cada mil tokens del prompt (ms)')
+    parser.add_argument('--stream-chunks', type=int, default=8, help='Fragmentos por respuesta en streaming')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    state = MockLLMState(
+        args.latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        malformed_rate=args.malformed_rate,
+        stream_chunks=args.stream_chunks,
+        prefill_ms_per_1k=args.prefill_ms_per_1k,
+        seed=args.seed
+    )
+    server = MockLLMServer((args.host, args.port), state)
+    print(f"Servidor LLM simulado en http://{args.host}:{args.port} (Ctrl+C para detener)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(state.snapshot(), ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
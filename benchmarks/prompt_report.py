@@ -0,0 +1,136 @@
+"""
+Compara las versiones del prompt de clasificación (app/services/prompts.py): tokens
+del prompt fijo y de cada clasificación contados con tiktoken, coste por mil
+clasificaciones con los precios indicados y, con --mock, latencia y respuestas no
+válidas contra el servidor LLM simulado, que añade latencia por cada mil tokens del
+prompt y solo devuelve texto que no es JSON cuando no se pide response_format.
+
+Uso:
+    python -m benchmarks.prompt_report
+    python -m benchmarks.prompt_report --input-price 0.27 --output-price 1.10
+    python -m benchmarks.prompt_report --mock --requests 200 --prefill-ms-per-1k 300 --malformed-rate 0.05
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from app.services.fallback_service import FallbackService
+from app.services.llm_provider import LLMProvider
+from app.services.prompts import PROMPTS, build_messages, token_counter
+from app.utils.security import sanitize_input
+from benchmarks.common import create_bench_app
+from benchmarks.load_test import fetch_mock_stats, percentile
+from benchmarks.synthetic_data import message_corpus
+
+# Variantes comparadas: (nombre, versión del prompt, response_format json_object, max_tokens)
+VARIANTS = [
+    ("v1 texto libre, max_tokens 1024", '1', False, 1024),
+    ("v1 modo JSON, max_tokens 64", '1', True, 64),
+    ("v2 modo JSON, max_tokens 64", '2', True, 64),
+]
+
+def expected_answer(detector, message):
+    """Respuesta JSON que daría un modelo que acierta (la del detector local)"""
+    data = detector.detect_intent(message)
+    return json.dumps({"intent": data["intent"], "parameters": data["parameters"]}, separators=(',', ':'))
+
+def token_report(messages, model):
+    detector = FallbackService()
+    token_counter.load(model)
+    report = {}
+    for version in PROMPTS:
+        prompt_tokens = [token_counter.count_messages(build_messages(sanitize_input(m), version), model) for m in messages]
+        completion_tokens = [token_counter.count(expected_answer(detector, m), model) for m in messages]
+        report[version] = {
+            "system_tokens": token_counter.count(PROMPTS[version], model),
+            "prompt_tokens": sum(prompt_tokens) / len(prompt_tokens),
+            "completion_tokens": sum(completion_tokens) / len(completion_tokens),
+        }
+    return report
+
+def mock_report(args, messages):
+    """Latencia y respuestas no válidas de cada variante contra el LLM simulado"""
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    mock = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.mock_llm_server', '--port', str(args.mock_port),
+         '--latency', args.latency, '--prefill-ms-per-1k', str(args.prefill_ms_per_1k),
+         '--malformed-rate', str(args.malformed_rate), '--seed', '1'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    results = {}
+    try:
+        time.sleep(1)
+        detector = FallbackService()
+        for name, version, json_mode, max_tokens in VARIANTS:
+            app = create_bench_app(
+                NLP_SERVICE='deepseek',
+                DEEPSEEK_API_KEY='mock',
+                DEEPSEEK_BASE_URL=mock_url,
+                INTENT_PROMPT_VERSION=version,
+                LLM_JSON_MODE=json_mode,
+                LLM_MAX_TOKENS=max_tokens
+            )
+            latencies = []
+            wrong = 0
+            before = fetch_mock_stats(mock_url) or {}
+            with app.app_context():
+                service = LLMProvider('deepseek').initialize()
+                for message in messages[:args.requests]:
+                    start = time.perf_counter()
+                    result = service.detect_intent(message)
+                    latencies.append(time.perf_counter() - start)
+                    if result["intent"] != detector.detect_intent(message)["intent"]:
+                        wrong += 1
+            after = fetch_mock_stats(mock_url) or {}
+            latencies.sort()
+            results[name] = {
+                "p50_ms": percentile(latencies, 0.5) * 1000,
+                "p95_ms": percentile(latencies, 0.95) * 1000,
+                "wrong": wrong / len(latencies),
+                "mock_prompt_tokens": (after.get('prompt_tokens', 0) - before.get('prompt_tokens', 0)) / len(latencies),
+            }
+    finally:
+        mock.terminate()
+        mock.wait()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokens, coste y latencia de cada versión del prompt")
+    parser.add_argument('--model', default='gpt-3.5-turbo', help='Modelo para elegir la codificación de tiktoken')
+    parser.add_argument('--input-price', type=float, help='Precio por millón de tokens de entrada')
+    parser.add_argument('--output-price', type=float, help='Precio por millón de tokens de salida')
+    parser.add_argument('--mock', action='store_true', help='Medir latencia contra el LLM simulado')
+    parser.add_argument('--requests', type=int, default=200, help='Clasificaciones por variante con --mock')
+    parser.add_argument('--latency', default='fixed:0.02', help='Latencia base del LLM simulado')
+    parser.add_argument('--prefill-ms-per-1k', type=float, default=300, help='Latencia por cada mil tokens del prompt (ms)')
+    parser.add_argument('--malformed-rate', type=float, default=0.05, help='Respuestas que no son JSON sin modo JSON')
+    parser.add_argument('--mock-port', type=int, default=8092)
+    args = parser.parse_args()
+
+    with create_bench_app().app_context():
+        corpus = message_corpus(200)
+        messages = corpus['hit'] + corpus['partial'] + corpus['miss']
+        tokens = token_report(messages, args.model)
+
+    print(f"\nTokens por clasificación ({len(messages)} mensajes, {token_counter.method})")
+    print(f"{'versión':<10} {'prompt fijo':>12} {'entrada':>10} {'salida':>10}", end='')
+    pricing = args.input_price is not None and args.output_price is not None
+    print(f" {'coste / 1000':>14}" if pricing else '')
+    for version, report in tokens.items():
+        line = f"{version:<10} {report['system_tokens']:>12} {report['prompt_tokens']:>10.1f} {report['completion_tokens']:>10.1f}"
+        if pricing:
+            cost = (report['prompt_tokens'] * args.input_price + report['completion_tokens'] * args.output_price) / 1000
+            line += f" {cost:>14.4f}"
+        print(line)
+
+    if args.mock:
+        results = mock_report(args, messages)
+        print(f"\nLLM simulado: {args.latency} + {args.prefill_ms_per_1k:g} ms por mil tokens de prompt, "
+              f"{args.malformed_rate:.0%} de respuestas no JSON sin modo JSON")
+        print(f"{'variante':<34} {'p50 (ms)':>10} {'p95 (ms)':>10} {'tokens entrada':>15} {'intención errónea':>18}")
+        for name, r in results.items():
+            print(f"{name:<34} {r['p50_ms']:>10.1f} {r['p95_ms']:>10.1f} {r['mock_prompt_tokens']:>15.1f} {r['wrong']:>18.1%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Informe del tiempo de arranque: importa run.py en un proceso nuevo con
+-X importtime y muestra el tiempo total, los paquetes y módulos que más tardan, y
+si se cargó el SDK de openai. Termina con código 1 si el arranque supera el
+presupuesto, así que sirve como comprobación en CI.
+
+Uso:
+    python -m benchmarks.startup_report                      # fallback, presupuesto 500 ms
+    python -m benchmarks.startup_report --provider --budget-ms 2000
+    python -m benchmarks.startup_report --preload --top 30
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se ejecuta en el proceso hijo: mide la importación completa de run.py (incluye
+# create_app, init_db y la precarga) e informa por stdout
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import run
+print(json.dumps({
+    "startup_ms": (time.perf_counter() - start) * 1000,
+    "modules": len(sys.modules),
+    "openai_loaded": "openai" in sys.modules,
+}))
+"""
+
+def parse_importtime(stderr):
+    """Lista de (módulo, propio en µs, acumulado en µs, nivel) de la salida de -X importtime"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        level = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), level))
+    return entries
+
+def run_startup(provider=False, preload=False, db_init=True):
+    """Importa run.py en un proceso hijo con una copia de la base y devuelve (informe, entradas)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'database.db')
+        source = os.path.join(ROOT, 'data', 'database.db')
+        if os.path.exists(source):
+            shutil.copy(source, db_path)
+        env = dict(
+            os.environ,
+            PYTHONPATH=ROOT,
+            DATABASE_PATH=db_path,
+            INTENT_CACHE_DB_PATH=os.path.join(tmp, 'intent_cache.db'),
+            NLP_SERVICE='deepseek' if provider else 'fallback',
+            DEEPSEEK_API_KEY='startup-report' if provider else '',
+            STARTUP_PRELOAD='true' if preload else 'false',
+            DB_INIT_ON_STARTUP='true' if db_init else 'false',
+            LOG_LEVEL='WARNING',
+        )
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT],
+            cwd=ROOT, env=env, capture_output=True, text=True
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"El arranque falló:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report, parse_importtime(result.stderr)
+
+def summarize(entries, top):
+    """Tiempo de importación total, por paquete de primer nivel y los módulos más lentos"""
+    import_us = sum(cumulative for _, _, cumulative, level in entries if level == 0)
+    packages = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        packages[name.split('.')[0]] += self_us
+    slowest = sorted(entries, key=lambda entry: entry[2], reverse=True)
+    return {
+        "import_ms": import_us / 1000,
+        "packages": sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top],
+        "modules": [(name, cumulative) for name, _, cumulative, _ in slowest[:top]],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de importación y arranque de run.py")
+    parser.add_argument('--provider', action='store_true', help='Con un proveedor LLM configurado (NLP_SERVICE=deepseek)')
+    parser.add_argument('--preload', action='store_true', help='Con STARTUP_PRELOAD=true (como el maestro de gunicorn --preload)')
+    parser.add_argument('--no-db-init', action='store_true', help='Con DB_INIT_ON_STARTUP=false')
+    parser.add_argument('--budget-ms', type=float, default=500, help='Presupuesto del arranque completo (ms)')
+    parser.add_argument('--top', type=int, default=15, help='Paquetes y módulos a mostrar')
+    parser.add_argument('--runs', type=int, default=3, help='Arranques; se informa el más rápido')
+    args = parser.parse_args()
+
+    runs = [run_startup(args.provider, args.preload, not args.no_db_init) for _ in range(args.runs)]
+    report, entries = min(runs, key=lambda run: run[0]['startup_ms'])
+    summary = summarize(entries, args.top)
+
+    print(f"\nArranque de run.py ({'proveedor LLM' if args.provider else 'fallback'}"
+          f"{', precarga' if args.preload else ''}{', sin init_db' if args.no_db_init else ''})")
+    print(f"Total: {report['startup_ms']:.0f} ms (importaciones del intérprete {summary['import_ms']:.0f} ms), "
+          f"{report['modules']} módulos, openai cargado: {'sí' if report['openai_loaded'] else 'no'}")
+    print("\nPaquetes (tiempo propio de sus módulos):")
+    for name, self_us in summary['packages']:
+        print(f"  {name:<40} {self_us / 1000:8.1f} ms")
+    print("\nMódulos (tiempo acumulado):")
+    for name, cumulative_us in summary['modules']:
+        print(f"  {name:<40} {cumulative_us / 1000:8.1f} ms")
+
+    within = report['startup_ms'] <= args.budget_ms
+    print(f"\nPresupuesto: {args.budget_ms:.0f} ms -> {'dentro' if within else 'EXCEDIDO'}")
+    sys.exit(0 if within else 1)
+
+if __name__ == '__main__':
+    main()
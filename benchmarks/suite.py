@@ -0,0 +1,268 @@
+"""
+Suite de microbenchmarks de los caminos críticos, etapa por etapa:
+
+- sanitize_input (con y sin la caché de resultados)
+- FallbackService.detect_intent en aciertos de patrón, coincidencias parciales y fallos
+- cada consulta consultar_* / contar_* y la paginación por cursor, por tamaño de base
+- el formateo de la respuesta de los manejadores de ranking
+- la ida y vuelta completa de /chatbot con el cliente de pruebas de Flask y un
+  proveedor LLM simulado (sin red), con y sin caché de resultados
+
+Los resultados se guardan en JSON; el modo compare los contrasta con una línea base
+guardada y sale con código 1 si alguna etapa empeora más que el umbral.
+
+Uso:
+    python -m benchmarks.suite run [--sizes 1k,100k] [--output resultados.json] [--quick]
+    python -m benchmarks.suite compare base.json resultados.json [--threshold 0.2]
+    python -m benchmarks.suite run --baseline base.json   # ejecutar y comparar
+"""
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from app.models import database
+from app.services.chatbot_service import ChatbotService
+from app.services.fallback_service import FallbackService
+from app.services.service_registry import get_chatbot_service
+from app.utils.security import _sanitize, sanitize_input
+from benchmarks.common import create_bench_app, measure, print_results
+from benchmarks.synthetic_data import DEFAULT_DATA_DIR, ensure_database, message_corpus
+
+class StubLLMService:
+    """
+    Proveedor LLM simulado: responde al instante con la intención que detectaría el
+    fallback, precalculada por mensaje, para medir todo el camino salvo la red
+    """
+
+    def __init__(self, answers):
+        self.answers = answers
+
+    def detect_intent(self, user_message):
+        return dict(self.answers[user_message])
+
+def cycling(func, items):
+    """Función sin argumentos que llama a func con el siguiente elemento de items"""
+    iterator = itertools.cycle(items)
+    return lambda: func(next(iterator))
+
+def bench_sanitize(corpus, iterations):
+    messages = corpus['hit'] + corpus['partial'] + corpus['miss']
+    long_messages = [(message + ' ') * 40 for message in messages[:200]]
+    return {
+        "sanitize_input/corto (caché)": measure(cycling(sanitize_input, messages), iterations),
+        "sanitize_input/corto (sin caché)": measure(cycling(_sanitize.__wrapped__, messages), iterations),
+        "sanitize_input/1000 caracteres (sin caché)": measure(
+            cycling(lambda m: _sanitize.__wrapped__(m[:1000]), long_messages), iterations
+        ),
+    }
+
+def bench_fallback(corpus, iterations):
+    service = FallbackService()
+    return {
+        f"fallback/{category}": measure(cycling(service.detect_intent, messages), iterations)
+        for category, messages in (
+            ('aciertos', corpus['hit']), ('parciales', corpus['partial']), ('fallos', corpus['miss'])
+        )
+    }
+
+def bench_formatting(iterations):
+    service = ChatbotService()
+    results = {}
+    for rows in (3, 100):
+        data = [{"id": i, "nombre": f"Comprador {i}", "total_compras": 1000.0 - i} for i in range(1, rows + 1)]
+        results[f"formato/ranking de {rows} filas"] = measure(
+            lambda: service._ranking_response(data, 1, rows, None, 'mejores compradores', 'total_compras'),
+            iterations
+        )
+    return results
+
+def bench_queries(label, db_path, iterations):
+    """Consultas de la aplicación contra una base sintética, sin y con caché de resultados"""
+    results = {}
+    for cache in (False, True):
+        app = create_bench_app(DATABASE_PATH=db_path, QUERY_CACHE_ENABLED=cache)
+        suffix = " (caché)" if cache else ""
+        with app.app_context():
+            database.clear_query_cache()
+            cases = {
+                "consultar_mejores_compradores(10)": lambda: database.consultar_mejores_compradores(10),
+                "consultar_deudores_altos(10)": lambda: database.consultar_deudores_altos(10),
+                "contar_compradores": database.contar_compradores,
+                "contar_deudores": database.contar_deudores,
+            }
+            if not cache:
+                # Límites que no salen del ranking materializado y una página profunda por cursor
+                middle = database.get_db().execute(
+                    'SELECT total_compras, id FROM compradores ORDER BY total_compras DESC, id ASC LIMIT 1 OFFSET '
+                    '(SELECT filas / 2 FROM resumen_tablas WHERE tabla = ?)', ('compradores',)
+                ).fetchone()
+                cases["consultar_mejores_compradores(1000)"] = lambda: database.consultar_mejores_compradores(1000)
+                if middle is not None:
+                    cases["página de 100 a mitad del ranking"] = lambda: database.consultar_pagina_ranking(
+                        'compradores', 100, (middle[0], middle[1])
+                    )
+            for name, func in cases.items():
+                results[f"db/{label}/{name}{suffix}"] = measure(func, iterations)
+    return results
+
+def bench_roundtrip(label, db_path, corpus, iterations):
+    """POST /chatbot completo con el proveedor simulado (y la caché de intenciones desactivada)"""
+    results = {}
+    messages = corpus['hit']
+    for cache in (False, True):
+        app = create_bench_app(
+            DATABASE_PATH=db_path,
+            QUERY_CACHE_ENABLED=cache,
+            INTENT_CACHE_ENABLED=False,
+            NLP_SERVICE='deepseek',
+            CIRCUIT_BREAKER_ENABLED=False
+        )
+        with app.app_context():
+            database.clear_query_cache()
+            service = get_chatbot_service()
+            answers = {message: service.fallback_service.detect_intent(message) for message in messages}
+            service.deepseek_service = StubLLMService(answers)
+            service.openai_service = None
+
+        client = app.test_client()
+
+        def post(message):
+            response = client.post('/chatbot', json={"message": message})
+            assert response.status_code == 200
+
+        suffix = " (caché)" if cache else ""
+        results[f"/chatbot/{label}/LLM simulado{suffix}"] = measure(cycling(post, messages), iterations)
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_round(corpus, databases, iterations):
+    """Una pasada completa por todas las etapas"""
+    results = {}
+    app = create_bench_app()
+    with app.app_context():
+        results.update(bench_sanitize(corpus, iterations * 5))
+        results.update(bench_fallback(corpus, iterations * 5))
+        results.update(bench_formatting(iterations * 5))
+
+    for size, db_path in databases.items():
+        results.update(bench_queries(size, db_path, iterations))
+        results.update(bench_roundtrip(size, db_path, corpus, iterations // 2))
+    return results
+
+def run(args):
+    iterations = 200 if args.quick else 2000
+    repeat = 1 if args.quick else args.repeat
+
+    app = create_bench_app()
+    with app.app_context():
+        corpus = message_corpus(100 if args.quick else 500)
+
+    databases = {}
+    for size in args.sizes.split(','):
+        print(f"Preparando la base sintética de {size} filas...", file=sys.stderr)
+        databases[size] = ensure_database(size, args.data_dir)
+
+    # La suite completa se repite y de cada etapa se guarda la pasada con menor mediana:
+    # repartir las repeticiones en el tiempo filtra mejor el ruido de la máquina
+    # (otros procesos, frecuencia de la CPU) que repetir cada etapa seguida
+    rounds = []
+    for number in range(repeat):
+        print(f"Pasada {number + 1} de {repeat}...", file=sys.stderr)
+        rounds.append(run_round(corpus, databases, iterations))
+    results = {
+        name: min((r[name] for r in rounds), key=lambda r: r["p50_us"])
+        for name in rounds[0]
+    }
+
+    print_results("Resultados", results)
+
+    report = {
+        "meta": {
+            "fecha": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "tamaños": args.sizes,
+            "rapido": args.quick,
+            "pasadas": repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {args.output}")
+
+    if args.baseline:
+        return compare(args.baseline, args.output, args.threshold, args.metric)
+    return 0
+
+def compare(baseline_path, current_path, threshold=0.2, metric='p50_us'):
+    """
+    Compara dos archivos de resultados por la métrica indicada. Una etapa es una
+    regresión si tarda más de (1 + threshold) veces lo que tardaba en la línea base.
+    Devuelve 1 si hay alguna regresión
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)["results"]
+    with open(current_path, encoding='utf-8') as f:
+        current = json.load(f)["results"]
+
+    regressions = []
+    print(f"\n{'caso':<60} {'base':>12} {'actual':>12} {'cambio':>9}")
+    for name in sorted(set(baseline) | set(current)):
+        if name not in baseline or name not in current:
+            print(f"{name:<60} {'solo en ' + ('la base' if name in baseline else 'la actual'):>35}")
+            continue
+        before, after = baseline[name][metric], current[name][metric]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESIÓN"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  mejora"
+        print(f"{name:<60} {before:>12.1f} {after:>12.1f} {change:>+8.0%}{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regresiones de más del {threshold:.0%} en {metric}")
+        return 1
+    print(f"\nSin regresiones de más del {threshold:.0%} en {metric}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de los caminos críticos del chatbot")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Ejecutar la suite y guardar los resultados en JSON')
+    run_parser.add_argument('--sizes', default='1k,100k', help='Tamaños de base separados por comas (1k, 100k, 10m o un número)')
+    run_parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Directorio de las bases sintéticas (se reutilizan)')
+    run_parser.add_argument('--output', default='benchmark_results.json')
+    run_parser.add_argument('--quick', action='store_true', help='Una sola pasada, menos iteraciones y un corpus más pequeño')
+    run_parser.add_argument('--repeat', type=int, default=3, help='Pasadas de la suite (se guarda la mejor de cada etapa)')
+    run_parser.add_argument('--baseline', help='Comparar al terminar con esta línea base')
+    run_parser.add_argument('--threshold', type=float, default=0.2)
+    run_parser.add_argument('--metric', default='p50_us', choices=['p50_us', 'mean_us', 'p95_us'])
+
+    compare_parser = subparsers.add_parser('compare', help='Comparar resultados con una línea base')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help='Empeoramiento relativo tolerado (0.2 = 20%%)')
+    compare_parser.add_argument('--metric', default='p50_us', choices=['p50_us', 'mean_us', 'p95_us'])
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        sys.exit(run(args))
+    sys.exit(compare(args.baseline, args.current, args.threshold, args.metric))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Genera datos sintéticos para los benchmarks: bases de datos de compradores y deudores
+de distintos tamaños (1k, 100k, 10M filas) y un corpus de mensajes realista separado
+en aciertos de patrón, coincidencias parciales y fallos del detector local.
+
+Las bases se cargan con la importación masiva (app/models/bulk_import.py) desde CSV
+generados en streaming y se reutilizan entre ejecuciones; si la generación se
+interrumpe, la siguiente ejecución la reanuda desde el último lote.
+
+Uso:
+    python -m benchmarks.synthetic_data 100k [directorio]     # base de datos
+    python -m benchmarks.synthetic_data corpus mensajes.jsonl  # corpus en JSONL ("message", "category")
+"""
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+from app.models.bulk_import import IMPORT_TABLES, import_file
+from app.models.database import get_db
+from app.models.migrations import migrate
+from app.services.fallback_service import FallbackService
+from app.utils.security import sanitize_input
+from tests.corpus import sample_corpus
+from benchmarks.common import create_bench_app
+
+SIZES = {
+    '1k': 1000,
+    '100k': 100000,
+    '10m': 10000000,
+}
+
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'chatbot-bench')
+
+NOMBRES = ['Juan', 'María', 'Carlos', 'Ana', 'Pedro', 'Lucía', 'Jorge', 'Sofía', 'Miguel', 'Laura',
+           'Diego', 'Valentina', 'Andrés', 'Camila', 'Roberto', 'Isabel', 'Fernando', 'Paula']
+APELLIDOS = ['Pérez', 'López', 'Gómez', 'Martínez', 'Sánchez', 'Díaz', 'Ramírez', 'Torres',
+             'Jiménez', 'Ruiz', 'Hernández', 'Flores', 'Castro', 'Vargas', 'Romero', 'Navarro']
+
+# Mensajes que el detector local reconoce solo por palabras sueltas o no reconoce
+PARTIAL_TEMPLATES = [
+    "compradores mejores de este mes",
+    "deudores altos por favor",
+    "quiero ver compradores top {n}",
+    "deudores mayores {n}",
+    "compradores total",
+    "lista de deudores principales",
+]
+MISS_TEMPLATES = [
+    "hola",
+    "¿qué tiempo hace hoy?",
+    "gracias por la ayuda",
+    "¿cuál es el horario de atención?",
+    "necesito cambiar mi contraseña",
+    "¿aceptan pagos con tarjeta?",
+    "precio del producto {n}",
+]
+
+def parse_size(value):
+    """Convierte '100k' o '2500' en un número de filas"""
+    value = str(value).lower()
+    if value in SIZES:
+        return SIZES[value]
+    multiplier = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+def write_dataset(path, tabla, rows, seed=1):
+    """
+    Escribe un CSV con rows filas de la tabla: nombres realistas con repeticiones y
+    montos con distribución log-normal redondeados a centavos (con empates)
+    """
+    rng = random.Random(f"{tabla}-{seed}")
+    monto = IMPORT_TABLES[tabla]
+    scale = 8.0 if tabla == 'compradores' else 7.0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'nombre', monto])
+        for start in range(1, rows + 1, 10000):
+            writer.writerows(
+                (i, f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}", round(rng.lognormvariate(scale, 1.2), 2))
+                for i in range(start, min(start + 10000, rows + 1))
+            )
+
+def build_database(db_path, rows, seed=1, progress=None):
+    """
+    Crea (o completa) una base de datos con rows compradores y rows deudores.
+    Si ya existe con esas filas no se vuelve a generar. Devuelve la ruta
+    """
+    app = create_bench_app(DATABASE_PATH=db_path)
+    with app.app_context():
+        db = get_db()
+        migrate(db)
+        counts = dict(db.execute('SELECT tabla, filas FROM resumen_tablas').fetchall())
+        for tabla in IMPORT_TABLES:
+            if counts.get(tabla) == rows:
+                continue
+            # El CSV se conserva junto a la base para que una importación interrumpida
+            # se reanude con la misma huella de archivo
+            csv_path = f"{db_path}.{tabla}.csv"
+            if not os.path.exists(csv_path):
+                write_dataset(csv_path, tabla, rows, seed)
+            import_file(db, csv_path, tabla, upsert=True, drop_indexes=True, progress=progress)
+            os.remove(csv_path)
+    return db_path
+
+def ensure_database(size, data_dir=DEFAULT_DATA_DIR, progress=None):
+    """Ruta de la base de datos sintética del tamaño indicado, generándola si hace falta"""
+    rows = parse_size(size)
+    os.makedirs(data_dir, exist_ok=True)
+    return build_database(os.path.join(data_dir, f'bench_{rows}.db'), rows, progress=progress)
+
+def classify(service, message):
+    """'hit' si coincide un patrón, 'partial' si solo por palabras clave, 'miss' si no se reconoce"""
+    if service._match_intent(sanitize_input(message).lower()) is not None:
+        return 'hit'
+    return 'partial' if service.detect_intent(message)['intent'] != 'desconocido' else 'miss'
+
+def message_corpus(per_category=500, seed=42):
+    """Corpus de mensajes por categoría: {'hit': [...], 'partial': [...], 'miss': [...]}"""
+    rng = random.Random(seed)
+    service = FallbackService()
+    candidates = sample_corpus(per_category * 2, seed)
+    for templates in (PARTIAL_TEMPLATES, MISS_TEMPLATES):
+        candidates += [rng.choice(templates).format(n=rng.randint(1, 50)) for _ in range(per_category * 2)]
+
+    corpus = {'hit': [], 'partial': [], 'miss': []}
+    for message in candidates:
+        category = classify(service, message)
+        if len(corpus[category]) < per_category:
+            corpus[category].append(message)
+    return corpus
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    if sys.argv[1] == 'corpus':
+        path = sys.argv[2] if len(sys.argv) > 2 else 'mensajes.jsonl'
+        app = create_bench_app()
+        with app.app_context():
+            corpus = message_corpus()
+        with open(path, 'w', encoding='utf-8') as f:
+            for category, messages in corpus.items():
+                for message in messages:
+                    f.write(json.dumps({"message": message, "category": category}, ensure_ascii=False) + "\n")
+        print(f"Corpus escrito en {path}: " + ", ".join(f"{len(m)} {c}" for c, m in corpus.items()))
+        return
+
+    data_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DATA_DIR
+    path = ensure_database(sys.argv[1], data_dir, progress=lambda s: print(f"  {s['rows']} filas, {s['rows_per_sec']:.0f} filas/s"))
+    print(f"Base de datos sintética: {path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Configuración de gunicorn: gunicorn -c gunicorn.conf.py
+# El perfil (SERVER_PROFILE) y su tamaño se calculan en server_profiles.py
+import glob
+import os
+from server_profiles import describe, server_settings
+
+_settings = server_settings()
+globals().update(_settings)
+
+if _settings['worker_class'] == 'gevent':
+    # Con la aplicación precargada en el maestro, la biblioteca estándar debe estar
+    # parcheada antes de importarla (locks, sockets y hilos de los módulos)
+    from gevent import monkey
+    monkey.patch_all()
+elif _settings['worker_class'] == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+
+# El perfil asgi sirve asgi.py: la aplicación lo sabe por ASGI (precarga del SDK de openai)
+if _settings['wsgi_app'] == 'asgi:app' and not os.environ.get('ASGI'):
+    os.environ['ASGI'] = 'true'
+
+if _settings['preload_app']:
+    # run.py se importa una vez en el maestro: que precargue tiktoken y el SDK y congele el GC
+    # (salvo STARTUP_PRELOAD=false explícito)
+    if not os.environ.get('STARTUP_PRELOAD'):
+        os.environ['STARTUP_PRELOAD'] = 'true'
+
+# Una conexión keep-alive al proveedor LLM por solicitud en curso del worker: con menos,
+# las que no caben en el pool se abren y se cierran en cada llamada
+_in_flight = _settings.get('worker_connections') or _settings.get('threads')
+if _in_flight and not os.environ.get('LLM_POOL_MAXSIZE'):
+    os.environ['LLM_POOL_MAXSIZE'] = str(_in_flight)
+# Modo hedged: hasta dos llamadas en el pool (principal y hedge) por solicitud en curso
+if _in_flight and not os.environ.get('HEDGE_MAX_WORKERS'):
+    os.environ['HEDGE_MAX_WORKERS'] = str(2 * _in_flight)
+
+def on_starting(server):
+    # Los archivos de métricas de una ejecución anterior sumarían contadores de workers
+    # que ya no existen
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, 'metrics-*.json')):
+            os.remove(path)
+
+def when_ready(server):
+    server.log.info(f"Perfil {os.environ.get('SERVER_PROFILE', 'gthread')}: {describe(_settings)}")
+
+def post_fork(server, worker):
+    # El worker no debe usar nada abierto por el maestro: descarta las conexiones SQLite
+    # heredadas (sin cerrarlas, siguen siendo del maestro) y los servicios con sus
+    # clientes HTTP, que se reconstruyen en la primera solicitud
+    from app.models.database import close_all_connections
+    from app.services.service_registry import service_registry
+    close_all_connections()
+    service_registry.reset()
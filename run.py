@@ -1,11 +1,13 @@
 from app import create_app
-from app.models.database import init_db
+from app.config import Config
+from app.startup import init_database, preload
 import os
 import logging
 
-# Configurar logging
+# Configurar logging (LOG_LEVEL, INFO por defecto: DEBUG registra cada solicitud de las librerías HTTP)
+log_level = getattr(logging, str(Config.LOG_LEVEL).upper(), logging.INFO)
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=log_level,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S',
 )
@@ -14,17 +16,13 @@ logging.basicConfig(
 app = create_app()
 
 # Configurar el logger de la aplicación
-app.logger.setLevel(logging.DEBUG)
-
-# Inicializar la base de datos dentro del contexto de la aplicación
-with app.app_context():
-    # Asegurarse de que la carpeta data existe
-    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    
-    # Inicializar la base de datos con datos de ejemplo
-    init_db()
-    app.logger.info("Base de datos inicializada correctamente.")
+app.logger.setLevel(log_level)
+
+# Inicializar la base de datos: con gunicorn --preload este módulo se importa una sola vez
+# en el proceso maestro; sin él, cada worker repite las comprobaciones (idempotentes).
+# Con DB_INIT_ON_STARTUP=false se deja a un paso previo del despliegue (flask db migrate)
+if app.config.get('DB_INIT_ON_STARTUP', True):
+    init_database(app)
 
 # Asegurarse de que la clave API de DeepSeek está configurada si se proporciona
 deepseek_api_key = os.environ.get('DEEPSEEK_API_KEY') or app.config.get('DEEPSEEK_API_KEY')
@@ -51,8 +49,14 @@ nlp_service = os.environ.get('NLP_SERVICE') or app.config.get('NLP_SERVICE', 'au
 app.config['NLP_SERVICE'] = nlp_service
 app.logger.info(f"Modo de detección de intenciones: {nlp_service}")
 
-# Mostrar la URL base para DeepSeek
-app.logger.info("URL base para DeepSeek: https://api.deepseek.com")
+# Mostrar las URL base de los proveedores
+app.logger.info(f"URL base para DeepSeek: {app.config.get('DEEPSEEK_BASE_URL')}")
+if app.config.get('OPENAI_BASE_URL'):
+    app.logger.info(f"URL base para OpenAI: {app.config.get('OPENAI_BASE_URL')}")
+
+# Precargar lo que los workers comparten tras el fork (al final, para congelar todo lo anterior)
+if app.config.get('STARTUP_PRELOAD', False):
+    preload(app)
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
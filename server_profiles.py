@@ -0,0 +1,100 @@
+"""
+Perfiles de servidor de gunicorn para un servicio que pasa casi todo el tiempo
+esperando al proveedor LLM. gunicorn.conf.py aplica el perfil SERVER_PROFILE:
+
+- sync: un proceso por solicitud en curso (2 x CPU + 1). Solo para depurar: cada
+  llamada al LLM bloquea un worker entero
+- gthread: pocos procesos (uno por CPU) con muchos hilos; el número de hilos sale de
+  la proporción entre la espera al LLM y el tiempo de CPU de cada solicitud
+- gevent / eventlet: un proceso por CPU con corrutinas (necesitan el paquete instalado)
+- asgi: asgi.py con workers de uvicorn (POST /chatbot asíncrono)
+
+No importa la aplicación: gunicorn carga este módulo en el proceso maestro antes que
+run.py, y con gevent o eventlet hay que parchear la biblioteca estándar antes.
+"""
+import math
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROFILES = ('sync', 'gthread', 'gevent', 'eventlet', 'asgi')
+
+# Clase de worker de gunicorn de cada perfil
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'gevent': 'gevent',
+    'eventlet': 'eventlet',
+    'asgi': 'uvicorn.workers.UvicornWorker',
+}
+
+def _env(name, default, cast=str):
+    value = os.environ.get(name)
+    return cast(value) if value else default
+
+def concurrency_per_worker(llm_latency_ms, cpu_ms_per_request, limit):
+    """
+    Solicitudes en curso que mantienen ocupado un núcleo: mientras una espera al LLM
+    durante llm_latency_ms, caben llm_latency_ms / cpu_ms_per_request más usando la CPU
+    """
+    return max(1, min(limit, math.ceil(1 + llm_latency_ms / max(cpu_ms_per_request, 0.1))))
+
+def server_settings(profile=None, cpu_count=None):
+    """
+    Ajustes de gunicorn del perfil (por defecto SERVER_PROFILE, gthread).
+    SERVER_WORKERS y SERVER_THREADS sustituyen a los valores calculados
+    """
+    profile = (profile or _env('SERVER_PROFILE', 'gthread')).lower()
+    if profile not in PROFILES:
+        raise ValueError(f"SERVER_PROFILE no válido: {profile} (perfiles: {', '.join(PROFILES)})")
+    cpus = cpu_count or os.cpu_count() or 1
+    llm_latency_ms = _env('SERVER_LLM_LATENCY_MS', 2000.0, float)
+    cpu_ms = _env('SERVER_CPU_MS_PER_REQUEST', 5.0, float)
+
+    settings = {
+        'worker_class': WORKER_CLASSES[profile],
+        'wsgi_app': 'asgi:app' if profile == 'asgi' else 'run:app',
+        'bind': _env('SERVER_BIND', '0.0.0.0:5000'),
+        # Un worker que no responde en este tiempo se reinicia. Debe superar la peor
+        # cascada de proveedores (reintentos incluidos); en gthread y en los
+        # perfiles asíncronos solo vigila el latido del proceso
+        'timeout': _env('SERVER_TIMEOUT', 60, int),
+        'graceful_timeout': _env('SERVER_GRACEFUL_TIMEOUT', 30, int),
+        # Conexiones keep-alive del cliente o del balanceador (segundos). Detrás de un
+        # balanceador debe ser mayor que su timeout de inactividad
+        'keepalive': _env('SERVER_KEEPALIVE', 5, int),
+        'preload_app': _env('SERVER_PRELOAD', 'true').lower() == 'true',
+        'loglevel': _env('LOG_LEVEL', 'INFO').lower(),
+        'accesslog': _env('SERVER_ACCESS_LOG', '-'),
+        'errorlog': '-',
+    }
+
+    if profile == 'sync':
+        settings['workers'] = _env('SERVER_WORKERS', 2 * cpus + 1, int)
+        settings['threads'] = 1
+    elif profile == 'gthread':
+        settings['workers'] = _env('SERVER_WORKERS', cpus, int)
+        settings['threads'] = _env('SERVER_THREADS', concurrency_per_worker(
+            llm_latency_ms, cpu_ms, _env('SERVER_MAX_THREADS', 256, int)
+        ), int)
+    elif profile in ('gevent', 'eventlet'):
+        settings['workers'] = _env('SERVER_WORKERS', cpus, int)
+        settings['worker_connections'] = _env('SERVER_THREADS', concurrency_per_worker(
+            llm_latency_ms, cpu_ms, _env('SERVER_MAX_CONNECTIONS', 1000, int)
+        ), int)
+    else:
+        settings['workers'] = _env('SERVER_WORKERS', cpus, int)
+    return settings
+
+def describe(settings):
+    """Resumen de una línea de los ajustes de un perfil"""
+    if 'worker_connections' in settings:
+        per_worker = f"{settings['worker_connections']} conexiones"
+    elif 'threads' in settings:
+        per_worker = f"{settings['threads']} hilos"
+    else:
+        per_worker = "event loop"
+    return (f"{settings['worker_class']} ({settings['wsgi_app']}): {settings['workers']} workers x {per_worker}, "
+            f"timeout {settings['timeout']}s, keep-alive {settings['keepalive']}s"
+            f"{', precarga' if settings['preload_app'] else ''}")
@@ -0,0 +1,23 @@
+import pytest
+from app import create_app
+from app.config import Config
+from app.models.database import clear_query_cache, close_all_connections, get_db
+from app.models.migrations import migrate
+
+@pytest.fixture
+def app(tmp_path):
+    """Aplicación con una base de datos vacía y migrada en un directorio temporal"""
+    config_class = type('TestConfig', (Config,), {
+        'TESTING': True,
+        'DATABASE_PATH': str(tmp_path / 'test.db'),
+    })
+    app = create_app(config_class)
+    with app.app_context():
+        migrate(get_db())
+        yield app
+        clear_query_cache()
+        close_all_connections()
+
+@pytest.fixture
+def db(app):
+    return get_db()
@@ -0,0 +1,72 @@
+"""
+Mensajes de prueba compartidos por las pruebas y los benchmarks: un corpus sintético
+con variaciones de números, mayúsculas, acentos y puntuación, casos límite del
+detector local y mezclas aleatorias de palabras clave
+"""
+import random
+from app.services.fallback_service import FallbackService
+
+SAMPLE_TEMPLATES = [
+    "¿Quiénes son los mejores compradores?",
+    "¿Cuáles son los deudores con montos más altos?",
+    "¿Cuántos compradores hay en total?",
+    "¿Cuántos deudores hay registrados?",
+    "Muéstrame los {n} mejores compradores",
+    "top {n} compradores",
+    "top {n} deudores",
+    "¿Cuáles son los {n} principales deudores?",
+    "dame {n} mejores compradores por favor",
+]
+
+def sample_corpus(size=5000, seed=42):
+    """Genera un corpus con variaciones de números, mayúsculas, acentos y puntuación"""
+    rng = random.Random(seed)
+    variations = [
+        lambda m: m,
+        lambda m: m.lower(),
+        lambda m: m.upper(),
+        lambda m: m.replace('¿', '').replace('?', ''),
+        lambda m: m.replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ú', 'u'),
+        lambda m: m + '!!',
+        lambda m: 'hola, ' + m,
+    ]
+    corpus = []
+    for _ in range(size):
+        message = rng.choice(SAMPLE_TEMPLATES).format(n=rng.randint(1, 50))
+        corpus.append(rng.choice(variations)(message))
+    return corpus
+
+EDGE_CASES = [
+    "",
+    "   ",
+    "hola",
+    "¿Cuántos deudores y mejores compradores hay?",
+    "total de deudores y top compradores",
+    "los deudores que más deben y cuántos compradores",
+    "mejores deudores compradores",
+    "compradores s mejores",
+    "top 10 compradores dame 3",
+    "muéstrame 7 deudores",
+    "MEJORES   COMPRADORES",
+    "quiénes deudores",
+    "deudores deben",
+    "cantidad compradores de",
+    "número total de deudores",
+    "<script>alert(1)</script> top deudores",
+    "select * from compradores; drop table deudores",
+    "x" * 1200,
+]
+
+def random_messages(count, seed=7):
+    """Mensajes con mezclas de palabras clave de los patrones, números y ruido"""
+    rng = random.Random(seed)
+    service = FallbackService()
+    vocabulary = sorted({word for sets in service._pattern_keywords.values() for words in sets for word in words})
+    vocabulary += ['hola', 'dame', 'muéstrame', 'ver', 'quiénes', 'son', 'los', 'cuál', 'clientes', '¿', '?', 'MÁS']
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(1, 7))]
+        if rng.random() < 0.3:
+            words.insert(rng.randint(0, len(words)), str(rng.randint(1, 50)))
+        messages.append(' '.join(words))
+    return messages
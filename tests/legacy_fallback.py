@@ -0,0 +1,96 @@
+"""
+Implementación anterior de FallbackService.detect_intent (bucles de re.search sin
+compilar), conservada como referencia: el detector compilado debe dar exactamente la
+misma salida (test_fallback_matcher.py). benchmarks/bench_fallback_matcher.py compara
+su rendimiento
+"""
+import re
+from flask import current_app
+from app.services.fallback_service import FallbackService
+from app.utils.security import sanitize_input
+
+class LegacyFallbackService(FallbackService):
+    """Implementación anterior de detect_intent, conservada como referencia"""
+
+    def detect_intent(self, user_message):
+        message = sanitize_input(user_message).lower()
+
+        if current_app:
+            current_app.logger.info(f"Detectando intención para: '{message}'")
+
+        for intent, patterns in self.intent_patterns.items():
+            for pattern in patterns:
+                if re.search(pattern, message, re.IGNORECASE):
+                    parameters = self._legacy_extract_parameters(message, intent)
+                    if current_app:
+                        current_app.logger.info(f"Intención detectada: {intent}, parámetros: {parameters}")
+                    return {
+                        "intent": intent,
+                        "parameters": parameters,
+                        "confidence": 0.8
+                    }
+
+        best_intent = None
+        best_score = 0
+        best_params = {}
+
+        for intent, patterns in self.intent_patterns.items():
+            score = self._legacy_partial_match(message, patterns)
+            if score > best_score and score > 0.4:
+                best_score = score
+                best_intent = intent
+                best_params = self._legacy_extract_parameters(message, intent)
+
+        if best_intent:
+            if current_app:
+                current_app.logger.info(f"Intención parcial detectada: {best_intent}, parámetros: {best_params}, confianza: {best_score}")
+            return {
+                "intent": best_intent,
+                "parameters": best_params,
+                "confidence": best_score
+            }
+
+        if current_app:
+            current_app.logger.info("No se detectó ninguna intención clara")
+        return {
+            "intent": "desconocido",
+            "parameters": {},
+            "confidence": 0
+        }
+
+    def _legacy_partial_match(self, message, patterns):
+        message_words = set(message.lower().split())
+
+        for pattern in patterns:
+            keywords = re.sub(r'[()[\]{}?+*\\|]', ' ', pattern)
+            keywords = re.sub(r'\s+', ' ', keywords).strip()
+            pattern_words = set(keywords.lower().split())
+
+            common_words = message_words.intersection(pattern_words)
+
+            if len(common_words) > 0 and len(pattern_words) > 0:
+                score = len(common_words) / len(pattern_words)
+                if score > 0.5:
+                    return score
+
+        return 0
+
+    def _legacy_extract_parameters(self, message, intent):
+        parameters = {}
+
+        if intent in ['mejores_compradores', 'deudores_altos']:
+            limit_match = re.search(r'(?:top|primeros|mejores|principales)\s+(\d+)', message)
+            if limit_match:
+                try:
+                    parameters['limite'] = int(limit_match.group(1))
+                except ValueError:
+                    parameters['limite'] = 3
+
+            limit_match2 = re.search(r'(?:muéstrame|muestra|dame|ver|obtener)\s+(\d+)', message)
+            if not 'limite' in parameters and limit_match2:
+                try:
+                    parameters['limite'] = int(limit_match2.group(1))
+                except ValueError:
+                    parameters['limite'] = 3
+
+        return parameters
@@ -0,0 +1,70 @@
+"""
+Implementación anterior de sanitize_input (html.escape + re.sub por cada palabra
+clave), conservada como referencia: la nueva debe producir exactamente los mismos
+bytes (test_sanitize.py). benchmarks/bench_sanitize.py compara su rendimiento
+"""
+import html
+import random
+import re
+from app.utils import security
+from app.utils.security import PROMPT_INJECTION_KEYWORDS
+
+def legacy_sanitize_input(text):
+    """Implementación anterior de sanitize_input, conservada como referencia"""
+    if text is None:
+        return ""
+
+    if not isinstance(text, str):
+        text = str(text)
+
+    text = text[:1000]
+    text = html.escape(text)
+    text = re.sub(r'[\\`\*_\{\}\[\]\(\)#\+\-\.!]', ' ', text)
+
+    prompt_injection_patterns = [
+        r'\bignora\b', r'\bolvida\b', r'\bsistema\b', r'\binstrucciones\b',
+        r'\bprompt\b', r'\bdesatender\b', r'\boverride\b', r'\bbypass\b',
+        r'\badvertencia\b', r'\balerta\b', r'\bwarning\b', r'\balert\b',
+        r'\bsql\b', r'\bselect\b', r'\binsert\b', r'\bupdate\b', r'\bdelete\b',
+        r'\bdrop\b', r'\balter\b', r'\bcreate\b', r'\bexecute\b', r'\bexec\b'
+    ]
+
+    for pattern in prompt_injection_patterns:
+        text = re.sub(pattern, '[redactado]', text, flags=re.IGNORECASE)
+
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    return text
+
+def uncached_sanitize_input(text):
+    """La implementación nueva sin memoización, para medir el motor en sí"""
+    if text is None:
+        return ""
+    if not isinstance(text, str):
+        text = str(text)
+    return security._sanitize.__wrapped__(text[:1000])
+
+def code_point_cases(limit, start=0):
+    """Cada punto de código en varias posiciones: aislado, repetido y junto a palabras clave"""
+    for code in range(start, limit):
+        char = chr(code)
+        yield char
+        yield f" {char}{char} "
+        yield f"a{char}b"
+        yield f"{char}select{char}"
+        yield f"Alert{char}exec {char}drop"
+
+def random_cases(count, seed=11):
+    rng = random.Random(seed)
+    alphabet = list("abcdeéñ ÁÉ\t\n\r\x0b\x0c\x1c\x1f\x85\xa0 　&<>\"'#\\`*_{}[]()+-.!?¿0123456789ſK")
+    keywords = list(PROMPT_INJECTION_KEYWORDS) + [k.upper() for k in PROMPT_INJECTION_KEYWORDS] + ['selects', 'execute_', 'redactado']
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(0, 40)):
+            parts.append(rng.choice(keywords) if rng.random() < 0.2 else rng.choice(alphabet))
+        yield ''.join(parts)
+    yield "x" * 1500
+    yield "select " * 300
+    yield None
+    yield 12345
+    yield 3.5
@@ -0,0 +1,109 @@
+import pytest
+from app.models import bulk_import
+from app.models.bulk_import import import_file, recover_interrupted_imports, validate_record
+from app.models.summary import check_summary
+
+def trigger_names(db, tabla):
+    return {row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (tabla,)
+    )}
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('id,nombre,total_compras\n')
+        for row in rows:
+            f.write(','.join(str(value) for value in row) + '\n')
+
+def test_resume_after_aborted_batch(db, tmp_path):
+    path = tmp_path / 'compradores.csv'
+    rows = [(i, f'comprador {i}', f'{i * 1.5:.2f}') for i in range(1, 26)]
+    # Dos registros inválidos en el tercer lote: con max_errors=1 se detiene en él
+    rows[22] = (23, '', '1.00')
+    rows[23] = (24, 'sin monto', 'abc')
+    write_csv(path, rows)
+
+    stats = import_file(db, str(path), 'compradores', batch_size=10, max_errors=1)
+    assert stats["status"] == "aborted"
+    assert stats["rows"] == 20
+    assert db.execute('SELECT COUNT(*) FROM compradores').fetchone()[0] == 20
+    # Los triggers se restauraron y el resumen es coherente con las filas confirmadas
+    assert check_summary(db) == []
+
+    # Al repetirla se reanuda tras el último lote confirmado, sin duplicar filas
+    stats = import_file(db, str(path), 'compradores', batch_size=10, max_errors=None)
+    assert stats["status"] == "completed"
+    assert stats["resumed_from_line"] == 21
+    assert stats["rows"] == 23
+    # Las líneas del lote no confirmado se vuelven a leer: sus rechazos no se cuentan dos veces
+    assert stats["rejected"] == 2
+    assert db.execute('SELECT COUNT(*) FROM compradores').fetchone()[0] == 23
+    assert check_summary(db) == []
+
+    assert import_file(db, str(path), 'compradores')["status"] == "already_imported"
+
+def test_resume_after_crash_between_batches(db, tmp_path):
+    path = tmp_path / 'compradores.csv'
+    write_csv(path, [(i, f'comprador {i}', '10.00') for i in range(1, 31)])
+
+    def crash(stats):
+        raise KeyboardInterrupt
+
+    try:
+        import_file(db, str(path), 'compradores', batch_size=10, progress=crash)
+    except KeyboardInterrupt:
+        pass
+    assert db.execute('SELECT COUNT(*) FROM compradores').fetchone()[0] == 10
+
+    stats = import_file(db, str(path), 'compradores', batch_size=10)
+    assert stats["status"] == "completed"
+    assert stats["resumed_from_line"] == 11
+    assert db.execute('SELECT COUNT(*), SUM(total_compras) FROM compradores').fetchone()[:] == (30, 300.0)
+    assert check_summary(db) == []
+
+def test_recover_restores_triggers_of_killed_import(db, tmp_path, monkeypatch):
+    path = tmp_path / 'compradores.csv'
+    write_csv(path, [(i, f'comprador {i}', '10.00') for i in range(1, 31)])
+    triggers = trigger_names(db, 'compradores')
+
+    # Un proceso muerto con SIGKILL no llega a restaurar los triggers en el finally
+    def killed(*args):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(bulk_import, 'restore_objects', killed)
+    with pytest.raises(KeyboardInterrupt):
+        import_file(db, str(path), 'compradores', batch_size=10)
+    monkeypatch.undo()
+    assert trigger_names(db, 'compradores') == set()
+    assert check_summary(db) != []
+
+    assert recover_interrupted_imports(db) == ['compradores']
+    assert trigger_names(db, 'compradores') == triggers
+    assert check_summary(db) == []
+    assert recover_interrupted_imports(db) == []
+
+    # Los triggers restaurados mantienen el resumen
+    db.execute("INSERT INTO compradores (id, nombre, total_compras) VALUES (100, 'Ana', 1.25)")
+    db.commit()
+    assert check_summary(db) == []
+
+@pytest.mark.parametrize('amount', ['10.005', '0.001', 1.999])
+def test_amounts_with_more_than_two_decimals_are_rejected(amount):
+    with pytest.raises(ValueError):
+        validate_record(1, 'Ana', amount)
+
+@pytest.mark.parametrize('amount, expected', [('10.25', 10.25), ('7', 7.0), (0.1, 0.1), ('1e3', 1000.0)])
+def test_amounts_are_not_rounded(amount, expected):
+    assert validate_record('1', ' Ana ', amount) == (1, 'Ana', expected)
+
+@pytest.mark.parametrize('nombre', [None, 12, 3.5, ['Ana']])
+def test_non_text_names_are_rejected(nombre):
+    with pytest.raises(ValueError, match='nombre'):
+        validate_record(1, nombre, '10')
+
+@pytest.mark.parametrize('row_id', [True, False, 3.7, '3.7'])
+def test_non_integer_ids_are_rejected(row_id):
+    with pytest.raises(ValueError, match='id'):
+        validate_record(row_id, 'Ana', '10')
+
+@pytest.mark.parametrize('row_id', [3, 3.0, '3'])
+def test_integer_ids_are_accepted(row_id):
+    assert validate_record(row_id, 'Ana', '10') == (3, 'Ana', 10.0)
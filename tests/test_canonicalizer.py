@@ -0,0 +1,24 @@
+import pytest
+from app.services.canonicalizer import MessageCanonicalizer, abstract_parameters, fill_parameters
+
+@pytest.mark.parametrize('parameters, slots, abstracted, filled', [
+    ({'limite': 7}, [7], {'limite': '<N0>'}, {'limite': 7}),
+    ({'limite': '7'}, [2, 7], {'limite': '<N1>'}, {'limite': 7}),
+    # Un limite que no sale del mensaje no se abstrae
+    ({'limite': 3}, [], {'limite': 3}, {'limite': 3}),
+    ({}, [5], {}, {}),
+])
+def test_abstract_then_fill_round_trip(parameters, slots, abstracted, filled):
+    assert abstract_parameters(parameters, slots) == abstracted
+    assert fill_parameters(abstracted, slots) == filled
+
+def test_cached_parameters_are_refilled_for_another_message():
+    canonicalizer = MessageCanonicalizer()
+    template, slots = canonicalizer.canonicalize('¿Quiénes son los TOP 7 compradores?')
+    other_template, other_slots = canonicalizer.canonicalize('quienes son los top 12 compradores')
+    assert template == other_template
+    stored = abstract_parameters({'limite': 7}, slots)
+    assert fill_parameters(stored, other_slots) == {'limite': 12}
+
+def test_fill_drops_reference_to_missing_slot():
+    assert fill_parameters({'limite': '<N1>', 'otro': 1}, [4]) == {'otro': 1}
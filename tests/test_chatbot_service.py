@@ -0,0 +1,145 @@
+import json
+import threading
+from collections import Counter
+import pytest
+from app.services.canonicalizer import MessageCanonicalizer
+from app.services.chatbot_service import ChatbotService
+from app.services.intent_cache import IntentCache
+from app.services.local_first import local_first_stats
+
+FAILED = {'intent': 'desconocido', 'error': 'proveedor caído'}
+
+class StubProvider:
+    """Proveedor LLM que responde según una tabla y cuenta las llamadas por mensaje"""
+
+    def __init__(self, answers=None, default=FAILED):
+        self.answers = answers or {}
+        self.default = default
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def detect_intent(self, user_message):
+        with self._lock:
+            self.calls[user_message] += 1
+        return self.answers.get(user_message, self.default)
+
+def make_service(app, deepseek, preference='auto', intent_cache=None):
+    # Sin caché compartida en data/ ni circuit breakers globales
+    app.config['INTENT_CACHE_ENABLED'] = intent_cache is not None
+    app.config['CIRCUIT_BREAKER_ENABLED'] = False
+    service = ChatbotService()
+    service.deepseek_service = deepseek
+    service.openai_service = StubProvider()
+    service.nlp_service_preference = preference
+    service.intent_cache = intent_cache
+    return service.initialize()
+
+def make_cache():
+    return IntentCache('pruebas', canonicalizer=MessageCanonicalizer())
+
+def test_batch_classifies_each_message_once_and_groups_queries(app, monkeypatch):
+    provider = StubProvider({
+        'top 5 compradores': {'intent': 'mejores_compradores', 'parameters': {'limite': 5}},
+        'los 5 que más compran': {'intent': 'mejores_compradores', 'parameters': {'limite': '5'}},
+        'top 3 compradores': {'intent': 'mejores_compradores', 'parameters': {'limite': 3}},
+        'cuantos deben': {'intent': 'contar_deudores', 'parameters': {}},
+        'numero de deudores': {'intent': 'contar_deudores', 'parameters': {}},
+    })
+    service = make_service(app, provider)
+    dispatched = []
+
+    def dispatch(intent, parameters):
+        dispatched.append((intent, parameters))
+        return {'status': 'success', 'message': f'{intent} {parameters.get("limite")}'}
+
+    monkeypatch.setattr(service, '_dispatch_intent', dispatch)
+    messages = ['top 5 compradores', ' top 5 compradores ', 'los 5 que más compran', 'top 3 compradores',
+                'cuantos deben', 'numero de deudores', '', 7]
+
+    batch = service.process_batch(messages)
+
+    assert set(provider.calls.values()) == {1}
+    assert batch['stats'] == {'total': 8, 'unique': 5, 'queries': 3}
+    assert sorted(dispatched, key=repr) == sorted([
+        ('mejores_compradores', {'limite': 5}),
+        ('mejores_compradores', {'limite': 3}),
+        ('contar_deudores', {}),
+    ], key=repr)
+    results = batch['results']
+    assert [r.get('intent') for r in results[:6]] == ['mejores_compradores'] * 4 + ['contar_deudores'] * 2
+    assert results[0]['message'] == results[2]['message'] == 'mejores_compradores 5'
+    assert results[3]['message'] == 'mejores_compradores 3'
+    assert results[6] == {'status': 'error', 'message': 'El mensaje no puede estar vacío'}
+    assert results[7] == {'status': 'error', 'message': 'El mensaje debe ser un texto'}
+
+def test_cache_hit_fills_number_slots_from_new_message(app):
+    provider = StubProvider({
+        '¿Quiénes son los TOP 7 compradores?': {'intent': 'mejores_compradores', 'parameters': {'limite': 7}},
+    })
+    service = make_service(app, provider, intent_cache=make_cache())
+
+    assert service._detect_intent('¿Quiénes son los TOP 7 compradores?')['parameters'] == {'limite': 7}
+    # Se guarda la referencia al primer número del mensaje, no el 7
+    key, _ = service.intent_cache.make_key('¿Quiénes son los TOP 7 compradores?')
+    assert json.loads(service.intent_cache.local.get(key))['parameters'] == {'limite': '<N0>'}
+    # Misma plantilla ("top <N> compradores"): el límite sale del mensaje nuevo, no de la caché
+    cached = service._detect_intent('quienes son los top 12 compradores')
+
+    assert cached == {'intent': 'mejores_compradores', 'parameters': {'limite': 12}}
+    assert sum(provider.calls.values()) == 1
+
+def test_fallback_results_are_not_cached(app):
+    provider = StubProvider()
+    service = make_service(app, provider, intent_cache=make_cache())
+
+    for _ in range(2):
+        assert service._detect_intent('cuántos deudores hay')['intent'] == 'contar_deudores'
+
+    assert provider.calls['cuántos deudores hay'] == 2
+    assert len(service.intent_cache.local) == 0
+
+def test_provider_results_are_cached(app):
+    provider = StubProvider(default={'intent': 'contar_deudores', 'parameters': {}})
+    service = make_service(app, provider, intent_cache=make_cache())
+
+    for _ in range(2):
+        assert service._detect_intent('cuantos deben')['intent'] == 'contar_deudores'
+
+    assert provider.calls['cuantos deben'] == 1
+
+@pytest.fixture
+def local_stats():
+    local_first_stats.reset()
+    yield local_first_stats
+    local_first_stats.reset()
+
+def test_local_first_answers_confident_messages_locally(app, local_stats):
+    provider = StubProvider(default={'intent': 'contar_compradores', 'parameters': {}})
+    service = make_service(app, provider, preference='local_first')
+
+    assert service._detect_intent('cuántos deudores hay')['intent'] == 'contar_deudores'
+    assert not provider.calls
+    assert local_stats.snapshot()['paths'] == {'local': 1}
+
+@pytest.mark.parametrize('message, reason', [
+    # El detector local no reconoce el mensaje
+    ('dame algo', 'unknown'),
+    # Lo reconoce con una confianza (0.67) por debajo del umbral
+    ('top 7 compradores', 'low_confidence'),
+])
+def test_local_first_escalates_to_llm(app, local_stats, message, reason):
+    llm_data = {'intent': 'mejores_compradores', 'parameters': {'limite': 7}}
+    provider = StubProvider({message: llm_data})
+    service = make_service(app, provider, preference='local_first')
+
+    assert service._detect_intent(message) == llm_data
+    assert provider.calls[message] == 1
+    snapshot = local_stats.snapshot()
+    assert snapshot['paths'] == {'llm': 1}
+    assert snapshot['escalation_reasons'] == {reason: 1}
+
+def test_local_first_falls_back_when_llm_fails(app, local_stats):
+    service = make_service(app, StubProvider(), preference='local_first')
+
+    assert service._detect_intent('top 7 compradores')['intent'] == 'mejores_compradores'
+    assert local_stats.snapshot()['paths'] == {'llm_failed': 1}
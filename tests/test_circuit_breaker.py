@@ -0,0 +1,89 @@
+import pytest
+from app.services import circuit_breaker
+from app.services.circuit_breaker import CircuitBreaker
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker, 'time', clock)
+    return clock
+
+def make_breaker():
+    return CircuitBreaker('prueba', window_seconds=60, min_calls=4, error_rate=0.5,
+                          slow_call_seconds=5, slow_call_rate=0.5, open_seconds=30,
+                          probe_ratio=1.0, half_open_successes=2, max_probes=1)
+
+def test_opens_on_error_rate_and_rejects(clock):
+    breaker = make_breaker()
+    for ok in (True, False, True):
+        assert breaker.allow_request()
+        breaker.record(ok, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.snapshot()["rejected"] == 1
+
+def test_opens_on_slow_calls(clock):
+    breaker = make_breaker()
+    for latency in (6, 6, 0.1, 0.1):
+        breaker.record(True, latency)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_half_open_closes_after_successful_probes(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 31
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Solo max_probes pruebas a la vez
+    assert not breaker.allow_request()
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    assert breaker.allow_request()
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.snapshot()["calls_in_window"] == 0
+
+def test_half_open_reopens_on_failed_probe(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    clock.now += 31
+    assert breaker.allow_request()
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.snapshot()["times_opened"] == 2
+
+def test_released_probe_frees_its_slot(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    clock.now += 31
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.allow_request()
+
+def test_old_calls_leave_the_window(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    clock.now += 61
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.snapshot()["calls_in_window"] == 1
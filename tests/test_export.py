@@ -0,0 +1,25 @@
+import json
+
+def test_export_requires_admin_token(app):
+    client = app.test_client()
+    url = '/chatbot/export?message=mejores+compradores&limite=5'
+
+    # Sin ADMIN_TOKEN configurado la exportación está deshabilitada
+    app.config['ADMIN_TOKEN'] = None
+    assert client.get(url).status_code == 403
+
+    app.config['ADMIN_TOKEN'] = 'secreto'
+    assert client.get(url).status_code == 403
+    assert client.get(url, headers={'X-Admin-Token': 'otro'}).status_code == 403
+
+def test_export_streams_rows_with_admin_token(app, db):
+    db.executemany('INSERT INTO compradores (id, nombre, total_compras) VALUES (?, ?, ?)',
+                   [(i, f'comprador {i}', float(i)) for i in range(1, 8)])
+    db.commit()
+    app.config['ADMIN_TOKEN'] = 'secreto'
+
+    response = app.test_client().get('/chatbot/export?message=mejores+compradores&limite=5',
+                                     headers={'X-Admin-Token': 'secreto'})
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in rows] == [7, 6, 5, 4, 3]
@@ -0,0 +1,22 @@
+import pytest
+from app.services.fallback_service import FallbackService
+from tests.corpus import EDGE_CASES, random_messages, sample_corpus
+from tests.legacy_fallback import LegacyFallbackService
+
+# El detector compilado debe dar exactamente la misma salida que la implementación
+# anterior (bucles de re.search sin compilar) que se conserva en legacy_fallback.py
+@pytest.mark.parametrize('messages', [
+    pytest.param(EDGE_CASES, id='casos_limite'),
+    pytest.param(sample_corpus(2000), id='corpus'),
+    pytest.param(random_messages(5000), id='aleatorios'),
+])
+def test_compiled_matcher_matches_legacy(messages):
+    compiled = FallbackService()
+    legacy = LegacyFallbackService()
+    mismatches = [
+        (message, expected, actual)
+        for message in messages
+        for expected, actual in [(legacy.detect_intent(message), compiled.detect_intent(message))]
+        if expected != actual
+    ]
+    assert not mismatches, mismatches[:5]
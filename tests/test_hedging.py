@@ -0,0 +1,161 @@
+import threading
+import time
+import pytest
+from app.services.hedging import HedgeStats, HedgedIntentDetector
+
+VALID = {'intent': 'contar_deudores', 'parameters': {}}
+FAILED = {'intent': 'desconocido', 'error': 'proveedor caído'}
+LOCAL = {'intent': 'contar_compradores', 'parameters': {}}
+
+class FakeProvider:
+    """Proveedor que espera a release (o delay segundos) y devuelve result o lanza error"""
+
+    def __init__(self, result=VALID, delay=0, error=None, release=None):
+        self.result = result
+        self.delay = delay
+        self.error = error
+        self.release = release
+        self.threads = []
+
+    def detect_intent(self, user_message):
+        self.threads.append(threading.current_thread())
+        if self.release is not None:
+            self.release.wait(5)
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class FakeFallback:
+    def __init__(self):
+        self.calls = 0
+
+    def detect_intent(self, user_message):
+        self.calls += 1
+        return LOCAL
+
+@pytest.fixture
+def release():
+    # Desbloquea a los proveedores que siguen en vuelo al terminar la prueba
+    event = threading.Event()
+    yield event
+    event.set()
+
+def make_detector(**kwargs):
+    kwargs.setdefault('stats', HedgeStats())
+    return HedgedIntentDetector(**kwargs)
+
+def free_slots(detector):
+    """Espera a que terminen las llamadas del pool y cuenta los hilos libres"""
+    detector._executor.shutdown(wait=True)
+    count = 0
+    while detector._slots.acquire(blocking=False):
+        count += 1
+    return count
+
+def test_hedge_fires_when_primary_is_slow(app, release):
+    detector = make_detector(hedge_delay=0.05, timeout=5)
+    primary, secondary = FakeProvider(release=release), FakeProvider()
+
+    result = detector.detect([('deepseek', primary), ('openai', secondary)], FakeFallback(), 'hola')
+
+    assert result == (VALID, 'openai')
+    stats = detector.stats.snapshot()
+    assert stats['hedges_fired'] == 1
+    assert stats['providers']['openai']['wins'] == 1
+    assert stats['providers']['deepseek']['losses'] == 1
+
+def test_primary_answer_before_delay_skips_hedge(app):
+    detector = make_detector(hedge_delay=5, timeout=5)
+    secondary = FakeProvider()
+
+    assert detector.detect([('deepseek', FakeProvider()), ('openai', secondary)], FakeFallback(), 'hola') == (VALID, 'deepseek')
+    assert secondary.threads == []
+    assert detector.stats.snapshot()['hedges_fired'] == 0
+
+@pytest.mark.parametrize('primary', [
+    FakeProvider(result=FAILED),
+    FakeProvider(error=RuntimeError('conexión rechazada')),
+])
+def test_primary_failure_escalates_immediately(app, primary):
+    detector = make_detector(hedge_delay=5, timeout=10)
+
+    start = time.monotonic()
+    result = detector.detect([('deepseek', primary), ('openai', FakeProvider())], FakeFallback(), 'hola')
+
+    assert result == (VALID, 'openai')
+    # Sin esperar hedge_delay
+    assert time.monotonic() - start < 2
+    assert detector.stats.snapshot()['hedges_fired'] == 1
+
+def test_deadline_falls_back_to_local_result(app, release):
+    detector = make_detector(hedge_delay=0.01, timeout=0.2)
+    fallback = FakeFallback()
+    providers = [('deepseek', FakeProvider(release=release)), ('openai', FakeProvider(release=release))]
+
+    start = time.monotonic()
+    assert detector.detect(providers, fallback, 'hola') == (LOCAL, 'fallback')
+    assert time.monotonic() - start < 2
+    assert fallback.calls == 1
+    assert detector.stats.snapshot()['providers']['fallback']['wins'] == 1
+
+def test_all_providers_failing_falls_back(app):
+    detector = make_detector(hedge_delay=5, timeout=5)
+    providers = [('deepseek', FakeProvider(result=FAILED)), ('openai', FakeProvider(error=RuntimeError('caído')))]
+
+    assert detector.detect(providers, FakeFallback(), 'hola') == (LOCAL, 'fallback')
+    assert detector.stats.snapshot()['providers']['openai']['errors'] == 1
+
+def test_saturated_pool_runs_inline(app):
+    detector = make_detector(hedge_delay=0.05, timeout=5, max_workers=1)
+    detector._get_executor()
+    # Otra solicitud ocupa el único hilo del pool
+    assert detector._slots.acquire(blocking=False)
+    primary, secondary = FakeProvider(result=FAILED), FakeProvider()
+
+    result = detector.detect([('deepseek', primary), ('openai', secondary)], FakeFallback(), 'hola')
+
+    assert result == (VALID, 'openai')
+    # Cascada en el hilo de la solicitud
+    assert primary.threads == [threading.current_thread()]
+    assert secondary.threads == [threading.current_thread()]
+    stats = detector.stats.snapshot()
+    assert stats['inline'] == 1
+    assert stats['hedges_fired'] == 0
+
+def test_saturated_pool_inline_falls_back(app):
+    detector = make_detector(max_workers=1)
+    detector._get_executor()
+    assert detector._slots.acquire(blocking=False)
+    fallback = FakeFallback()
+
+    result = detector.detect([('deepseek', FakeProvider(error=RuntimeError('caído')))], fallback, 'hola')
+
+    assert result == (LOCAL, 'fallback')
+    assert fallback.calls == 1
+
+def test_full_pool_skips_hedge_and_waits_for_primary(app):
+    detector = make_detector(hedge_delay=0.01, timeout=5, max_workers=1)
+    secondary = FakeProvider()
+
+    result = detector.detect([('deepseek', FakeProvider(delay=0.2)), ('openai', secondary)], FakeFallback(), 'hola')
+
+    assert result == (VALID, 'deepseek')
+    assert secondary.threads == []
+    assert detector.stats.snapshot()['hedges_skipped'] == 1
+
+def test_slots_are_released_after_each_call(app, release):
+    detector = make_detector(hedge_delay=0.01, timeout=0.2, max_workers=2)
+    providers = [('deepseek', FakeProvider(error=RuntimeError('caído'))), ('openai', FakeProvider(release=release))]
+
+    assert detector.detect(providers, FakeFallback(), 'hola') == (LOCAL, 'fallback')
+    release.set()
+    assert free_slots(detector) == 2
+
+def test_slot_is_released_when_submit_fails(app):
+    detector = make_detector(max_workers=1)
+    detector._get_executor().shutdown()
+
+    with pytest.raises(RuntimeError):
+        detector._try_submit(lambda: None)
+    assert free_slots(detector) == 1
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from openai import APIStatusError, APITimeoutError
+from app.services import llm_provider
+from app.services.http_client import http_client
+from app.services.llm_provider import LLMProvider
+
+try:
+    import httpx
+except ImportError:
+    import httpx2 as httpx
+
+REQUEST = httpx.Request('POST', 'https://llm.test/chat/completions')
+
+def timeout_error(cause):
+    error = APITimeoutError(request=REQUEST)
+    error.__cause__ = cause
+    return error
+
+def status_error(status, headers=None):
+    response = httpx.Response(status, headers=headers, request=REQUEST)
+    return APIStatusError(f"HTTP {status}", response=response, body=None)
+
+class FakeCompletions:
+    """Lanza los errores indicados en orden y después devuelve una respuesta"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'respuesta'
+
+class FakeClient:
+    def __init__(self, completions):
+        self.chat = type('Chat', (), {'completions': completions})()
+
+@pytest.fixture
+def delays(monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(llm_provider.asyncio, 'sleep', sleep)
+    monkeypatch.setitem(http_client.settings, 'max_retries', 2)
+    return delays
+
+def run(errors):
+    completions = FakeCompletions(errors)
+    provider = LLMProvider('openai', api_key='clave', model='modelo', base_url='https://llm.test')
+    provider._get_async_client = lambda: FakeClient(completions)
+    return asyncio.run(provider._create_completion([])), completions
+
+def test_connect_timeout_is_retried(delays):
+    result, completions = run([timeout_error(httpx.ConnectTimeout('connect'))])
+    assert result == 'respuesta'
+    assert completions.calls == 2
+    assert len(delays) == 1
+    assert 0 <= delays[0] <= http_client.settings['backoff']
+
+def test_read_timeout_is_not_retried(delays):
+    with pytest.raises(APITimeoutError):
+        run([timeout_error(httpx.ReadTimeout('read'))])
+    assert delays == []
+
+def test_service_unavailable_honours_retry_after(delays):
+    result, completions = run([status_error(503, {'Retry-After': '2'})])
+    assert result == 'respuesta'
+    assert completions.calls == 2
+    assert delays == [2.0]
+
+def test_last_attempt_raises(delays):
+    with pytest.raises(APIStatusError):
+        run([status_error(503)] * 3)
+    assert len(delays) == 2
+
+def test_client_errors_are_not_retried(delays):
+    with pytest.raises(APIStatusError):
+        run([status_error(400)])
+    assert delays == []
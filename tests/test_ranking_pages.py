@@ -0,0 +1,46 @@
+import pytest
+from app.models.database import (
+    RANKING_TABLA_SQL,
+    consultar_pagina_ranking,
+    decode_cursor,
+    encode_cursor
+)
+
+def test_cursor_round_trip():
+    row = {'id': 42, 'nombre': 'Ana', 'total_compras': 0.1 + 0.2}
+    cursor = encode_cursor('compradores', row, 20)
+    # El monto se conserva exacto (no redondeado) para que el keyset sea exacto
+    assert decode_cursor(cursor, 'compradores') == ((0.1 + 0.2, 42), 20)
+
+@pytest.mark.parametrize('cursor', ['', 'no-es-un-cursor', '!!!'])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'compradores')
+
+def test_decode_cursor_rejects_other_table():
+    cursor = encode_cursor('deudores', {'id': 1, 'monto_adeudado': 5.0}, 1)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'compradores')
+
+def test_keyset_pages_cover_ranking_without_gaps_or_duplicates(db):
+    # Montos repetidos: las páginas deben partir los empates por id
+    rows = [(i, f'comprador {i}', float(i % 7) * 10.25) for i in range(1, 131)]
+    db.executemany('INSERT INTO compradores (id, nombre, total_compras) VALUES (?, ?, ?)', rows)
+    db.commit()
+    expected = [dict(row) for row in db.execute(RANKING_TABLA_SQL['compradores'], (len(rows),)).fetchall()]
+
+    page_size = 9
+    served = []
+    page = expected[:page_size]
+    cursor = encode_cursor('compradores', page[-1], len(page))
+    served += page
+    while True:
+        position, count = decode_cursor(cursor, 'compradores')
+        assert count == len(served)
+        page = consultar_pagina_ranking('compradores', page_size, position)
+        if not page:
+            break
+        served += page
+        cursor = encode_cursor('compradores', page[-1], len(served))
+
+    assert served == expected
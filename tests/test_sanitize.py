@@ -0,0 +1,29 @@
+import os
+import pytest
+from app.utils.security import sanitize_input
+from tests.legacy_sanitize import code_point_cases, legacy_sanitize_input, random_cases, uncached_sanitize_input
+
+def assert_same_bytes(cases):
+    mismatches = []
+    for case in cases:
+        expected = legacy_sanitize_input(case)
+        actual = uncached_sanitize_input(case)
+        if expected.encode('utf-8', 'surrogatepass') != actual.encode('utf-8', 'surrogatepass'):
+            mismatches.append((case, expected, actual))
+    assert not mismatches, mismatches[:5]
+
+# La tabla de str.translate y la expresión única deben dar exactamente los mismos bytes
+# que la implementación anterior. Se recorre por bloques el plano multilingüe básico o,
+# con SANITIZE_EXHAUSTIVE=1, todos los puntos de código (varios minutos)
+CODE_POINT_LIMIT = 0x110000 if os.environ.get('SANITIZE_EXHAUSTIVE') else 0x10000
+
+@pytest.mark.parametrize('start', range(0, CODE_POINT_LIMIT, 0x2000), ids=lambda start: f'U+{start:04X}')
+def test_matches_legacy_for_every_code_point(start):
+    assert_same_bytes(code_point_cases(start + 0x2000, start))
+
+def test_matches_legacy_for_random_messages():
+    assert_same_bytes(random_cases(20000))
+
+def test_memoized_result_matches_uncached():
+    for case in list(random_cases(500)) * 2:
+        assert sanitize_input(case) == uncached_sanitize_input(case)
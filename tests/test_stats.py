@@ -0,0 +1,23 @@
+from app.routes import chatbot_routes
+from app.services.canonicalizer import MessageCanonicalizer
+from app.services.chatbot_service import ChatbotService
+from app.services.intent_cache import IntentCache
+
+def test_intent_cache_templates_are_admin_only(app, monkeypatch):
+    service = ChatbotService().initialize()
+    service.intent_cache = IntentCache('pruebas', canonicalizer=MessageCanonicalizer())
+    service.intent_cache.get('¿Cuántos deudores hay?')
+    monkeypatch.setattr(chatbot_routes, 'get_chatbot_service', lambda: service)
+    app.config['ADMIN_TOKEN'] = 'secreto'
+    client = app.test_client()
+
+    # Las plantillas son mensajes de usuarios: no salen en el endpoint público
+    canonicalization = client.get('/chatbot/stats').get_json()["intent_cache"]["canonicalization"]
+    assert canonicalization["messages"] == 1
+    assert "top_templates" not in canonicalization
+    assert 'cuantos deudores' not in client.get('/chatbot/stats').get_data(as_text=True)
+
+    assert client.get('/chatbot/admin/cache/templates').status_code == 403
+    response = client.get('/chatbot/admin/cache/templates?top=5', headers={'X-Admin-Token': 'secreto'})
+    assert response.status_code == 200
+    assert response.get_json()["top_templates"] == [{"template": "cuantos deudores", "messages": 1}]
@@ -0,0 +1,40 @@
+import random
+from app.models.summary import LEADERBOARD_SIZE, SUMMARY_TABLES, check_summary, rebuild_summary
+
+def test_triggers_keep_summary_consistent_after_random_operations(db):
+    rng = random.Random(15)
+    ids = {tabla: [] for tabla in SUMMARY_TABLES}
+    next_id = 1
+    # Montos con muchos empates para probar el desempate por id en el ranking
+    amounts = [round(rng.uniform(0, 500), 2) for _ in range(40)]
+
+    for step in range(3000):
+        tabla = rng.choice(list(SUMMARY_TABLES))
+        monto = SUMMARY_TABLES[tabla]
+        operation = rng.random()
+        # Mantener la tabla alrededor del tamaño del ranking para ejercitar desalojos y rellenos
+        if not ids[tabla] or (operation < 0.45 and len(ids[tabla]) < LEADERBOARD_SIZE * 2):
+            db.execute(f'INSERT INTO {tabla} (id, nombre, {monto}) VALUES (?, ?, ?)',
+                       (next_id, f'nombre {next_id}', rng.choice(amounts)))
+            ids[tabla].append(next_id)
+            next_id += 1
+        elif operation < 0.75:
+            db.execute(f'UPDATE {tabla} SET {monto} = ? WHERE id = ?',
+                       (rng.choice(amounts), rng.choice(ids[tabla])))
+        else:
+            row_id = ids[tabla].pop(rng.randrange(len(ids[tabla])))
+            db.execute(f'DELETE FROM {tabla} WHERE id = ?', (row_id,))
+        db.commit()
+
+        if step % 250 == 0:
+            assert check_summary(db) == []
+    assert check_summary(db) == []
+
+def test_check_summary_reports_drift_and_rebuild_fixes_it(db):
+    db.execute("INSERT INTO compradores (id, nombre, total_compras) VALUES (1, 'Ana', 10.5)")
+    db.execute("UPDATE resumen_tablas SET filas = filas + 1 WHERE tabla = 'compradores'")
+    db.commit()
+    assert check_summary(db) == ["compradores: filas 2 en el resumen, 1 en la tabla"]
+
+    rebuild_summary(db)
+    assert check_summary(db) == []
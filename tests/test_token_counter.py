@@ -0,0 +1,52 @@
+import threading
+from app.services.prompts import TokenCounter
+
+class FakeEncoding:
+    name = 'fake'
+
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+def test_counts_are_estimated_while_encoding_loads(monkeypatch):
+    counter = TokenCounter()
+    release = threading.Event()
+    loaded = threading.Event()
+
+    def slow_load(model, logger=None):
+        # Una descarga de tiktoken que no termina hasta que la prueba lo indica
+        release.wait(5)
+        counter._encodings[model] = FakeEncoding()
+        counter._loading.discard(model)
+        loaded.set()
+
+    monkeypatch.setattr(counter, 'load', slow_load)
+    messages = [{"role": "system", "content": "uno dos tres cuatro cinco seis"},
+                {"role": "user", "content": "siete ocho"}]
+
+    # Sin esperar a la carga: un token por cada 4 bytes
+    assert counter.count('a' * 40, 'modelo') == 10
+    assert counter.method == 'estimación'
+    estimated = counter.count_messages(messages, 'modelo')
+    assert counter._fixed_counts == {}
+
+    release.set()
+    assert loaded.wait(5)
+    assert counter.count('a b c', 'modelo') == 3
+    # El prompt fijo se recuenta con la codificación en lugar de conservar la estimación
+    assert estimated == 3 + (4 + 8) + (4 + 3)
+    assert counter.count_messages(messages, 'modelo') == 3 + (4 + 6) + (4 + 2)
+
+def test_load_falls_back_to_estimate_without_tiktoken(monkeypatch):
+    import builtins
+    real_import = builtins.__import__
+
+    def no_tiktoken(name, *args, **kwargs):
+        if name == 'tiktoken':
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, '__import__', no_tiktoken)
+    counter = TokenCounter()
+    assert counter.load('modelo') is None
+    assert counter.method == 'estimación'
+    assert counter.count('a' * 9, 'modelo') == 3